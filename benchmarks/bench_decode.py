@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""Bench Decode
+Measures how long it takes to decode a response's body, comparing Requests' response.text with carpetbag.charset, for
+pages whose Content-Type header has no charset.
+
+    python -m benchmarks.bench_decode
+
+"""
+import argparse
+import time
+
+import requests
+
+from carpetbag import charset
+
+from .corpus import make_corpus
+
+
+def make_response(content):
+    """
+    Makes a Requests response around some content, with no charset in its Content-Type header.
+
+    :param content: The response body.
+    :type content: bytes
+    :returns: The response.
+    :rtype: <requests.Response> obj
+    """
+    response = requests.Response()
+    response._content = content
+    response.headers["Content-Type"] = "text/html"
+    response.encoding = None
+    return response
+
+
+def bench(contents, decode, rounds):
+    """
+    Decodes every body, with a fresh response each time.
+
+    :param contents: The page bodies.
+    :type contents: list
+    :param decode: Decodes a single response.
+    :type decode: callable
+    :param rounds: Number of times to run the pages, the best run is kept.
+    :type rounds: int
+    :returns: The best run's time, in milliseconds.
+    :rtype: float
+    """
+    best = None
+    for _ in range(rounds):
+        responses = [make_response(content) for content in contents]
+        start = time.perf_counter()
+        for response in responses:
+            decode(response)
+        run_time = time.perf_counter() - start
+        if best is None or run_time < best:
+            best = run_time
+
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.pages)
+    # Strip the <meta charset> so the statistical fallback is the worst case for both.
+    contents = [response.content.replace(b"<meta charset=\"utf-8\">", b"") for response in corpus]
+    print("Corpus: %s pages, %s KB" % (len(contents), sum(len(content) for content in contents) // 1024))
+    print("%-20s %12s" % ("decoder", "ms"))
+    print("%-20s %12.1f" % ("response.text", bench(contents, lambda response: response.text, args.rounds)))
+    print("%-20s %12.1f" % ("charset.decode", bench(
+        contents, lambda response: charset.decode(response.content, response.headers["Content-Type"]), args.rounds)))
+
+
+if __name__ == "__main__":
+    main()
+
+# EndFile: carpetbag/benchmarks/bench_decode.py
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""Bench Import
+Measures how long a fresh interpreter takes to import CarpetBag, over the interpreter's own start up time, and checks
+that the dependencies CarpetBag defers until first use weren't loaded by the import.
+
+    python -m benchmarks.bench_import
+
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+DEFERRED = [
+    "arrow", "bs4", "carpetbag.crawler", "concurrent.futures", "lxml", "multiprocessing", "pytz", "soupsieve", "tld",
+    "user_agent"]
+
+
+def bench(code, rounds):
+    """
+    Runs code in a fresh interpreter.
+
+    :param code: The code to run.
+    :type code: str
+    :param rounds: Number of times to run it, the best run is kept.
+    :type rounds: int
+    :returns: The best run's time, in milliseconds.
+    :rtype: float
+    """
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        run_time = time.perf_counter() - start
+        if best is None or run_time < best:
+            best = run_time
+
+    return best * 1000
+
+
+def loaded_deferred():
+    """
+    Gets the deferred dependencies a fresh interpreter has loaded after importing CarpetBag.
+
+    :returns: The loaded module names.
+    :rtype: list
+    """
+    code = "import sys, carpetbag; print(' '.join(m for m in %r if m in sys.modules))" % DEFERRED
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return output.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    interpreter = bench("pass", args.rounds)
+    import_time = bench("import carpetbag", args.rounds)
+    print("%-20s %12s" % ("run", "ms"))
+    print("%-20s %12.1f" % ("python", interpreter))
+    print("%-20s %12.1f" % ("import carpetbag", import_time))
+    print("%-20s %12.1f" % ("import overhead", import_time - interpreter))
+    print("Deferred dependencies loaded: %s" % (", ".join(loaded_deferred()) or "none"))
+
+
+if __name__ == "__main__":
+    main()
+
+# EndFile: carpetbag/benchmarks/bench_import.py
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""Bench Parse Backends
+Measures ParseResponse throughput, in pages per second, for each parse backend over the fixed page corpus. Also
+asserts that running the parse_many default extractors together, with one shared strained parse, beats parsing the
+full tree for them.
+
+    python -m benchmarks.bench_parse_backends
+
+"""
+import argparse
+import time
+
+from carpetbag.parse_pool import DEFAULT_EXTRACTORS
+from carpetbag.parse_response import ParseResponse
+
+from .corpus import make_corpus
+
+BACKENDS = ["html.parser", "lxml", "lxml-direct"]
+EXTRACTORS = {
+    "tree": lambda parsed: parsed.tree,
+    "get_title": lambda parsed: parsed.get_title(),
+    "get_links": lambda parsed: parsed.get_links(),
+    "duckduckgo_results": lambda parsed: parsed.duckduckgo_results(),
+    "get_anchors": lambda parsed: parsed.get_anchors(),
+    "defaults": lambda parsed: run_extractors(parsed, DEFAULT_EXTRACTORS),
+    "defaults full tree": lambda parsed: run_extractors(parsed, ["tree"] + DEFAULT_EXTRACTORS),
+}
+
+
+def run_extractors(parsed, extractors):
+    """
+    Runs several extractors against a page the way ParsePool's workers do, "tree" builds the full tree first.
+
+    :param parsed: The page.
+    :type parsed: <ParseResponse> obj
+    :param extractors: The extractors' method names, or "tree".
+    :type extractors: list
+    """
+    if "tree" in extractors:
+        parsed.tree
+    else:
+        parsed.prepare(extractors)
+
+    for extractor in extractors:
+        if extractor != "tree":
+            parsed.run(extractor)
+
+
+def assert_multi_extractor(corpus, parser, rounds):
+    """
+    Asserts that running the default extractors with one shared strained parse is faster than running them against
+    the full tree.
+
+    :param corpus: The fake responses.
+    :type corpus: list
+    :param parser: The parse backend name.
+    :type parser: str
+    :param rounds: Number of times to run the corpus, the best run is kept.
+    :type rounds: int
+    :returns: Pages parsed per second, with the shared strained parse and with the full tree.
+    :rtype: tuple
+    """
+    strained = bench(corpus, parser, EXTRACTORS["defaults"], rounds)
+    full = bench(corpus, parser, EXTRACTORS["defaults full tree"], rounds)
+    assert strained > full, "%s: %.1f pages/sec strained, %.1f full tree" % (parser, strained, full)
+    return strained, full
+
+
+def bench(corpus, parser, extractor, rounds):
+    """
+    Runs an extractor over every page of the corpus with a fresh ParseResponse per page.
+
+    :param corpus: The fake responses.
+    :type corpus: list
+    :param parser: The parse backend name.
+    :type parser: str
+    :param extractor: The extractor to run per page.
+    :type extractor: callable
+    :param rounds: Number of times to run the corpus, the best run is kept.
+    :type rounds: int
+    :returns: Pages parsed per second.
+    :rtype: float
+    """
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for response in corpus:
+            extractor(ParseResponse(response, parser))
+        run_time = time.perf_counter() - start
+        if best is None or run_time < best:
+            best = run_time
+
+    return len(corpus) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.pages)
+    corpus_bytes = sum(len(response.content) for response in corpus)
+    print("Corpus: %s pages, %s KB" % (len(corpus), corpus_bytes // 1024))
+    print("%-20s %-14s %12s" % ("extractor", "backend", "pages/sec"))
+    for name, extractor in EXTRACTORS.items():
+        for backend in BACKENDS:
+            try:
+                pages_per_sec = bench(corpus, backend, extractor, args.rounds)
+            except Exception as e:
+                print("%-20s %-14s %12s" % (name, backend, "error: %s" % e.__class__.__name__))
+                continue
+            print("%-20s %-14s %12.1f" % (name, backend, pages_per_sec))
+
+    for backend in ["html.parser", "lxml"]:
+        assert_multi_extractor(corpus, backend, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
+
+# EndFile: carpetbag/benchmarks/bench_parse_backends.py
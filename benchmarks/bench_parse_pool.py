@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""Bench Parse Pool
+Measures CarpetBag.parse_many() throughput, in pages per second, in process and with worker processes.
+
+    python -m benchmarks.bench_parse_pool --processes 4
+
+"""
+import argparse
+import os
+import time
+
+from carpetbag import CarpetBag
+
+from .corpus import make_corpus
+
+
+def bench(corpus, processes, parser, rounds):
+    """
+    Parses the corpus with parse_many(). The worker processes are started before timing.
+
+    :param corpus: The fake responses.
+    :type corpus: list
+    :param processes: Number of worker processes.
+    :type processes: int
+    :param parser: The parse backend name.
+    :type parser: str
+    :param rounds: Number of times to run the corpus, the best run is kept.
+    :type rounds: int
+    :returns: Pages parsed per second.
+    :rtype: float
+    """
+    bagger = CarpetBag()
+    bagger.use_parser_backend(parser)
+    bagger.parse_many(corpus[:processes * 2], processes)
+    best = None
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            bagger.parse_many(corpus, processes)
+            run_time = time.perf_counter() - start
+            if best is None or run_time < best:
+                best = run_time
+    finally:
+        bagger.close()
+
+    return len(corpus) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--parser", default="html.parser")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.pages)
+    print("Corpus: %s pages, %s cores" % (len(corpus), os.cpu_count()))
+    print("%-20s %12s" % ("processes", "pages/sec"))
+    for processes in sorted(set([1, args.processes])):
+        print("%-20s %12.1f" % (processes, bench(corpus, processes, args.parser, args.rounds)))
+
+
+if __name__ == "__main__":
+    main()
+
+# EndFile: carpetbag/benchmarks/bench_parse_pool.py
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""Bench Schema
+Measures extraction throughput, in pages per second, of a compiled Schema against the same selectors run by hand with
+soup.select() on every page. Pages are parsed before timing, so only extraction is measured.
+
+    python -m benchmarks.bench_schema
+
+"""
+import argparse
+import time
+
+from carpetbag.parse_response import ParseResponse
+from carpetbag.schema import Field, Schema
+
+from .corpus import make_corpus
+
+SCHEMA = Schema({
+    "title": "title",
+    "description": "meta[name=description]@content",
+    "canonical": "link[rel=canonical]@href",
+    "results": Field("div.result", many=True, fields={
+        "title": "h2",
+        "snippet": "a.result__snippet",
+        "url": "a.result__url@href",
+    }),
+})
+
+
+def by_hand(soup):
+    """
+    Extracts the same fields as SCHEMA, selecting with uncompiled selector strings.
+
+    :param soup: The parsed page.
+    :type soup: <BeautifulSoup> obj
+    :returns: The extracted fields.
+    :rtype: dict
+    """
+    return {
+        "title": soup.select_one("title").get_text().strip(),
+        "description": soup.select_one("meta[name=description]").get("content"),
+        "canonical": soup.select_one("link[rel=canonical]").get("href"),
+        "results": [
+            {
+                "title": result.select_one("h2").get_text().strip(),
+                "snippet": result.select_one("a.result__snippet").get_text().strip(),
+                "url": result.select_one("a.result__url").get("href"),
+            } for result in soup.select("div.result")],
+    }
+
+
+def bench(soups, extract, rounds):
+    """
+    Runs an extraction over every parsed page.
+
+    :param soups: The parsed pages.
+    :type soups: list
+    :param extract: Extracts a single page.
+    :type extract: callable
+    :param rounds: Number of times to run the pages, the best run is kept.
+    :type rounds: int
+    :returns: Pages extracted per second.
+    :rtype: float
+    """
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for soup in soups:
+            extract(soup)
+        run_time = time.perf_counter() - start
+        if best is None or run_time < best:
+            best = run_time
+
+    return len(soups) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    soups = [ParseResponse(response, "lxml").soup for response in make_corpus(args.pages)]
+    assert SCHEMA.extract(soups[0]) == by_hand(soups[0])
+    print("Corpus: %s pages" % len(soups))
+    print("%-20s %12s" % ("extraction", "pages/sec"))
+    print("%-20s %12.1f" % ("soup.select()", bench(soups, by_hand, args.rounds)))
+    print("%-20s %12.1f" % ("Schema", bench(soups, SCHEMA.extract, args.rounds)))
+
+
+if __name__ == "__main__":
+    main()
+
+# EndFile: carpetbag/benchmarks/bench_schema.py
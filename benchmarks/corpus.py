@@ -0,0 +1,81 @@
+"""Corpus
+A fixed corpus of generated html pages for benchmarking, built from a seeded random generator so every run parses the
+exact same pages.
+
+"""
+import random
+
+WORDS = [
+    "carpet", "bag", "proxy", "scrape", "python", "request", "response", "parse", "tor", "identity", "agent",
+    "search", "result", "link", "title", "page", "bad", "actor", "services", "public", "free", "fast", "slow",
+]
+
+
+class CorpusResponse(object):
+
+    def __init__(self, url, text):
+        self.status_code = 200
+        self.url = url
+        self.text = text
+        self.content = text.encode("utf-8")
+        self.headers = {"Content-Type": "text/html; charset=utf-8"}
+
+
+def make_page(rand, links=200, paragraphs=60):
+    """
+    Makes a single page of html with a title, meta tags, paragraphs, duckduckgo style results and links.
+
+    :param rand: The seeded random generator.
+    :type rand: <random.Random> obj
+    :param links: Number of anchors on the page.
+    :type links: int
+    :param paragraphs: Number of paragraphs on the page.
+    :type paragraphs: int
+    :returns: The page's html.
+    :rtype: str
+    """
+    def words(count):
+        return " ".join(rand.choice(WORDS) for _ in range(count))
+
+    html = [
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\">",
+        "<title>%s</title>" % words(6),
+        "<meta name=\"description\" content=\"%s\">" % words(20),
+        "<link rel=\"canonical\" href=\"https://www.bad-actor.services/%s\">" % rand.randint(1, 10000),
+        "</head><body><div class=\"results\">",
+    ]
+    for index in range(10):
+        html.append(
+            "<div class=\"result results_links\"><h2>%s</h2>"
+            "<a class=\"result__snippet\" href=\"/r/%s\">%s</a>"
+            "<a class=\"result__url\" href=\"/r/%s\">www.%s.com</a></div>" % (
+                words(5), index, words(25), index, rand.choice(WORDS)))
+    html.append("</div>")
+    for _ in range(paragraphs):
+        html.append("<p>%s</p>" % words(60))
+    for index in range(links):
+        if rand.random() < 0.5:
+            html.append("<a href=\"/page/%s\">%s</a>" % (rand.randint(1, links), words(3)))
+        else:
+            html.append("<a href=\"https://www.%s.com/%s\">%s</a>" % (rand.choice(WORDS), index, words(3)))
+    html.append("</body></html>")
+
+    return "\n".join(html)
+
+
+def make_corpus(pages=50, seed=1000):
+    """
+    Makes the fixed page corpus.
+
+    :param pages: Number of pages in the corpus.
+    :type pages: int
+    :param seed: Random seed, keep this the same to compare runs.
+    :type seed: int
+    :returns: Fake responses, one per page.
+    :rtype: list
+    """
+    rand = random.Random(seed)
+    return [
+        CorpusResponse("https://www.bad-actor.services/page/%s" % index, make_page(rand)) for index in range(pages)]
+
+# EndFile: carpetbag/benchmarks/corpus.py
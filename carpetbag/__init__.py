@@ -6,16 +6,31 @@ Author: @politeauthority
 Source: https://www.github.com/politeauthority/carpetbag
 """
 
+from collections import deque
+import copy
 import logging
 import os
 from random import shuffle
-
-import requests
-import user_agent
+import threading
 
 from .base_carpetbag import BaseCarpetBag
+from .bloom_filter import filter_seen
+from .circuit_breaker import CircuitBreakers
+from .json_stream import iter_response_items
+from .link_extractor import extract_links
+from .parse_cache import ParseCache
+from .parse_pool import ParsePool
 from .parse_response import ParseResponse
+from .proxy_cache import ProxyCache
+from .rest_pager import RestPager
+from .robots import RobotsCache
+from .simhash import SimHashIndex
+from .sitemap import SitemapReader
+from .usage_stats import UsageStatsReporter
+from .user_agents import get_default_pool
+from . import charset
 from . import errors
+from . import parse_backends
 
 
 class CarpetBag(BaseCarpetBag):
@@ -155,41 +170,45 @@ class CarpetBag(BaseCarpetBag):
 
         return response
 
-    def use_random_user_agent(self, val=True):
+    def use_random_user_agent(self, val=True, pool=None):
         """
-        Sets a random, common browser's User Agent string as our own.
+        Sets a random, common browser's User Agent string as our own, along with the Accept and Accept-Language
+        headers that browser sends. Identities are picked from a pool generated once per process, so
+        reset_identity() only has to pick another.
 
         :param val: Whether or not to enable random user agents.
         :type val: bool
+        :param pool: A pool of identities to pick from, ie loaded from a file, instead of the shared generated one.
+        :type pool: <UserAgentPool> obj
         :returns: Whether or not random public proxying is happening.
         :rtype: bool
         """
         if val:
             self.random_user_agent = True
-            self.user_agent = self.get_new_user_agent()
+            self.user_agent_pool = pool
+            self._new_identity()
             return True
         else:
             self.random_user_agent = False
             self.user_agent = ""
+            self.identity_headers = {}
             return False
 
     def get_new_user_agent(self):
         """
-        Gets a new user agent string from the user_agent module, making sure that if one has already been selected, it's
+        Gets a new user agent string from the user agent pool, making sure that if one has already been selected, it's
         not reused.
 
         :returns: A brand new user agent string.
         :rtype: str
         """
-        new_user_agent = user_agent.generate_navigator()["user_agent"]
-        if new_user_agent == self.user_agent:
-            self.get_new_user_agent()
-
-        return new_user_agent
+        return self._pick_identity()["user_agent"]
 
     def get_public_proxies(self, continent=""):
         """
         Gets list of free public proxies and loads them into a list, currently just selecting from free-proxy-list.
+        If the proxy cache is enabled with use_proxy_cache(), the list is read from the local disk cache, and a stale
+        list is refreshed in the background while the stale list is used.
 
         :param continent: Filters proxies to either  just a single continent, or if list is used, orders proxies in
             based off of the order continents are listed within the "continent" list.
@@ -201,30 +220,56 @@ class CarpetBag(BaseCarpetBag):
         """
         logging.debug("Filling proxy bag")
 
-        try:
-            payload = {}
-            if continent:
-                payload = {
-                    "continent": continent,
-                }
-            response = self._make_internal("proxies", payload)
-        except errors.NoRemoteServicesConnection:
-            logging.error("Unable to connect to Bad-Actor.Services")
-            raise errors.NoRemoteServicesConnection
+        proxies = None
+        if self.proxy_cache:
+            cache_key = self._proxy_cache_key(continent)
+            proxies, stale = self.proxy_cache.get(cache_key)
+            if proxies is not None and stale:
+                self._refresh_proxy_cache(continent, background=True)
 
-        try:
-            self.proxy_bag = response.json()["objects"]
-        except Exception:
-            logging.error("ERROR: Could not get proxies. %s" % response.text)
-            return False
+        if proxies is None:
+            proxies = self._fetch_public_proxies(continent)
+            if proxies is False:
+                return False
+
+            if self.proxy_cache:
+                self.proxy_cache.set(cache_key, proxies)
 
+        self.proxy_bag = list(proxies)
+        self.proxy_bag_continent = continent
         logging.debug("Fetched %s proxies" % len(self.proxy_bag))
 
         # Shuffle the proxies so concurrent instances of CarpetBag wont use the same proxy
         shuffle(self.proxy_bag)
 
+        if self.proxy_cache:
+            self.proxy_bag = self.proxy_cache.rank(self.proxy_bag)
+
         return self.proxy_bag
 
+    def use_proxy_cache(self, val=True, path=None, ttl=3600):
+        """
+        Caches the public proxy list and per proxy health stats on the local disk, shared between all CarpetBag
+        processes on the host, so short lived processes do not each need a round trip to bad-actor.services.
+
+        :param val: Whether or not to enable the proxy cache.
+        :type val: bool
+        :param path: Where to store the cache file, defaults to a file in the system temp dir.
+        :type path: str
+        :param ttl: Seconds a fetched proxy list is considered fresh, after which it is refreshed in the background.
+        :type ttl: int
+        :returns: Whether or not the proxy cache is being used.
+        :rtype: bool
+        """
+        if not val:
+            if self.proxy_cache:
+                self.proxy_cache.flush_stats()
+            self.proxy_cache = None
+            return False
+
+        self.proxy_cache = ProxyCache(path, ttl)
+        return True
+
     def use_random_public_proxy(self, val=True, test_proxy=False):
         """
         Gets proxies from free-proxy-list.net and loads them into the self.proxy_bag. The first element in the
@@ -258,23 +303,28 @@ class CarpetBag(BaseCarpetBag):
     def reset_proxy_from_bag(self):
         """
         Grabs the next proxy inline from the self.proxy_bag, and removes the currently used proxy. If proxy bag is
-        empty, raises the EmptyProxyBag error.
+        empty, raises the EmptyProxyBag error. When a background refill is running for an empty bag, waits up to
+        self.proxy_bag_refill_wait seconds for it before giving up.
 
         :raises: carpetbag.erros.EmptyProxyBag
         """
-        if len(self.proxy_bag) == 0:
+        if len(self.proxy_bag) == 0 and not self._wait_for_proxy_bag_refill():
             self.logger.debug("Changing proxy")
             self.logger.warning("Proxy bag is empty! Cannot reset Proxy from Proxy Bag.")
             raise errors.EmptyProxyBag
 
         # Remove the current proxy from the proxy bag if one is set.
-        if self.proxy:
-            self.logger.debug("Changing proxy")
-            del self.proxy_bag[0]
-        else:
-            self.logger.debug("Selecting proxy")
+        with self.proxy_bag_lock:
+            if self.proxy:
+                self.logger.debug("Changing proxy")
+                if self.proxy_current:
+                    self._remove_from_proxy_bag(self.proxy_current)
+            else:
+                self.logger.debug("Selecting proxy")
+
+        self._check_proxy_bag_low_water()
 
-        if len(self.proxy_bag) == 0:
+        if len(self.proxy_bag) == 0 and not self._wait_for_proxy_bag_refill():
             self.logger.debug("Changing proxy")
             self.logger.error("Proxy bag is empty! Cannot reset Proxy from Proxy Bag.")
             raise errors.EmptyProxyBag
@@ -290,10 +340,105 @@ class CarpetBag(BaseCarpetBag):
             self.proxy_current["continent"],
             self.proxy_current["country"]))
 
-        if self.proxy_current["ssl"]:
-            self.proxy = {"https": self.proxy_current["address"]}
-        else:
-            self.proxy = {"http": self.proxy_current["address"]}
+        self.proxy = self._proxy_dict(self.proxy_current)
+
+    def use_proxy_bag_refill(self, val=True, low_water_mark=5, validate_proxies=True):
+        """
+        Refills the proxy bag in the background when it drops below the low water mark, so the bag does not run empty
+        in the middle of a request. New proxies are fetched from bad-actor.services, optionally checked to be
+        accepting connections, and added to the back of the bag.
+
+        :param val: Whether or not to enable background proxy bag refills.
+        :type val: bool
+        :param low_water_mark: The number of proxies left in the bag which triggers a refill.
+        :type low_water_mark: int
+        :param validate_proxies: Check that fetched proxies accept connections before adding them to the bag.
+        :type validate_proxies: bool
+        :returns: Whether or not background refills are enabled.
+        :rtype: bool
+        """
+        if not val:
+            self.proxy_bag_low_water_mark = 0
+            return False
+
+        self.proxy_bag_low_water_mark = low_water_mark
+        self.proxy_bag_validate = validate_proxies
+        return True
+
+    def use_sticky_proxies(self, val=True, max_pools=32, failure_ttl=300):
+        """
+        Keeps each domain on the proxy it was first requested through, for as long as that proxy keeps working, rather
+        than following the current proxy as it rotates. Connections are pooled per proxy, so repeat requests to a site
+        reuse a warm tunnel instead of renegotiating TLS. A proxy which fails with a proxy or connection error isn't
+        made anyone's sticky proxy again for failure_ttl seconds.
+
+        :param val: Whether or not to enable sticky proxies.
+        :type val: bool
+        :param max_pools: The max number of proxy connection pools to keep open.
+        :type max_pools: int
+        :param failure_ttl: Seconds a failed proxy is kept from being a sticky proxy.
+        :type failure_ttl: int
+        :returns: Whether or not sticky proxies are enabled.
+        :rtype: bool
+        """
+        self.session_pool.max_pools = max_pools
+        self.proxy_failure_ttl = failure_ttl
+        self.proxy_domain_map = {}
+        self.sticky_proxies = val
+
+        return val
+
+    def use_circuit_breakers(self, val=True, failure_threshold=5, recovery_timeout=30):
+        """
+        Tracks connection failures per target host and per proxy. When a host fails failure_threshold times in a row,
+        requests to it fail fast with carpetbag.errors.CircuitOpen instead of burning through the proxy bag, until a
+        single probe request after recovery_timeout seconds succeeds. With a proxy bag, a failed request is retried
+        through the next proxy, and a host is only failed fast once its failures come from at least two proxies, so a
+        dead proxy doesn't take down a healthy host. A proxy is only blamed for its failures once the host answers
+        through another proxy, and is dropped from the bag when its own breaker opens, so a good proxy isn't thrown out
+        over a host outage.
+
+        :param val: Whether or not to enable circuit breakers.
+        :type val: bool
+        :param failure_threshold: Number of failures in a row which opens a breaker.
+        :type failure_threshold: int
+        :param recovery_timeout: Seconds to wait while open before letting a probe request through.
+        :type recovery_timeout: int
+        :returns: Whether or not circuit breakers are enabled.
+        :rtype: bool
+        """
+        if not val:
+            self.host_breakers = None
+            self.proxy_breakers = None
+            return False
+
+        self.host_breakers = CircuitBreakers(failure_threshold, recovery_timeout)
+        self.proxy_breakers = CircuitBreakers(failure_threshold, recovery_timeout)
+        return True
+
+    def use_robots(self, val=True, user_agent="CarpetBag", ttl=86400, cache=None):
+        """
+        Obeys robots.txt. Each host's robots.txt is fetched once per ttl, and GET requests to urls it disallows raise
+        carpetbag.errors.DisallowedByRobots before going out. A host's Crawl-delay is used in place of
+        mininum_wait_time when it's longer, and by crawl() as the host's politeness delay.
+
+        :param val: Whether or not to obey robots.txt.
+        :type val: bool
+        :param user_agent: The product token to match robots.txt User-agent lines against.
+        :type user_agent: str
+        :param ttl: Seconds to keep a host's robots.txt before fetching it again.
+        :type ttl: int
+        :param cache: An existing robots cache to use, ie one shared between CarpetBags.
+        :type cache: <RobotsCache> obj
+        :returns: Whether or not robots.txt is being obeyed.
+        :rtype: bool
+        """
+        if not val:
+            self.robots_cache = None
+            return False
+
+        self.robots_cache = cache if cache is not None else RobotsCache(self._fetch_robots, user_agent, ttl)
+        return True
 
     def use_skip_ssl_verify(self, val=True, force=False):
         """
@@ -340,7 +485,7 @@ class CarpetBag(BaseCarpetBag):
         head_args = self._fmt_request_args("GET", self.headers, url, payload)
         head_args.pop("method")
         head_args["verify"] = False
-        h = requests.head(**head_args)
+        h = self.session_pool.get(head_args.get("proxies")).head(**head_args)
         header = h.headers
         content_type = header.get("content-type")
 
@@ -413,19 +558,254 @@ class CarpetBag(BaseCarpetBag):
         self.logger.error("There was an unexpected error checking if Tor is properly configured.")
         return False
 
+    def use_parser_backend(self, parser="lxml-direct"):
+        """
+        Sets the HTML parser used by CarpetBag.parse(). "html.parser" is the default and has no extra dependencies,
+        "lxml" and "lxml-direct" are much faster but need lxml installed.
+
+        :param parser: The parse backend to use, "html.parser", "lxml" or "lxml-direct".
+        :type parser: str
+        :returns: The parse backend being used.
+        :rtype: str
+        :raises: carpetbag.errors.InvalidParserBackend, carpetbag.errors.ParserBackendUnavailable if lxml isn't
+            installed for the lxml backends.
+        """
+        parse_backends.get_backend(parser)
+        self.parser_backend = parser
+
+        return parser
+
+    def use_parse_cache(self, val=True, max_bytes=67108864, path=None):
+        """
+        Caches ParseResponse extractor results keyed by a hash of the page body, so re-fetched pages which haven't
+        changed aren't parsed again by CarpetBag.parse() or CarpetBag.parse_many().
+
+        :param val: Whether or not to enable the parse cache.
+        :type val: bool
+        :param max_bytes: The most bytes of results to keep in memory, default 64 MegaBytes.
+        :type max_bytes: int
+        :param path: A directory to keep results in on disk as well, optional.
+        :type path: str
+        :returns: Whether or not the parse cache is being used.
+        :rtype: bool
+        """
+        if not val:
+            self.parse_cache = None
+            return False
+
+        self.parse_cache = ParseCache(max_bytes, path)
+
+        return True
+
+    def use_simhash(self, val=True, max_distance=3, index=None):
+        """
+        Takes a SimHash fingerprint of every successful GET response's text, so recrawls can skip pages which only
+        changed in their ads or timestamps. Each response gets a simhash and a near_duplicate, the url of a page seen
+        before within max_distance bits, or None. Both are kept in the request manifest too. The fingerprint is taken
+        when the response's content is first read, so streamed downloads aren't read into memory for it.
+
+        :param val: Whether or not to fingerprint responses.
+        :type val: bool
+        :param max_distance: The most bits two fingerprints can differ by and still be near duplicates.
+        :type max_distance: int
+        :param index: An existing fingerprint index to use, ie one shared between CarpetBags.
+        :type index: <SimHashIndex> obj
+        :returns: Whether or not responses are being fingerprinted.
+        :rtype: bool
+        """
+        if not val:
+            self.simhash_index = None
+            return False
+
+        self.simhash_index = index if index is not None else SimHashIndex(max_distance)
+
+        return True
+
     def parse(self, response=None):
         """
-        Parses a response from the scraper with the ParseResponse module which leverages Beautiful Soup.
+        Parses a response from the scraper with the ParseResponse module which leverages Beautiful Soup. The parsed
+        response is kept on the response, so parsing the same response again costs nothing.
 
         :param response: Optional content to parse, or will use the last response.
         :type response: <Response> obj
         :returns: Parsed response, with bs4 parsed soup.
         :type: <ParseResponse> obj
         """
-        if response:
-            return ParseResponse(response)
-        else:
-            return ParseResponse(self.last_response)
+        if response is None:
+            response = self.last_response
+
+        parsed = getattr(response, "parsed", None)
+        if parsed is None or parsed.parser.name != self.parser_backend:
+            parsed = ParseResponse(response, self.parser_backend)
+            response.parsed = parsed
+        parsed.cache = self.parse_cache
+
+        return parsed
+
+    def parse_many(self, responses, processes=None, extractors=None):
+        """
+        Parses many responses across worker processes, so CPU bound parsing doesn't hold up the threads fetching pages.
+        Each response's raw bytes, url and headers are sent to a worker, which runs the ParseResponse extractors and
+        sends back plain data. The worker processes are kept for the next call, until close(). With the parse cache on,
+        pages whose results are all cached aren't sent to the workers.
+
+        :param responses: The responses to parse.
+        :type responses: list
+        :param processes: Number of worker processes, defaults to the number of cores. With 1, pages are parsed in
+            this process.
+        :type processes: int
+        :param extractors: The ParseResponse method names or compiled Schemas to run, defaults to "get_title",
+            "get_meta", "get_canonical" and "get_links".
+        :type extractors: list
+        :returns: One dict per response, in order, ie {"url": ..., "title": ..., "links": ...}. Pages which failed to
+            parse have an "error" key.
+        :rtype: list
+        """
+        if self.parse_pool and processes and self.parse_pool.processes != processes:
+            self.parse_pool.close()
+            self.parse_pool = None
+
+        if not self.parse_pool:
+            self.parse_pool = ParsePool(processes)
+
+        return self.parse_pool.parse_many(responses, self.parser_backend, extractors, self.parse_cache)
+
+    def get_links(self, url, payload={}, chunk_size=16384, seen=None):
+        """
+        Gets a page and pulls out its links as the content streams in, without holding the whole page or building a
+        document tree. The response's content is used up by this, so it can't be read again afterwards.
+
+        :param url: The url to fetch.
+        :type: url: str
+        :param payload: The data to be sent over GET.
+        :type payload: dict
+        :param chunk_size: The number of bytes to read at a time.
+        :type chunk_size: int
+        :param seen: A Bloom filter shared across calls, links already in it are left out and new ones are added.
+        :type seen: <ScalableBloomFilter> obj
+        :returns: The links, organized by local or remote.
+        :rtype: dict
+        """
+        response = self.get(url, payload)
+
+        links = extract_links(
+            response.url,
+            response.iter_content(chunk_size),
+            charset.header_encoding(response.headers.get("Content-Type")),
+            self.parser_backend)
+
+        if seen is not None:
+            links = dict((kind, filter_seen(seen, kind_links)) for kind, kind_links in links.items())
+
+        return links
+
+    def iter_json(self, url, path="*", payload={}, chunk_size=65536):
+        """
+        Gets a JSON document and pulls the items out of one path of it as the content streams in, holding only one
+        item in memory at a time instead of the whole document. For a response already fetched with get(), use
+        carpetbag.json_stream.iter_response_items().
+
+        :param url: The url to fetch.
+        :type: url: str
+        :param path: The dotted path to the items, ie "objects.*", or "*" for a document which is just a list.
+        :type path: str
+        :param payload: The data to be sent over GET.
+        :type payload: dict
+        :param chunk_size: The number of bytes to read at a time.
+        :type chunk_size: int
+        :returns: Each item.
+        :rtype: generator
+        """
+        response = self.get(url, payload)
+        return iter_response_items(response, path, chunk_size)
+
+    def peek(self, url, payload={}, max_bytes=32768, chunk_size=4096):
+        """
+        Gets just the start of a page, reading until the end of its <head> or max_bytes, then closes the connection
+        without downloading the rest. Good for link previews and liveness checks, where only the title, <meta> tags and
+        canonical link are wanted.
+
+        :param url: The url to fetch.
+        :type: url: str
+        :param payload: The data to be sent over GET.
+        :type payload: dict
+        :param max_bytes: The most bytes of the body to read.
+        :type max_bytes: int
+        :param chunk_size: The number of bytes to read at a time.
+        :type chunk_size: int
+        :returns: The parsed response, over only the content that was read.
+        :type: <ParseResponse> obj
+        """
+        response = self.get(url, payload)
+        head = self._read_head(response, max_bytes, chunk_size)
+
+        parsed = ParseResponse(response, self.parser_backend, self.parse_cache)
+        parsed.content = charset.decode(head, response.headers.get("Content-Type"))
+        response.parsed = parsed
+
+        return parsed
+
+    def crawl(self, seeds, **kwargs):
+        """
+        Crawls out from seed urls, fetching pages concurrently with a per host frontier. See carpetbag.crawler.Crawler
+        for the scope and concurrency options.
+
+        :param seeds: The urls to start crawling from.
+        :type seeds: list
+        :returns: Each page fetched, as a dict with the url, depth, response, links and error, if there was one.
+        :rtype: generator
+        """
+        from .crawler import Crawler
+
+        return Crawler(self, seeds, **kwargs).crawl()
+
+    def iter_sitemap(self, url, workers=4, since=None, max_depth=3):
+        """
+        Streams the urls out of a site's sitemaps, in constant memory, following sitemap indexes and reading several
+        sitemaps at once. Given a url without a path, the site's sitemaps are found from its robots.txt. See
+        carpetbag.sitemap.SitemapReader.
+
+        :param url: The sitemap, sitemap index or site url.
+        :type url: str
+        :param workers: Number of sitemaps to read at once.
+        :type workers: int
+        :param since: Skip sitemaps and urls last modified before this, a datetime or W3C datetime string.
+        :type since: str
+        :param max_depth: The most sitemap indexes to follow down from the first sitemap.
+        :type max_depth: int
+        :returns: Each url, as a dict with its loc, lastmod and the sitemap it came from.
+        :rtype: generator
+        """
+        return SitemapReader(self, workers, since, max_depth).iter_urls(url)
+
+    def clone(self):
+        """
+        Creates a copy of this CarpetBag with the same settings, for use in another thread. The clone shares the
+        connection pools, circuit breakers and caches, but keeps its own headers, proxy, request manifest and last
+        response. It gets its own copy of the proxy bag and proxy state too, as proxies are rotated out of the bag by
+        each bagger as if it were the only one using it.
+
+        :returns: The clone.
+        :rtype: <CarpetBag> obj
+        """
+        clone = copy.copy(self)
+        clone.headers = dict(self.headers)
+        clone.one_time_headers = list(self.one_time_headers)
+        clone.proxy = dict(self.proxy)
+        clone.proxy_current = dict(self.proxy_current)
+        with self.proxy_bag_lock:
+            clone.proxy_bag = list(self.proxy_bag)
+            clone.proxy_bag_spent = set(self.proxy_bag_spent)
+        clone.proxy_bag_lock = threading.Lock()
+        clone.proxy_bag_refill_thread = None
+        clone.proxy_failed = dict(self.proxy_failed)
+        clone.proxy_domain_map = dict(self.proxy_domain_map)
+        clone.manifest = []
+        clone.last_response = None
+        clone.last_request_time = None
+        clone.request_count = 0
+
+        return clone
 
     def get_outbound_ip(self):
         """
@@ -451,7 +831,7 @@ class CarpetBag(BaseCarpetBag):
 
         """
         if self.random_user_agent:
-            self.user_agent = self.get_new_user_agent()
+            self._new_identity()
 
         if self.random_proxy_bag:
             self.reset_proxy_from_bag()
@@ -519,10 +899,12 @@ class CarpetBag(BaseCarpetBag):
 
         return self.headers
 
-    def send_usage_stats(self, api_key, non_proxy_user_ip, val=True):
+    def send_usage_stats(self, api_key, non_proxy_user_ip, val=True, batch_size=50, flush_interval=5,
+                         spool_path=None):
         """
         Sends usage stats to bad-actor.services, this helps rate the quality of proxy services so only the best proxies
-        are selected.
+        are selected. Reports are queued and sent in batches from a background thread, and spooled to disk if
+        bad-actor.services can't be reached.
 
         :param api_key: The bad-actor.services API key for submitting usage data.
         :type api_key: str
@@ -530,17 +912,60 @@ class CarpetBag(BaseCarpetBag):
         :type non_proxy_user_ip: str
         :param val: Whether or not to start or stop sending usage data.
         :type val: bool
+        :param batch_size: Number of queued reports that triggers sending a batch.
+        :type batch_size: int
+        :param flush_interval: Max seconds a report is queued before it's sent.
+        :type flush_interval: int
+        :param spool_path: Where to spool reports that could not be sent.
+        :type spool_path: str
         :returns: Current value of usage stat sending.
         :rtype: bool
         """
         self.send_usage_stats_val = val
         self.usage_stats_api_key = api_key
         self.non_proxy_user_ip = non_proxy_user_ip
+
+        if self.usage_stats_reporter:
+            self.usage_stats_reporter.close()
+            self.usage_stats_reporter = None
+
+        if val:
+            self.usage_stats_reporter = UsageStatsReporter(
+                self._post_usage_report,
+                batch_size=batch_size,
+                flush_interval=flush_interval,
+                spool_path=spool_path)
+
         return val
 
-    def rest_get_pages(self, url, payload={}, total=None):
+    def close(self):
+        """
+        Finishes up any background work CarpetBag has going, sending the last of the queued usage stats and writing
+        out proxy health stats.
+
+        :returns: Success if everything closed.
+        :rtype: bool
+        """
+        if self.usage_stats_reporter:
+            self.usage_stats_reporter.close()
+
+        if self.proxy_cache:
+            self.proxy_cache.flush_stats()
+
+        self.session_pool.close()
+
+        if self.parse_pool:
+            self.parse_pool.close()
+            self.parse_pool = None
+
+        return True
+
+    def rest_get_pages(self, url, payload={}, total=None, workers=4, stream=False):
         """
-        Paginates a REST resource and returns all data and responses stitched together.
+        Paginates a REST resource and returns all data and responses stitched together. Once the first page gives the
+        total pages, the rest are fetched concurrently, at most workers at a time to the resource's host, and put back
+        together in page order. Each page's body is read by the worker that fetched it, with at most workers * 2 pages
+        in flight. With total, only the pages needed for that many objects are fetched.
         Set the rest_pagination_vars for the bagger if they do not match the defaults below;
 
         self.paginatation_map = {
@@ -551,37 +976,190 @@ class CarpetBag(BaseCarpetBag):
 
         :param url: The url to fetch.
         :type: url: str
-        :returns: A Requests module instance of the response.
+        :param payload: The data to be sent over GET, the page field is added to it for each page.
+        :type payload: dict
+        :param total: Stop once at least this many objects have been fetched.
+        :type total: int
+        :param workers: Number of pages to fetch at once.
+        :type workers: int
+        :param stream: Stream the objects out of each page after the first as it downloads, instead of parsing the
+            whole page. Those responses' content is used up by this.
+        :type stream: bool
+        :returns: Every page's response, in page order, and the first page's json with every page's objects.
         :rtype: dict
         """
-        responses = []
+        field_name_data = self.paginatation_map.get("field_name_data")
         response = self.get(url, payload)
+        responses = [response]
         response_json = response.json()
         logging.debug("Getting page 1: %s" % (url))
 
         pm_total_pages = self.paginatation_map.get("field_name_total_pages")
         total_pages = response_json[pm_total_pages]
-        for page in range(2, total_pages + 1):
-            current_object_total = len(response_json[self.paginatation_map.get("field_name_data")])
-            if total and current_object_total >= total:
-                logging.debug("Got %s items of limit %s, finishing paginiation" % (current_object_total, total))
-                break
-
-            logging.debug("Getting page %s of %s: %s" % (page, total_pages, url))
-            payload[self.paginatation_map.get("field_name_page")] = page
-            response = self.get(url, payload=payload)
-            if response.status_code not in [200]:
-                logging.warning("Could not get page %s: <%s> %s" % (page, response.status_code, response.text))
-                break
-            next_page_json = response.json()
-
-            response_json[self.paginatation_map.get("field_name_data")] += \
-                next_page_json[self.paginatation_map.get("field_name_data")]
-            page += 1
+        objects = response_json[field_name_data]
+        per_page = len(objects) or 1
+        next_page = 2
+        pending = deque()
+        from concurrent.futures import ThreadPoolExecutor
+
+        local = threading.local()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                while True:
+                    # Keep a window of pages in flight, and only as many as are still needed to reach total.
+                    while len(pending) < workers * 2 and next_page <= total_pages:
+                        if total and len(objects) + len(pending) * per_page >= total:
+                            break
+                        pending.append((next_page, executor.submit(
+                            self._rest_get_page, url, payload, next_page, local, stream)))
+                        next_page += 1
+
+                    if not pending:
+                        break
+
+                    page, future = pending.popleft()
+                    response, page_objects = future.result()
+                    if response.status_code not in [200]:
+                        logging.warning("Could not get page %s: <%s> %s" % (page, response.status_code, response.text))
+                        break
+
+                    logging.debug("Got page %s of %s: %s" % (page, total_pages, url))
+                    responses.append(response)
+                    objects.extend(page_objects)
+            finally:
+                for page, future in pending:
+                    future.cancel()
 
         return {
             "responses": responses,
             "data": response_json
         }
 
+    def iter_rest_pages(self, url, payload={}, style=None, cursor_field="next_cursor", cursor_param="cursor"):
+        """
+        Walks a paginated REST resource a page at a time, fetching the next page in the background while the current
+        one is used. Pages by number with the paginatation_map, by Link header or by cursor. See
+        carpetbag.rest_pager.RestPager.
+
+        :param url: The resource's url.
+        :type: url: str
+        :param payload: The data to be sent over GET with every page.
+        :type payload: dict
+        :param style: The pagination style, "page", "link" or "cursor", or None to pick one from the first page.
+        :type style: str
+        :param cursor_field: The body field holding the next cursor, dots for nested fields ie "meta.next".
+        :type cursor_field: str
+        :param cursor_param: The parameter the cursor is sent back as.
+        :type cursor_param: str
+        :returns: Each page's response, in order.
+        :rtype: generator
+        """
+        return RestPager(self, url, payload, style, cursor_field, cursor_param).iter_pages()
+
+    def iter_rest_objects(
+        self,
+        url,
+        payload={},
+        style=None,
+        cursor_field="next_cursor",
+        cursor_param="cursor",
+        stream=False
+    ):
+        """
+        Walks a paginated REST resource an object at a time, holding only one page in memory, with the next page
+        fetched in the background. Takes the same arguments as iter_rest_pages(). With stream, each page's objects are
+        pulled out of its body as it downloads, so not even one page is held in memory.
+
+        :param url: The resource's url.
+        :type: url: str
+        :param payload: The data to be sent over GET with every page.
+        :type payload: dict
+        :param style: The pagination style, "page", "link" or "cursor", or None to pick one from the first page.
+        :type style: str
+        :param cursor_field: The body field holding the next cursor, dots for nested fields ie "meta.next".
+        :type cursor_field: str
+        :param cursor_param: The parameter the cursor is sent back as.
+        :type cursor_param: str
+        :param stream: Stream each page's objects out of its body, for pages too big to parse whole.
+        :type stream: bool
+        :returns: Each object, in order.
+        :rtype: generator
+        """
+        return RestPager(self, url, payload, style, cursor_field, cursor_param).iter_objects(stream=stream)
+
+    def _pick_identity(self):
+        """
+        Picks a browser identity other than the current one from the user agent pool.
+
+        :returns: The identity, a dict of user_agent, headers and weight.
+        :rtype: dict
+        """
+        pool = self.user_agent_pool if self.user_agent_pool is not None else get_default_pool()
+        return pool.pick(exclude=self.user_agent)
+
+    def _new_identity(self):
+        """
+        Switches to a new browser identity, its User Agent and the headers that go with it.
+
+        :returns: The new user agent string.
+        :rtype: str
+        """
+        identity = self._pick_identity()
+        self.user_agent = identity["user_agent"]
+        self.identity_headers = dict(identity["headers"])
+
+        return self.user_agent
+
+    def _rest_get_page(self, url, payload, page, local, stream=False):
+        """
+        Fetches one page of a REST resource and reads its objects, from a pool thread with its own clone of this
+        CarpetBag. The body is read here, so pages download concurrently and don't hold a connection open waiting for
+        the caller.
+
+        :param url: The url to fetch.
+        :type: url: str
+        :param payload: The data to be sent over GET, without the page field.
+        :type payload: dict
+        :param page: The page number.
+        :type page: int
+        :param local: The pool's thread local storage, holding each thread's clone.
+        :type local: <threading.local> obj
+        :param stream: Stream the objects out of the body, instead of parsing the whole page.
+        :type stream: bool
+        :returns: The page's response, and its objects or None if the page errored.
+        :rtype: tuple
+        """
+        if not hasattr(local, "bagger"):
+            local.bagger = self.clone()
+
+        page_payload = dict(payload)
+        page_payload[self.paginatation_map.get("field_name_page")] = page
+        response = local.bagger.get(url, payload=page_payload)
+        if response.status_code not in [200]:
+            # Read the error body here too, so the connection goes back to the pool.
+            response.content
+            return response, None
+
+        field_name_data = self.paginatation_map.get("field_name_data")
+        if stream:
+            return response, list(iter_response_items(response, "%s.*" % field_name_data))
+        return response, response.json()[field_name_data]
+
+
+def __getattr__(name):
+    """
+    Imports carpetbag.crawler the first time carpetbag.Crawler is asked for, so importing CarpetBag doesn't pay for it.
+
+    :param name: The attribute asked for.
+    :type name: str
+    :returns: The Crawler class.
+    :rtype: <Crawler> class
+    :raises: AttributeError
+    """
+    if name == "Crawler":
+        from .crawler import Crawler
+
+        return Crawler
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
 # End File: carpetbag/carpetbag/__init__.py
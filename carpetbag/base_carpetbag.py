@@ -5,17 +5,65 @@ from datetime import datetime, timedelta
 import json
 import logging
 import os
+import socket
+import threading
 import time
+from random import shuffle
 import urllib3
 from urllib3.exceptions import InsecureRequestWarning
 
-import arrow
 import requests
 from requests.exceptions import ChunkedEncodingError
 from requests.exceptions import ConnectionError
 
 from . import carpet_tools as ct
+from . import charset
 from . import errors
+from . import simhash
+from .session_pool import SessionPool
+
+HEAD_END = b"</head>"
+# Statuses a proxy answers with when it can't, or won't, make the request for us.
+PROXY_ERROR_STATUSES = [407, 502]
+
+
+class FingerprintedResponse(requests.Response):
+    """
+    A response which takes its SimHash fingerprint the first time its content is read, see
+    BaseCarpetBag._fingerprint_response().
+
+    """
+    fingerprinter = None
+    _simhash = None
+    _near_duplicate = None
+
+    @property
+    def content(self):
+        content = super().content
+        if self.fingerprinter is not None:
+            fingerprinter, self.fingerprinter = self.fingerprinter, None
+            self._simhash, self._near_duplicate = fingerprinter(content)
+
+        return content
+
+    @property
+    def simhash(self):
+        self._read_for_fingerprint()
+        return self._simhash
+
+    @property
+    def near_duplicate(self):
+        self._read_for_fingerprint()
+        return self._near_duplicate
+
+    def _read_for_fingerprint(self):
+        """
+        Reads the content if the fingerprint hasn't been taken yet, unless it's already been used up by
+        iter_content().
+
+        """
+        if self.fingerprinter is not None and not (self._content is False and self._content_consumed):
+            self.content
 
 
 class BaseCarpetBag(object):
@@ -85,6 +133,7 @@ class BaseCarpetBag(object):
         # self.remote_service_api = "https://www.bad-actor.services/api"
         self.remote_service_api = "https://bas.bitgel.com/api"
         self.public_proxies_max_last_test_weeks = 5
+        self.parser_backend = "html.parser"
         self.paginatation_map = {
             "field_name_page": "page",
             "field_name_total_pages": "total_pages",
@@ -100,14 +149,37 @@ class BaseCarpetBag(object):
         self.manifest = []
         self.proxy = {}
         self.proxy_bag = []
+        self.proxy_bag_lock = threading.Lock()
+        self.proxy_bag_spent = set()
+        self.proxy_bag_continent = ""
+        self.proxy_bag_refill_thread = None
         self.proxy_current = {}
+        self.proxy_failed = {}
+        self.proxy_failure_ttl = 300
+        self.proxy_domain_map = {}
+        self.sticky_proxies = False
+        self.session_pool = SessionPool()
+        self.parse_pool = None
+        self.parse_cache = None
+        self.simhash_index = None
+        self.robots_cache = None
+        self.host_breakers = None
+        self.proxy_breakers = None
         self.random_proxy_bag = False
         self.send_user_agent = ""
+        self.user_agent_pool = None
+        self.identity_headers = {}
         self.ssl_verify = True
         self.force_skip_ssl_verify = False
         self.send_usage_stats_val = False
         self.usage_stats_api_key = ""
+        self.usage_stats_reporter = None
         self.retry_on_proxy_failure = True
+        self.proxy_cache = None
+        self.proxy_bag_low_water_mark = 0
+        self.proxy_bag_validate = True
+        self.proxy_bag_validate_timeout = 3
+        self.proxy_bag_refill_wait = 10
 
         self.one_time_headers = []
         self.logger = logging.getLogger(__name__)
@@ -146,17 +218,22 @@ class BaseCarpetBag(object):
         url = ct.url_add_missing_protocol(url)
         headers = self.headers
         urllib3.disable_warnings(InsecureRequestWarning)
+        self._circuit_check(url)
+        self._robots_check(method, url)
         self._start_request_manifest(method, url, payload)
         self._increment_counters()
         self._handle_sleep(url)
 
         response = self._make(method, url, headers, payload)
+        self._circuit_success(url)
         if response.status_code >= 500:
             self.logger.warning("URL %s Received a server error response <%s>" % (url, response.status_code))
             self.logger.debug(response.text)
 
         roundtrip = self._after_request(ts_start, url, response)
         response.roundtrip = roundtrip
+        self._fingerprint_response(method, response)
+        self._record_proxy_health(not self._proxy_error_response(url, response), roundtrip, url)
 
         self._end_manifest(response, response.roundtrip)
         self.logger.debug("Response took %s for %s" % (roundtrip, url))
@@ -169,7 +246,7 @@ class BaseCarpetBag(object):
     def _handle_sleep(self, url):
         """
         Sets CarpetBag to sleep if we are making a request to the same server in less time then the value of
-        self.mininum_wait_time allows for.
+        self.mininum_wait_time, or the server's robots.txt Crawl-delay if it's longer, allows for.
         @unit-tested: carpetbag/tests/test_base_carpetbag.py.test__handle_sleep
 
         :param url: The url being requested.
@@ -177,7 +254,11 @@ class BaseCarpetBag(object):
         :returns: True if sleep runs successfully.
         :rtype: bool
         """
-        if not self.mininum_wait_time:
+        wait_time = self.mininum_wait_time
+        if self.robots_cache is not None:
+            wait_time = max(wait_time, self.robots_cache.crawl_delay(url) or 0)
+
+        if not wait_time:
             return True
 
         if not self.last_request_time:
@@ -191,8 +272,8 @@ class BaseCarpetBag(object):
 
         # Checks the time of the last request and sets the sleep timer for the difference.
         diff_time = datetime.now() - self.last_request_time
-        if diff_time.seconds < self.mininum_wait_time:
-            sleep_time = self.mininum_wait_time - diff_time.seconds
+        if diff_time.seconds < wait_time:
+            sleep_time = wait_time - diff_time.seconds
             self.logger.debug("Sleeping %s seconds before next request.")
             time.sleep(sleep_time)
 
@@ -211,6 +292,10 @@ class BaseCarpetBag(object):
         if self.send_user_agent:
             send_headers["User-Agent"] = self.send_user_agent
 
+        # The random user agent's companion headers go first, so the end-user's headers can override them.
+        for key, value in self.identity_headers.items():
+            send_headers[key] = value
+
         for key, value in self.headers.items():
             send_headers[key] = value
 
@@ -292,7 +377,7 @@ class BaseCarpetBag(object):
 
         # Setup Proxy if we have one, and we're not sending an "internal" to bad-actor.services request.
         if self.proxy and not internal:
-            request_args["proxies"] = self.proxy
+            request_args["proxies"] = self._proxy_for_url(url)
 
         # Setup payload if we have it.
         if payload:
@@ -336,14 +421,17 @@ class BaseCarpetBag(object):
 
         try:
             self.logger.debug("Request args: %s" % str(request_args))
-            response = requests.request(**request_args)
+            session = self.session_pool.get(request_args.get("proxies"))
+            response = session.request(**request_args)
 
         # Catch Connection Refused Error. This is probably happening because of a bad proxy.
         # Catch an error with the connection to the Proxy
         except requests.exceptions.ProxyError:
+            proxy = self._proxy_used(url)
             if self.random_proxy_bag:
                 self.logger.debug("Hit a proxy error, picking a new one from proxy bag and continuing.")
                 self.manifest[0]["errors"].append("ProxyError")
+                self._record_proxy_health(False, url=url)
                 if self.send_usage_stats_val:
                     self._send_usage_stats(False)
                     raise requests.exceptions.ProxyError
@@ -355,7 +443,7 @@ class BaseCarpetBag(object):
                 raise requests.exceptions.ProxyError
 
             if self.random_proxy_bag:
-                self.reset_proxy_from_bag()
+                self._drop_proxy(proxy)
 
             retry += 1
 
@@ -455,7 +543,7 @@ class BaseCarpetBag(object):
 
         try:
             urllib3.disable_warnings(InsecureRequestWarning)
-            response = requests.request(**request_args)
+            response = self.session_pool.get().request(**request_args)
         except requests.exceptions.ConnectionError:
             raise errors.NoRemoteServicesConnection("Cannot connect to bad-actor.services API")
 
@@ -523,6 +611,8 @@ class BaseCarpetBag(object):
         :returns: FlaskRestless style query filter.
         :rtype: dict
         """
+        import arrow
+
         one_week_ago = ct.date_to_json(
             arrow.utcnow().datetime - timedelta(weeks=self.public_proxies_max_last_test_weeks))
         return dict(
@@ -545,6 +635,531 @@ class BaseCarpetBag(object):
             op=">",
             val=0)
 
+    def _fetch_public_proxies(self, continent=""):
+        """
+        Fetches the public proxy list from bad-actor.services. This does not touch self.proxy_bag so it is safe to run
+        from a background thread.
+
+        :param continent: Filters proxies to a single continent or list of continents.
+        :type continent: str or list
+        :returns: The proxies fetched, or False if the response could not be read.
+        :rtype: list or bool
+        :raises: carpetbag.errors.NoRemoteServicesConnection
+        """
+        try:
+            payload = {}
+            if continent:
+                payload = {
+                    "continent": continent,
+                }
+            response = self._make_internal("proxies", payload)
+        except errors.NoRemoteServicesConnection:
+            logging.error("Unable to connect to Bad-Actor.Services")
+            raise errors.NoRemoteServicesConnection
+
+        try:
+            return response.json()["objects"]
+        except Exception:
+            logging.error("ERROR: Could not get proxies. %s" % response.text)
+            return False
+
+    def _proxy_cache_key(self, continent):
+        """
+        Creates the proxy cache key for a continent filter.
+
+        :param continent: The continent filter used to fetch proxies.
+        :type continent: str or list
+        :returns: The cache key.
+        :rtype: str
+        """
+        if not continent:
+            return "all"
+        if isinstance(continent, list):
+            return ",".join(continent)
+        return continent
+
+    def _refresh_proxy_cache(self, continent="", background=False):
+        """
+        Refetches the public proxy list into the proxy cache. Only one process on the host refreshes at a time, the
+        others keep using the stale list until it's been refreshed.
+
+        :param continent: The continent filter used to fetch proxies.
+        :type continent: str or list
+        :param background: Run the refresh in a daemon thread.
+        :type background: bool
+        :returns: Whether or not a refresh was started.
+        :rtype: bool
+        """
+        if background:
+            thread = threading.Thread(target=self._refresh_proxy_cache, args=(continent,))
+            thread.daemon = True
+            thread.start()
+            return True
+
+        proxy_cache = self.proxy_cache
+        with proxy_cache.try_refresh_lock() as locked:
+            if not locked:
+                self.logger.debug("Proxy cache is already being refreshed by another process.")
+                return False
+
+            try:
+                proxies = self._fetch_public_proxies(continent)
+            except errors.NoRemoteServicesConnection:
+                return False
+
+            if proxies is False:
+                return False
+
+            proxy_cache.set(self._proxy_cache_key(continent), proxies)
+            self.logger.debug("Refreshed proxy cache with %s proxies" % len(proxies))
+
+        return True
+
+    def _check_proxy_bag_low_water(self):
+        """
+        Starts a background proxy bag refill if refills are enabled, the bag has fallen below the low water mark and a
+        refill is not already running.
+
+        :returns: Whether or not a refill was started.
+        :rtype: bool
+        """
+        if not self.proxy_bag_low_water_mark:
+            return False
+
+        if len(self.proxy_bag) >= self.proxy_bag_low_water_mark:
+            return False
+
+        if self.proxy_bag_refill_thread and self.proxy_bag_refill_thread.is_alive():
+            return False
+
+        self.logger.debug("Proxy bag is down to %s proxies, refilling in the background." % len(self.proxy_bag))
+        self.proxy_bag_refill_thread = threading.Thread(target=self._refill_proxy_bag)
+        self.proxy_bag_refill_thread.daemon = True
+        self.proxy_bag_refill_thread.start()
+
+        return True
+
+    def _wait_for_proxy_bag_refill(self):
+        """
+        Waits for a running background refill to finish, for when the proxy bag is empty.
+
+        :returns: Whether or not the proxy bag has proxies in it now.
+        :rtype: bool
+        """
+        if not self.proxy_bag_refill_thread or not self.proxy_bag_refill_thread.is_alive():
+            self._check_proxy_bag_low_water()
+
+        if self.proxy_bag_refill_thread:
+            self.proxy_bag_refill_thread.join(self.proxy_bag_refill_wait)
+
+        return len(self.proxy_bag) > 0
+
+    def _refill_proxy_bag(self):
+        """
+        Fetches fresh proxies, validates them and merges them into the back of the proxy bag. Proxies already in the
+        bag, or which have already been used and removed from the bag, are skipped. This runs in a background thread.
+
+        :returns: The number of proxies added to the bag.
+        :rtype: int
+        """
+        try:
+            proxies = self._fetch_public_proxies(self.proxy_bag_continent)
+        except errors.NoRemoteServicesConnection:
+            return 0
+
+        if not proxies:
+            return 0
+
+        if self.proxy_cache:
+            self.proxy_cache.set(self._proxy_cache_key(self.proxy_bag_continent), proxies)
+
+        with self.proxy_bag_lock:
+            skip = set(proxy["address"] for proxy in self.proxy_bag) | self.proxy_bag_spent
+        proxies = [proxy for proxy in proxies if proxy["address"] not in skip]
+        shuffle(proxies)
+
+        if self.proxy_bag_validate and proxies:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                validated = list(executor.map(self._validate_proxy, proxies))
+            proxies = [proxy for proxy, valid in zip(proxies, validated) if valid]
+
+        with self.proxy_bag_lock:
+            in_bag = set(proxy["address"] for proxy in self.proxy_bag)
+            proxies = [proxy for proxy in proxies if proxy["address"] not in in_bag]
+            self.proxy_bag.extend(proxies)
+
+        self.logger.debug("Added %s proxies to the proxy bag." % len(proxies))
+        return len(proxies)
+
+    def _validate_proxy(self, proxy):
+        """
+        Checks that a proxy is accepting connections, without making a full request through it.
+
+        :param proxy: The proxy from bad-actor.services.
+        :type proxy: dict
+        :returns: Whether or not the proxy accepted a connection.
+        :rtype: bool
+        """
+        try:
+            conn = socket.create_connection((proxy["ip"], proxy["port"]), self.proxy_bag_validate_timeout)
+        except (socket.error, socket.timeout):
+            self.logger.debug("Proxy %s did not accept a connection." % proxy["address"])
+            return False
+
+        conn.close()
+        return True
+
+    def _proxy_error_response(self, url, response):
+        """
+        Checks if a response came from the proxy rather than the site, because the proxy couldn't make the request. A
+        407 always comes from a proxy. A 502 only does for plain http urls, as https requests are tunneled and a proxy
+        which can't open the tunnel raises a ProxyError instead, so a 502 there is the site's own.
+
+        :param url: The url requested.
+        :type url: str
+        :param response: The response.
+        :type response: <Requests.response> obj
+        :returns: Whether or not the response is the proxy's error.
+        :rtype: bool
+        """
+        if response.status_code not in PROXY_ERROR_STATUSES or not self._proxy_address(url):
+            return False
+        if response.status_code == 407:
+            return True
+        return url.startswith("http://")
+
+    def _proxy_failed_recently(self, address):
+        """
+        Checks if a proxy failed within the last self.proxy_failure_ttl seconds. Older failures are forgotten, so a
+        proxy which had a bad moment can be a domain's sticky proxy again.
+
+        :param address: The proxy's address.
+        :type address: str
+        :returns: Whether or not the proxy failed recently.
+        :rtype: bool
+        """
+        failed_at = self.proxy_failed.get(address)
+        if failed_at is None:
+            return False
+        if time.time() - failed_at < self.proxy_failure_ttl:
+            return True
+
+        self.proxy_failed.pop(address, None)
+        return False
+
+    def _record_proxy_health(self, success, roundtrip=None, url=None, proxy=None):
+        """
+        Records the outcome of a request through a proxy. Only proxy and connection errors count as a failure, not the
+        site's own error responses. A failed proxy is no longer used as the sticky proxy for any domain until its
+        failure expires, and if the proxy cache is enabled the outcome goes into its local health stats.
+
+        :param success: Whether or not the request through the proxy worked.
+        :type success: bool
+        :param roundtrip: The round trip time of the request in milliseconds.
+        :type roundtrip: int
+        :param url: The url requested, to find the sticky proxy used for the url's domain.
+        :type url: str
+        :param proxy: The proxy the request went through, defaults to the one used for the url.
+        :type proxy: dict
+        :returns: Whether or not the outcome was recorded.
+        :rtype: bool
+        """
+        proxy = proxy or self._proxy_used(url)
+        if url and self.sticky_proxies and not success:
+            self.proxy_domain_map.pop(ct.url_domain(url), None)
+
+        if not proxy:
+            return False
+
+        if success:
+            self.proxy_failed.pop(proxy["address"], None)
+        else:
+            self.proxy_failed[proxy["address"]] = time.time()
+            self.session_pool.discard(self._proxy_dict(proxy))
+
+        if self.proxy_cache:
+            self.proxy_cache.record(proxy["address"], success, roundtrip)
+
+        return True
+
+    def _proxy_used(self, url=None):
+        """
+        Gets the proxy from the proxy bag that a request to the url goes through, taking sticky proxies into account.
+
+        :param url: The url requested.
+        :type url: str
+        :returns: The proxy from bad-actor.services, or an empty dict if there's no proxy bag proxy in use.
+        :rtype: dict
+        """
+        if url and self.sticky_proxies:
+            return self.proxy_domain_map.get(ct.url_domain(url), self.proxy_current)
+        return self.proxy_current
+
+    def _proxy_for_url(self, url):
+        """
+        Gets the proxy to send a request through. When sticky proxies are enabled, each domain keeps using the first
+        proxy it was requested through for as long as that proxy keeps working, even as the current proxy rotates, so
+        repeat requests to a site reuse a warm connection.
+
+        :param url: The url being requested.
+        :type url: str
+        :returns: The Requests style proxies dict.
+        :rtype: dict
+        """
+        if not self.sticky_proxies or not self.proxy_current:
+            return self.proxy
+
+        domain = ct.url_domain(url)
+        proxy = self.proxy_domain_map.get(domain)
+        if proxy and not self._proxy_failed_recently(proxy["address"]):
+            return self._proxy_dict(proxy)
+
+        self.proxy_domain_map[domain] = self.proxy_current
+        return self.proxy
+
+    def _drop_proxy(self, proxy):
+        """
+        Drops a failed proxy out of the proxy bag, and off every domain it's the sticky proxy for. If it's the current
+        proxy, the next one is selected from the bag, otherwise the current proxy is kept.
+
+        :param proxy: The proxy from bad-actor.services that failed.
+        :type proxy: dict
+        :raises: carpetbag.erros.EmptyProxyBag
+        """
+        if not proxy or proxy["address"] == self.proxy_current.get("address"):
+            self.reset_proxy_from_bag()
+            return
+
+        self.logger.debug("Dropping sticky proxy %s" % proxy["address"])
+        with self.proxy_bag_lock:
+            self._remove_from_proxy_bag(proxy)
+
+        for domain, domain_proxy in list(self.proxy_domain_map.items()):
+            if domain_proxy["address"] == proxy["address"]:
+                self.proxy_domain_map.pop(domain, None)
+
+    def _rotate_proxy(self, url):
+        """
+        Sends the retry of a failed request through a different proxy, without dropping the one which failed. The
+        proxy is moved to the back of the proxy bag, and is no longer the url domain's sticky proxy. Used while it isn't
+        known yet whether the proxy or the host is at fault.
+
+        :param url: The url requested.
+        :type url: str
+        """
+        proxy = self._proxy_used(url)
+        if url and self.sticky_proxies:
+            self.proxy_domain_map.pop(ct.url_domain(url), None)
+
+        if not proxy or proxy["address"] != self.proxy_current.get("address"):
+            return
+
+        with self.proxy_bag_lock:
+            others = [bag_proxy for bag_proxy in self.proxy_bag if bag_proxy["address"] != proxy["address"]]
+            if not others:
+                return
+            self.proxy_bag[:] = others + [proxy]
+            self.proxy_current = self.proxy_bag[0]
+            self.proxy = self._proxy_dict(self.proxy_current)
+
+        self.logger.debug("Retrying through proxy %s" % self.proxy_current["address"])
+
+    def _find_proxy(self, address):
+        """
+        Finds a proxy from bad-actor.services by its address, in the proxy bag or the sticky proxies.
+
+        :param address: The proxy's address.
+        :type address: str
+        :returns: The proxy, or None if it's not in use anymore.
+        :rtype: dict
+        """
+        with self.proxy_bag_lock:
+            for proxy in self.proxy_bag:
+                if proxy["address"] == address:
+                    return proxy
+
+        for proxy in list(self.proxy_domain_map.values()):
+            if proxy["address"] == address:
+                return proxy
+
+        return None
+
+    def _remove_from_proxy_bag(self, proxy):
+        """
+        Removes a proxy from the proxy bag by its address, wherever it is in the bag, and marks it as used. Call with
+        the proxy_bag_lock held.
+
+        :param proxy: The proxy from bad-actor.services.
+        :type proxy: dict
+        """
+        self.proxy_bag_spent.add(proxy["address"])
+        self.proxy_bag[:] = [bag_proxy for bag_proxy in self.proxy_bag if bag_proxy["address"] != proxy["address"]]
+
+    def _proxy_address(self, url=None):
+        """
+        Gets the address of the proxy a request to the url goes through, from the proxy bag or set by hand.
+
+        :param url: The url requested.
+        :type url: str
+        :returns: The proxy's address, or None if no proxy is in use.
+        :rtype: str
+        """
+        proxy = self._proxy_used(url)
+        if proxy:
+            return proxy["address"]
+
+        for address in self.proxy.values():
+            return address
+
+        return None
+
+    def _proxy_dict(self, proxy):
+        """
+        Creates the Requests style proxies dict for a proxy from the proxy bag.
+
+        :param proxy: The proxy from bad-actor.services.
+        :type proxy: dict
+        :returns: The Requests style proxies dict.
+        :rtype: dict
+        """
+        if proxy["ssl"]:
+            return {"https": proxy["address"]}
+        return {"http": proxy["address"]}
+
+    def _circuit_check(self, url):
+        """
+        Fails fast if circuit breakers are enabled and the url's host has an open breaker.
+
+        :param url: The url being requested.
+        :type url: str
+        :returns: True if the request may go out.
+        :rtype: bool
+        :raises: carpetbag.errors.CircuitOpen
+        """
+        if not self.host_breakers:
+            return True
+
+        host = ct.url_host(url)
+        if not self.host_breakers.get(host).allow():
+            self.logger.warning("Circuit breaker is open for %s, failing fast." % host)
+            raise errors.CircuitOpen(host)
+
+        return True
+
+    def _robots_check(self, method, url):
+        """
+        Fails fast if robots.txt is being obeyed and the url's host disallows it, before any request goes out. Only GET
+        and HEAD requests are checked.
+
+        :param method: The method for the request.
+        :type method: str
+        :param url: The url being requested.
+        :type url: str
+        :returns: True if the request may go out.
+        :rtype: bool
+        :raises: carpetbag.errors.DisallowedByRobots
+        """
+        if self.robots_cache is None or method not in ["GET", "HEAD"]:
+            return True
+
+        if not self.robots_cache.allowed(url):
+            self.logger.info("Url %s is disallowed by robots.txt." % url)
+            raise errors.DisallowedByRobots(url)
+
+        return True
+
+    def _fetch_robots(self, url):
+        """
+        Fetches a robots.txt for the robots cache, through the current proxy but outside of the request manifest.
+
+        :param url: The robots.txt url.
+        :type url: str
+        :returns: The response's status code and body.
+        :rtype: tuple
+        """
+        request_args = self._fmt_request_args("GET", self._get_headers(), url)
+        request_args["timeout"] = 10
+        session = self.session_pool.get(request_args.get("proxies"))
+        response = session.request(**request_args)
+        try:
+            return response.status_code, response.text
+        finally:
+            response.close()
+
+    def _circuit_success(self, url):
+        """
+        Closes the url host's and the proxy's circuit breakers after the host answered a request. The host is healthy,
+        so the other proxies which failed to reach it since it last answered are blamed for those failures.
+
+        :param url: The url requested.
+        :type url: str
+        """
+        proxy_address = self._proxy_address(url)
+        if self.host_breakers:
+            failed = self.host_breakers.get(ct.url_host(url)).success()
+            for address, failures in failed.items():
+                if address and address != proxy_address:
+                    self._proxy_circuit_failure(address, failures)
+
+        proxy = self._proxy_used(url)
+        if self.proxy_breakers and proxy:
+            self.proxy_breakers.get(proxy["address"]).success()
+
+    def _circuit_failure(self, url, proxy_address=None):
+        """
+        Records a connection failure against the url host's circuit breaker, and fails fast if that opens it. When the
+        proxy bag can rotate to another proxy, a failure through a proxy only counts against the host once failures
+        come from at least two proxies, or from a request without one. A single fixed proxy can't be told apart from
+        the host, so its failures count against the host straight away.
+
+        :param url: The url requested.
+        :type url: str
+        :param proxy_address: The proxy the request went through.
+        :type proxy_address: str
+        :raises: carpetbag.errors.CircuitOpen
+        """
+        if not self.host_breakers:
+            return
+
+        host = ct.url_host(url)
+        min_sources = 2 if self.random_proxy_bag and len(self.proxy_bag) > 1 else 1
+        if not self.host_breakers.get(host).failure(proxy_address, min_sources):
+            return
+
+        self.logger.error("Circuit breaker opened for %s, failing fast." % host)
+        if self.manifest:
+            self.manifest[0]["errors"].append("CircuitOpen")
+        raise errors.CircuitOpen(host)
+
+    def _proxy_circuit_failure(self, address, failures=1):
+        """
+        Records connection failures against a proxy's circuit breaker, once the host it failed to reach is known to be
+        healthy. If the breaker opens, the proxy is dropped from the proxy bag.
+
+        :param address: The proxy's address.
+        :type address: str
+        :param failures: The number of failures to record.
+        :type failures: int
+        :returns: Whether or not the proxy was dropped.
+        :rtype: bool
+        """
+        breaker = self.proxy_breakers.get(address)
+        opened = False
+        for _ in range(failures):
+            opened = breaker.failure()
+
+        proxy = self._find_proxy(address)
+        if not opened or not proxy:
+            return False
+
+        self.logger.warning("Circuit breaker opened for proxy %s, dropping it." % address)
+        self._record_proxy_health(False, proxy=proxy)
+        self._drop_proxy(proxy)
+
+        return True
+
     def _handle_connection_error(self, method, url, headers, payload, retry):
         """
         Handles a connection error. If self.wait_and_retry_on_connection_error has a value other than 0 we will wait
@@ -563,8 +1178,16 @@ class BaseCarpetBag(object):
         """
         self.logger.error("Unable to connect to: %s" % url)
 
+        # The host is counted against first. With circuit breakers on, the proxy is only blamed once the host answers
+        # through another one, so the retry goes out through the next proxy without dropping this one.
+        self._circuit_failure(url, self._proxy_address(url))
         if self.random_proxy_bag:
-            self.reset_proxy_from_bag()
+            if self.proxy_breakers:
+                self._rotate_proxy(url)
+            else:
+                proxy = self._proxy_used(url)
+                self._record_proxy_health(False, url=url)
+                self._drop_proxy(proxy)
 
         if not self.retries_on_connection_failure:
             raise ConnectionError
@@ -583,6 +1206,38 @@ class BaseCarpetBag(object):
 
         return self._make(method, url, headers, payload, retry)
 
+    def _read_head(self, response, max_bytes=32768, chunk_size=4096):
+        """
+        Reads a streamed response's body until the end of its <head> tag or max_bytes, then closes the response so the
+        rest of the body is never downloaded.
+        @unit-tested: carpetbag/tests/test_base_carpetbag.py.test__read_head
+
+        :param response: The streamed response.
+        :type response: <Response> obj
+        :param max_bytes: The most bytes to read.
+        :type max_bytes: int
+        :param chunk_size: The number of bytes to read at a time.
+        :type chunk_size: int
+        :returns: The bytes read.
+        :rtype: bytes
+        """
+        head = bytearray()
+        try:
+            for chunk in response.iter_content(chunk_size):
+                # Search only the new chunk, plus enough of the last one to catch a tag split across them.
+                start = max(0, len(head) - len(HEAD_END) + 1)
+                head.extend(chunk)
+                end = bytes(head[start:]).lower().find(HEAD_END)
+                if end != -1:
+                    del head[start + end + len(HEAD_END):]
+                    break
+                if len(head) >= max_bytes:
+                    break
+        finally:
+            response.close()
+
+        return bytes(head[:max_bytes])
+
     def _after_request(self, ts_start, url, response):
         """
         Runs after request operations, sets counters and run times. This Should be called before any raised known
@@ -608,6 +1263,66 @@ class BaseCarpetBag(object):
 
         return roundtrip
 
+    def _fingerprint_response(self, method, response):
+        """
+        Sets a successful GET response's text up to be SimHash fingerprinted when use_simhash() is on. GET responses
+        are streamed, so the fingerprint is taken when the content is first read, ie by response.text, rather than
+        reading every body here. Reading response.simhash or response.near_duplicate reads the content too.
+        @unit-tested: carpetbag/tests/test_simhash.py.test__fingerprint_response
+
+        :param method: The request method.
+        :type method: str
+        :param response: The <Response> object from <Requests>
+        :type response: <Response> object
+        :returns: Whether or not the response will be fingerprinted.
+        :rtype: bool
+        """
+        if self.simhash_index is None or method != "GET" or not 200 <= response.status_code < 300:
+            return False
+
+        content_type = response.headers.get("Content-Type", "")
+        if content_type and "html" not in content_type and "text" not in content_type:
+            return False
+
+        index = self.simhash_index
+        manifest = self.manifest[0] if self.manifest else None
+        url = response.url
+        response.__class__ = FingerprintedResponse
+        response.fingerprinter = lambda content: self._fingerprint_content(index, url, content, content_type, manifest)
+
+        return True
+
+    def _fingerprint_content(self, index, url, content, content_type, manifest=None):
+        """
+        Takes the SimHash fingerprint of a response's text, and looks for a near duplicate in the fingerprints seen so
+        far. The fingerprint and the url of any near duplicate are set on the request's manifest, then the fingerprint
+        is added to the index.
+        @unit-tested: carpetbag/tests/test_simhash.py.test__fingerprint_response
+
+        :param index: The fingerprint index the request was made with.
+        :type index: <SimHashIndex> obj
+        :param url: The url of the response.
+        :type url: str
+        :param content: The response's body.
+        :type content: bytes
+        :param content_type: The response's Content-Type header.
+        :type content_type: str
+        :param manifest: The manifest of the request, if there is one.
+        :type manifest: dict
+        :returns: The fingerprint and the url of any near duplicate.
+        :rtype: tuple
+        """
+        fingerprint = simhash.fingerprint_html(charset.decode(content, content_type))
+        match = index.find(fingerprint)
+        near_duplicate = match[0] if match else None
+        if manifest is not None:
+            manifest["simhash"] = fingerprint
+            manifest["near_duplicate"] = near_duplicate
+
+        index.add(fingerprint, url)
+
+        return fingerprint, near_duplicate
+
     def _increment_counters(self):
         """
         Add one to each request counter after a request has been made.
@@ -629,6 +1344,8 @@ class BaseCarpetBag(object):
         :returns: The newly created manifest record.
         :type: dict
         """
+        import arrow
+
         new_manifest = {
             "method": method,
             "url": url,
@@ -659,6 +1376,8 @@ class BaseCarpetBag(object):
         :type: bool
         """
         if success:
+            import arrow
+
             self.manifest[0]["date_end"] = arrow.utcnow().datetime
             self.manifest[0]["roundtrip"] = roundtrip
             self.manifest[0]["response"] = response
@@ -684,12 +1403,15 @@ class BaseCarpetBag(object):
 
     def _send_usage_stats(self, success=True):
         """
-        Sends the usage stats to bad-actor.services if sending usage stats is enabled, and the user has an API key
-        ready to go.
+        Queues the usage stats for bad-actor.services if sending usage stats is enabled, and the user has an API key
+        ready to go. The reports are sent in batches by the background UsageStatsReporter.
 
         :param success: The success or failure of a request that we are sending data about.
         :type success: bool
         """
+        if not self.send_usage_stats_val or not self.usage_stats_reporter:
+            return False
+
         if not self.random_proxy_bag:
             self.logger.debug("USAGE STATS: Not using random public proxy, not sending usage metrics.")
             return False
@@ -718,11 +1440,26 @@ class BaseCarpetBag(object):
 
         usage_payload["score"] = proxy_score
 
+        return self.usage_stats_reporter.report(usage_payload)
+
+    def _post_usage_report(self, usage_payload):
+        """
+        Sends a single usage report to bad-actor.services, this is called from the UsageStatsReporter's background
+        thread.
+
+        :param usage_payload: The proxy report.
+        :type usage_payload: dict
+        :returns: Whether or not bad-actor.services accepted the report.
+        :rtype: bool
+        :raises: carpetbag.errors.NoRemoteServicesConnection
+        """
         internal_request = self._make_internal("proxy_reports", usage_payload)
         if internal_request.status_code in [200, 201]:
             self.logger.debug("Saved request to bad-actor")
-        else:
-            self.logger.error("Had an issue saving response: %s" % internal_request.json())
+            return True
+
+        self.logger.error("Had an issue saving response: %s" % internal_request.text)
+        return False
 
     def _determine_save_file_name(self, url, content_type, destination):
         """
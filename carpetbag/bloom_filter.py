@@ -0,0 +1,252 @@
+"""Bloom Filter
+Memory bounded "have we seen this" sets for crawling. A Bloom filter never forgets something it's seen, and only says
+it's seen something it hasn't at the configured false positive rate, in a small fraction of the memory of a set.
+
+ScalableBloomFilter grows by adding filters, each bigger and with a tighter error rate than the last, so the overall
+false positive rate stays under the configured one however many items are added. Filters save to a single file, and
+load back with mmap so a big filter isn't read into memory up front.
+
+    seen = ScalableBloomFilter(error_rate=0.0001)
+    new_links = bloom_filter.filter_seen(seen, links["local"])
+
+"""
+from hashlib import blake2b
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+
+from . import carpet_tools as ct
+
+MAGIC = b"CBBLOOM1"
+HEADER = struct.Struct(">8sI")
+
+
+def filter_seen(seen, urls):
+    """
+    Drops the urls already in a seen set, and adds the rest to it. Urls are canonicalized first, so the same page
+    linked two different ways is only kept once.
+
+    :param seen: The seen set, a BloomFilter or ScalableBloomFilter.
+    :type seen: <ScalableBloomFilter> obj
+    :param urls: The urls to filter.
+    :type urls: list
+    :returns: The urls which weren't in the seen set, in their original order and form.
+    :rtype: list
+    """
+    return [url for url in urls if seen.add(ct.url_canonical(url))]
+
+
+class BloomFilter(object):
+
+    def __init__(self, capacity=100000, error_rate=0.001, bits=None, count=0):
+        """
+        Creates a fixed size Bloom filter.
+
+        :param capacity: The number of items the filter holds at error_rate.
+        :type capacity: int
+        :param error_rate: The false positive rate once the filter holds capacity items.
+        :type error_rate: float
+        :param bits: The filter's bit array, when loading a saved filter.
+        :type bits: bytearray or memoryview
+        :param count: The number of items in the loaded filter.
+        :type count: int
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+
+    def __repr__(self):
+        return "<BloomFilter %s/%s p=%s>" % (self.count, self.capacity, self.error_rate)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, item):
+        bits = self.bits
+        for position in self._positions(item):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, item):
+        """
+        Adds an item to the filter.
+
+        :param item: The item.
+        :type item: str or bytes
+        :returns: Whether or not the item was new to the filter.
+        :rtype: bool
+        """
+        bits = self.bits
+        new = False
+        for position in self._positions(item):
+            index = position >> 3
+            mask = 1 << (position & 7)
+            if not bits[index] & mask:
+                bits[index] |= mask
+                new = True
+
+        if new:
+            self.count += 1
+        return new
+
+    def full(self):
+        """
+        Checks if the filter is holding its capacity.
+
+        :returns: Whether or not the filter is full.
+        :rtype: bool
+        """
+        return self.count >= self.capacity
+
+    def _positions(self, item):
+        """
+        Gets the bit positions for an item, by double hashing one BLAKE2b digest.
+
+        :param item: The item.
+        :type item: str or bytes
+        :returns: The bit positions.
+        :rtype: generator
+        """
+        if isinstance(item, str):
+            item = item.encode("utf-8")
+        digest = blake2b(item, digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "big")
+        second = int.from_bytes(digest[8:], "big") | 1
+        num_bits = self.num_bits
+        return ((first + index * second) % num_bits for index in range(self.num_hashes))
+
+
+class ScalableBloomFilter(object):
+
+    def __init__(self, initial_capacity=100000, error_rate=0.001, growth=2, tightening=0.5):
+        """
+        Creates a Bloom filter which grows as items are added.
+
+        :param initial_capacity: The capacity of the first filter.
+        :type initial_capacity: int
+        :param error_rate: The most the overall false positive rate can be.
+        :type error_rate: float
+        :param growth: How much bigger each new filter is than the last.
+        :type growth: int
+        :param tightening: How much smaller each new filter's error rate is than the last.
+        :type tightening: float
+        """
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.filters = []
+        self.lock = threading.Lock()
+        self.mmap = None
+
+    def __repr__(self):
+        return "<ScalableBloomFilter %s items %s filters>" % (len(self), len(self.filters))
+
+    def __len__(self):
+        return sum(bloom.count for bloom in self.filters)
+
+    def __contains__(self, item):
+        return any(item in bloom for bloom in reversed(self.filters))
+
+    def add(self, item):
+        """
+        Adds an item, growing the filter if it's full.
+
+        :param item: The item.
+        :type item: str or bytes
+        :returns: Whether or not the item was new to the filter.
+        :rtype: bool
+        """
+        with self.lock:
+            if item in self:
+                return False
+
+            if not self.filters or self.filters[-1].full():
+                self._grow()
+            return self.filters[-1].add(item)
+
+    def save(self, path):
+        """
+        Saves the filter to a file, atomically.
+
+        :param path: The file to save to.
+        :type path: str
+        """
+        with self.lock:
+            header = {
+                "initial_capacity": self.initial_capacity,
+                "error_rate": self.error_rate,
+                "growth": self.growth,
+                "tightening": self.tightening,
+                "filters": [
+                    {"capacity": bloom.capacity, "error_rate": bloom.error_rate, "count": bloom.count}
+                    for bloom in self.filters],
+            }
+            header = json.dumps(header).encode("utf-8")
+
+            tmp_path = "%s.%s.tmp" % (path, os.getpid())
+            with open(tmp_path, "wb") as phile:
+                phile.write(HEADER.pack(MAGIC, len(header)))
+                phile.write(header)
+                for bloom in self.filters:
+                    phile.write(bloom.bits)
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, use_mmap=True):
+        """
+        Loads a saved filter. With mmap the bit arrays are paged in from the file as they're used, copy on write, so
+        adding to the loaded filter never changes the file until it's saved.
+
+        :param path: The file to load.
+        :type path: str
+        :param use_mmap: Map the file into memory rather than reading it.
+        :type use_mmap: bool
+        :returns: The loaded filter.
+        :rtype: <ScalableBloomFilter> obj
+        :raises: ValueError if the file isn't a saved filter.
+        """
+        with open(path, "rb") as phile:
+            if use_mmap:
+                data = mmap.mmap(phile.fileno(), 0, access=mmap.ACCESS_COPY)
+            else:
+                data = bytearray(phile.read())
+
+        magic, header_length = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("%s is not a saved Bloom filter" % path)
+        offset = HEADER.size + header_length
+        header = json.loads(bytes(data[HEADER.size:offset]).decode("utf-8"))
+
+        scalable = cls(header["initial_capacity"], header["error_rate"], header["growth"], header["tightening"])
+        view = memoryview(data)
+        for saved in header["filters"]:
+            bloom = BloomFilter(saved["capacity"], saved["error_rate"], count=saved["count"])
+            length = len(bloom.bits)
+            bloom.bits = view[offset:offset + length]
+            scalable.filters.append(bloom)
+            offset += length
+
+        if use_mmap:
+            scalable.mmap = data
+        return scalable
+
+    def _grow(self):
+        """
+        Adds a new filter, bigger and with a tighter error rate than the last. The first filter gets error_rate times
+        (1 - tightening), so the sum of every filter's error rate stays under error_rate.
+
+        """
+        count = len(self.filters)
+        capacity = self.initial_capacity * (self.growth ** count)
+        error_rate = self.error_rate * (1 - self.tightening) * (self.tightening ** count)
+        self.filters.append(BloomFilter(capacity, error_rate))
+
+# EndFile: carpetbag/carpetbag/bloom_filter.py
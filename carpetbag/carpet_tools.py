@@ -1,12 +1,10 @@
 """Carpet Tools
 A series of tools for use in and outside of CarpetBag internally. Mostly for ease of handling urls.
+tld, arrow and pytz are imported by the tools which use them, so they're only loaded on first use.
 
 """
-import pytz
 import re
-
-import arrow
-import tld
+from urllib.parse import urlparse, urlsplit, urlunsplit
 
 from . import xlate_extension_mime as xetm
 
@@ -121,6 +119,8 @@ def url_subdomain(url):
     :returns: All subdomains within a url in order.
     :rtype: list
     """
+    import tld
+
     subdomain = ""
     try:
         tld_res = tld.get_tld(url, as_object=True)
@@ -162,12 +162,26 @@ def url_domain(url):
     if "//localhost" in url:
         return "localhost"
 
+    import tld
+
     try:
         return tld.get_fld(url)
     except tld.exceptions.TldDomainNotFound:
         return ""
 
 
+def url_host(url):
+    """
+    Gets the host and port a url is requesting to, ie "www.bad-actor.services:5000".
+
+    :param url: The url to disect.
+    :type url: str
+    :returns: The lower cased host, with the port if one is in the url.
+    :rtype: str
+    """
+    return urlparse(url_add_missing_protocol(url)).netloc.lower()
+
+
 def url_port(url):
     """
     Gets the URL's port.
@@ -200,6 +214,8 @@ def url_tld(url):
     :returns: The url's top level domain.
     :rtype: str
     """
+    import tld
+
     try:
         return tld.get_tld(url)
     except tld.exceptions.TldDomainNotFound:
@@ -294,6 +310,42 @@ def url_create(url_segs, omit_standard_ports=True):
     return full_url
 
 
+def url_canonical(url):
+    """
+    Gets the canonical form of a url, so the same page reached through different links compares equal. The scheme
+    and host are lower cased, standard ports, the fragment and dot segments are dropped, an empty path becomes "/" and
+    the query parameters are sorted.
+    Example: url = "HTTP://WWW.Bad-Actor.services:80/a/./b/../c?z=1#top" == "http://www.bad-actor.services/a/c?z=1"
+
+    :param url: The url to canonicalize.
+    :type url: str
+    :returns: The canonical url.
+    :rtype: str
+    """
+    parts = urlsplit(url.strip())
+    if not parts.netloc:
+        parts = urlsplit(url_add_missing_protocol(url.strip()))
+    scheme = parts.scheme.lower()
+    host = parts.netloc.lower()
+    if (scheme == "http" and host.endswith(":80")) or (scheme == "https" and host.endswith(":443")):
+        host = host[:host.rfind(":")]
+
+    segments = []
+    for segment in parts.path.split("/")[1:]:
+        if segment == "..":
+            if segments:
+                segments.pop()
+        elif segment != ".":
+            segments.append(segment)
+    path = "/" + "/".join(segments)
+    if parts.path.endswith(("/.", "/..")) and not path.endswith("/"):
+        path += "/"
+
+    query = "&".join(sorted(param for param in parts.query.split("&") if param))
+
+    return urlunsplit((scheme, host, path, query, ""))
+
+
 def date_to_json(the_date=None):
     """
     Gets a date string capable of being sent over JSON.
@@ -304,6 +356,8 @@ def date_to_json(the_date=None):
     :rtype: str
     """
     if not the_date:
+        import arrow
+
         the_date = arrow.utcnow().datetime
 
     # else:
@@ -326,6 +380,9 @@ def json_to_date(the_json_date, tz_info=None):
     :returns: A datetime representation of the string argument supplied.
     :rtype: <datetime> obj
     """
+    import arrow
+    import pytz
+
     ret = arrow.get(the_json_date).datetime
 
     if not tz_info:
@@ -0,0 +1,175 @@
+"""Charset
+Works out a page's character encoding from its raw bytes, cheapest source first, so ParseResponse can decode the body
+once without statistical detection over the whole page.
+
+    1. A byte order mark.
+    2. The charset in the Content-Type header.
+    3. A <meta charset> or <meta http-equiv="Content-Type"> tag in the first few KB of the page.
+    4. UTF-8, if the start of the page decodes as UTF-8.
+    5. Statistical detection, with chardet or charset_normalizer, over a bounded prefix of the page.
+
+"""
+import codecs
+import re
+
+from requests.compat import chardet
+
+BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+HEADER_CHARSET = re.compile(r"charset\s*=\s*[\"']?\s*([\w.:-]+)", re.I)
+META_CHARSET = re.compile(br"<meta[^>]+charset\s*=\s*[\"']?\s*([\w.:-]+)", re.I)
+# Browsers decode pages labelled latin-1 or ascii as windows-1252, and so do pages in the wild.
+BROWSER_ALIASES = {
+    "iso8859-1": "cp1252",
+    "ascii": "cp1252",
+}
+META_SCAN_BYTES = 4096
+DETECT_BYTES = 65536
+
+
+def detect_encoding(content, content_type=None):
+    """
+    Works out the encoding of a page's raw bytes.
+
+    :param content: The page's raw bytes, or the start of them.
+    :type content: bytes
+    :param content_type: The response's Content-Type header.
+    :type content_type: str
+    :returns: The python codec name of the encoding.
+    :rtype: str
+    """
+    encoding = bom_encoding(content) or header_encoding(content_type) or meta_encoding(content)
+    if encoding:
+        return encoding
+
+    return utf8_encoding(content) or statistical_encoding(content) or "utf-8"
+
+
+def decode(content, content_type=None):
+    """
+    Decodes a page's raw bytes with its detected encoding, replacing any bytes that don't decode.
+
+    :param content: The page's raw bytes.
+    :type content: bytes
+    :param content_type: The response's Content-Type header.
+    :type content_type: str
+    :returns: The decoded page.
+    :rtype: str
+    """
+    if not content:
+        return ""
+
+    return content.decode(detect_encoding(content, content_type), errors="replace")
+
+
+def bom_encoding(content):
+    """
+    Gets the encoding from a byte order mark at the start of the content.
+
+    :param content: The raw bytes.
+    :type content: bytes
+    :returns: The encoding, or None if there's no byte order mark.
+    :rtype: str
+    """
+    for bom, encoding in BOMS:
+        if content.startswith(bom):
+            return encoding
+    return None
+
+
+def header_encoding(content_type):
+    """
+    Gets the charset from a Content-Type header, ie "text/html; charset=ISO-8859-1".
+
+    :param content_type: The Content-Type header.
+    :type content_type: str
+    :returns: The encoding, or None if the header doesn't have a known charset.
+    :rtype: str
+    """
+    if not content_type:
+        return None
+
+    match = HEADER_CHARSET.search(content_type)
+    if not match:
+        return None
+    return codec_name(match.group(1))
+
+
+def meta_encoding(content):
+    """
+    Gets the charset from a <meta> tag in the first META_SCAN_BYTES of the content.
+
+    :param content: The raw bytes.
+    :type content: bytes
+    :returns: The encoding, or None if there's no <meta> charset.
+    :rtype: str
+    """
+    match = META_CHARSET.search(content[:META_SCAN_BYTES])
+    if not match:
+        return None
+
+    encoding = codec_name(match.group(1).decode("ascii", errors="ignore"))
+    # A page that made it here has no byte order mark, so a UTF-16 meta charset can't be right.
+    if encoding and encoding.startswith("utf-16"):
+        return "utf-8"
+    return encoding
+
+
+def utf8_encoding(content):
+    """
+    Checks if the first DETECT_BYTES of the content decode as UTF-8. A character split at the end of the sample is
+    fine.
+
+    :param content: The raw bytes.
+    :type content: bytes
+    :returns: "utf-8", or None if the content isn't UTF-8.
+    :rtype: str
+    """
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(content[:DETECT_BYTES], final=len(content) <= DETECT_BYTES)
+    except UnicodeDecodeError:
+        return None
+    return "utf-8"
+
+
+def statistical_encoding(content):
+    """
+    Guesses the encoding from the first DETECT_BYTES of the content with chardet, or charset_normalizer, whichever
+    Requests is using.
+
+    :param content: The raw bytes.
+    :type content: bytes
+    :returns: The encoding, or None if it couldn't be guessed.
+    :rtype: str
+    """
+    if not chardet:
+        return None
+
+    guess = chardet.detect(content[:DETECT_BYTES])
+    if not guess or not guess.get("encoding"):
+        return None
+    return codec_name(guess["encoding"])
+
+
+def codec_name(encoding):
+    """
+    Gets Python's codec name for an encoding label, ie "UTF8" is "utf-8". Labels browsers treat as windows-1252 are
+    decoded as windows-1252.
+
+    :param encoding: The encoding label.
+    :type encoding: str
+    :returns: The codec name, or None if Python doesn't know the encoding.
+    :rtype: str
+    """
+    try:
+        name = codecs.lookup(encoding.strip()).name
+    except (LookupError, ValueError):
+        return None
+    return BROWSER_ALIASES.get(name, name)
+
+# EndFile: carpetbag/carpetbag/charset.py
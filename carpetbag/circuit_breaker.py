@@ -0,0 +1,160 @@
+"""Circuit Breaker
+Tracks failures per target host and per proxy, so CarpetBag can fail fast on a host that is down instead of burning
+through the whole proxy bag retrying it, and can keep using a proxy through the odd failure.
+
+A breaker starts closed and lets everything through. After failure_threshold failures in a row it opens, and every
+request fails fast. Once recovery_timeout seconds have passed it goes half-open, and lets a single probe request
+through. A successful probe closes the breaker again, a failed probe re-opens it.
+
+Failures can be tagged with their source, ie the proxy a request went through. A host's breaker can be made to only
+open once its failures have come from at least two different proxies, or from a request without one, so a single dead
+proxy can't take down a healthy host. The next success hands back the failures by source, the sources which failed to
+reach a host that has since answered are the ones at fault.
+
+"""
+import threading
+import time
+
+
+class CircuitBreaker(object):
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30):
+        """
+        Creates a new circuit breaker, in the closed state.
+
+        :param failure_threshold: Number of failures in a row which opens the breaker.
+        :type failure_threshold: int
+        :param recovery_timeout: Seconds to wait while open before letting a probe request through.
+        :type recovery_timeout: int
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.sources = {}
+        self.opened_at = None
+        self.probe_started = None
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return "<CircuitBreaker %s>" % self.state
+
+    def allow(self):
+        """
+        Checks if a request may go out. When the recovery timeout has passed on an open breaker, this lets a single
+        probe request through and moves the breaker to half-open.
+
+        :returns: Whether or not the request may go out.
+        :rtype: bool
+        """
+        with self.lock:
+            now = time.time()
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN:
+                if now - self.opened_at < self.recovery_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self.probe_started = now
+                return True
+
+            # Half-open, only one probe at a time. If a probe never reported back, let another one through.
+            if now - self.probe_started < self.recovery_timeout:
+                return False
+            self.probe_started = now
+            return True
+
+    def success(self):
+        """
+        Records a successful request, closing the breaker.
+
+        :returns: The number of failures from each source since the last success, or since the breaker opened.
+        :rtype: dict
+        """
+        with self.lock:
+            sources = self.sources
+            self.state = self.CLOSED
+            self.failures = 0
+            self.sources = {}
+            self.opened_at = None
+            self.probe_started = None
+
+        return sources
+
+    def failure(self, source=None, min_sources=1):
+        """
+        Records a failed request, opening the breaker if it's hit the failure threshold or a probe failed. Failures
+        tagged with a source only open the breaker once they've come from at least min_sources sources, or along with
+        an untagged failure.
+
+        :param source: Where the failure came from, ie the proxy the request went through.
+        :type source: str
+        :param min_sources: The number of different sources the failures have to come from to open the breaker.
+        :type min_sources: int
+        :returns: Whether or not the breaker is open now.
+        :rtype: bool
+        """
+        with self.lock:
+            self.failures += 1
+            self.sources[source] = self.sources.get(source, 0) + 1
+            blamed = None in self.sources or len(self.sources) >= min_sources
+            if self.state == self.HALF_OPEN or (self.failures >= self.failure_threshold and blamed):
+                self.state = self.OPEN
+                self.opened_at = time.time()
+                self.probe_started = None
+
+            return self.state == self.OPEN
+
+
+class CircuitBreakers(object):
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30):
+        """
+        Creates a set of circuit breakers, one per key, ie one per host or one per proxy.
+
+        :param failure_threshold: Number of failures in a row which opens a breaker.
+        :type failure_threshold: int
+        :param recovery_timeout: Seconds to wait while open before letting a probe request through.
+        :type recovery_timeout: int
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.breakers = {}
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return "<CircuitBreakers %s>" % len(self.breakers)
+
+    def get(self, key):
+        """
+        Gets the breaker for a key, creating a closed one if needed.
+
+        :param key: The host or proxy address.
+        :type key: str
+        :returns: The breaker.
+        :rtype: <CircuitBreaker> obj
+        """
+        with self.lock:
+            breaker = self.breakers.get(key)
+            if not breaker:
+                breaker = CircuitBreaker(self.failure_threshold, self.recovery_timeout)
+                self.breakers[key] = breaker
+
+        return breaker
+
+    def open_keys(self):
+        """
+        Gets the keys whose breakers are currently open.
+
+        :returns: The keys of open breakers.
+        :rtype: list
+        """
+        with self.lock:
+            return [key for key, breaker in self.breakers.items() if breaker.state == CircuitBreaker.OPEN]
+
+# EndFile: carpetbag/carpetbag/circuit_breaker.py
@@ -0,0 +1,477 @@
+"""Crawler
+Crawls out from a set of seed urls. The Frontier keeps one queue of urls per host, and hands out hosts round robin,
+each only once its politeness delay has passed since its last request finished, so many hosts are fetched at once
+while no single host is hit more than once at a time. Links from every fetched page are fed back into the frontier
+when they're in scope.
+
+When the bagger obeys robots.txt, see CarpetBag.use_robots(), a host's Crawl-delay becomes its politeness delay
+when it's longer, and links robots.txt disallows aren't queued.
+
+Urls are canonicalized before the frontier checks if it's seen them, and the seen set is a ScalableBloomFilter, so
+memory stays bounded on big crawls at the cost of rarely skipping a url that wasn't actually seen. Pass a set() as
+seen for exact de-duplication, or a loaded filter to resume a crawl without revisiting pages.
+
+    crawler = Crawler(bagger, ["https://www.bad-actor.services/"], max_pages=500, max_depth=3)
+    for page in crawler.crawl():
+        print(page["url"], page["response"].status_code)
+
+"""
+from collections import deque
+import heapq
+import itertools
+import logging
+import queue
+import re
+import threading
+import time
+
+from . import carpet_tools as ct
+from .bloom_filter import ScalableBloomFilter
+from .link_extractor import registered_domain
+
+
+class Frontier(object):
+
+    def __init__(self, delay=0, seen=None):
+        """
+        Creates a new, empty, frontier.
+
+        :param delay: Seconds to wait between requests to the same host.
+        :type delay: int
+        :param seen: Where to keep the canonical urls already queued, anything supporting "in" and add(), defaults to
+            a ScalableBloomFilter.
+        :type seen: <ScalableBloomFilter> obj
+        """
+        self.delay = delay
+        self.delays = {}
+        self.seen = seen if seen is not None else ScalableBloomFilter(error_rate=0.0001)
+        self.queues = {}
+        self.ready = []
+        self.in_flight = set()
+        self.pending = 0
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+
+    def __repr__(self):
+        return "<Frontier %s urls %s hosts>" % (self.pending, len(self.queues))
+
+    def __len__(self):
+        return self.pending
+
+    def add(self, url, depth=0):
+        """
+        Queues a url, unless it's canonical form has been queued before.
+
+        :param url: The url to queue.
+        :type url: str
+        :param depth: The number of links followed from a seed to reach the url.
+        :type depth: int
+        :returns: Whether or not the url was queued.
+        :rtype: bool
+        """
+        host = ct.url_host(url)
+        canonical = ct.url_canonical(url)
+        with self.condition:
+            if canonical in self.seen:
+                return False
+            self.seen.add(canonical)
+
+            host_queue = self.queues.get(host)
+            if host_queue is None:
+                host_queue = deque()
+                self.queues[host] = host_queue
+            host_queue.append((url, depth))
+            self.pending += 1
+
+            if len(host_queue) == 1 and host not in self.in_flight:
+                self._schedule(host, 0)
+                self.condition.notify()
+
+        return True
+
+    def pop(self, timeout=None):
+        """
+        Gets the next url to fetch, from the host which has been ready the longest. The host is taken out of the
+        rotation until done() is called for it.
+
+        :param timeout: Seconds to wait for a url, or None to wait until one is ready.
+        :type timeout: float
+        :returns: The url and its depth, or None if nothing was ready in time or the frontier is idle.
+        :rtype: tuple
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self.condition:
+            while True:
+                now = time.time()
+                if self.ready and self.ready[0][0] <= now:
+                    _, _, host = heapq.heappop(self.ready)
+                    url, depth = self.queues[host].popleft()
+                    self.pending -= 1
+                    self.in_flight.add(host)
+                    return url, depth
+
+                if not self.pending and not self.in_flight:
+                    return None
+
+                wait = self.ready[0][0] - now if self.ready else None
+                if deadline is not None:
+                    if deadline <= now:
+                        return None
+                    wait = min(wait, deadline - now) if wait is not None else deadline - now
+                self.condition.wait(wait)
+
+    def done(self, url):
+        """
+        Marks the fetch of a url as finished, putting its host back into the rotation after its politeness delay.
+
+        :param url: The url fetched.
+        :type url: str
+        """
+        host = ct.url_host(url)
+        with self.condition:
+            self.in_flight.discard(host)
+            if self.queues.get(host):
+                self._schedule(host, self.delays.get(host, self.delay))
+            elif host in self.queues:
+                del self.queues[host]
+            self.condition.notify_all()
+
+    def release(self, url, depth=0):
+        """
+        Puts a url handed out by pop() back at the front of its host's queue without fetching it, ie when the crawl
+        hit max_pages. The host goes straight back into the rotation.
+
+        :param url: The url which wasn't fetched.
+        :type url: str
+        :param depth: The url's depth.
+        :type depth: int
+        """
+        host = ct.url_host(url)
+        with self.condition:
+            self.in_flight.discard(host)
+            host_queue = self.queues.setdefault(host, deque())
+            host_queue.appendleft((url, depth))
+            self.pending += 1
+            self._schedule(host, 0)
+            self.condition.notify_all()
+
+    def set_delay(self, host, delay):
+        """
+        Sets the politeness delay for a single host, ie from its robots.txt Crawl-delay.
+
+        :param host: The host.
+        :type host: str
+        :param delay: Seconds to wait between requests to the host.
+        :type delay: float
+        """
+        with self.condition:
+            self.delays[host.lower()] = delay
+
+    def idle(self):
+        """
+        Checks if the frontier is finished, with no urls queued and none being fetched.
+
+        :returns: Whether or not the frontier is idle.
+        :rtype: bool
+        """
+        with self.condition:
+            return not self.pending and not self.in_flight
+
+    def close(self):
+        """
+        Closes the frontier, an in memory frontier has nothing to write out.
+
+        """
+        return None
+
+    def _schedule(self, host, delay):
+        """
+        Puts a host into the rotation, the caller should be holding the condition.
+
+        :param host: The host.
+        :type host: str
+        :param delay: Seconds from now until the host is ready.
+        :type delay: float
+        """
+        heapq.heappush(self.ready, (time.time() + delay, next(self.counter), host))
+
+
+class Crawler(object):
+
+    def __init__(
+        self,
+        bagger,
+        seeds,
+        max_pages=1000,
+        max_depth=3,
+        same_domain=True,
+        allow=None,
+        deny=None,
+        workers=4,
+        delay=None,
+        frontier=None,
+        seen=None
+    ):
+        """
+        Creates a new crawler.
+
+        :param bagger: The CarpetBag to crawl with, each worker thread gets its own clone of it.
+        :type bagger: <CarpetBag> obj
+        :param seeds: The urls to start crawling from.
+        :type seeds: list
+        :param max_pages: The most pages to fetch.
+        :type max_pages: int
+        :param max_depth: The most links to follow away from a seed.
+        :type max_depth: int
+        :param same_domain: Only follow links on the seeds' registered domains.
+        :type same_domain: bool
+        :param allow: Regexes, only follow links matching at least one of them.
+        :type allow: list
+        :param deny: Regexes, never follow links matching any of them.
+        :type deny: list
+        :param workers: Number of pages to fetch at once.
+        :type workers: int
+        :param delay: Seconds to wait between requests to the same host, defaults to the bagger's mininum_wait_time.
+        :type delay: int
+        :param frontier: The frontier to use, defaults to a new in memory Frontier. Use a SqliteFrontier to resume
+            the crawl later.
+        :type frontier: <Frontier> obj
+        :param seen: The seen set for the default frontier, defaults to a new ScalableBloomFilter.
+        :type seen: <ScalableBloomFilter> obj
+        """
+        self.bagger = bagger
+        self.seeds = [ct.url_add_missing_protocol(seed) for seed in seeds]
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.same_domain = same_domain
+        self.allow = [re.compile(pattern) for pattern in allow or []]
+        self.deny = [re.compile(pattern) for pattern in deny or []]
+        self.workers = workers
+        if delay is None:
+            delay = bagger.mininum_wait_time
+        self.frontier = frontier if frontier is not None else Frontier(delay, seen)
+        self.domains = set(registered_domain(seed) for seed in self.seeds)
+        self.delayed_hosts = set()
+        self.delayed_hosts_lock = threading.Lock()
+        self.fetched = 0
+        self.fetched_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.threads = []
+        self.logger = logging.getLogger(__name__)
+
+    def __repr__(self):
+        return "<Crawler %s fetched %s>" % (self.seeds, self.fetched)
+
+    def in_scope(self, url, depth):
+        """
+        Checks a link against the crawl's scope rules.
+
+        :param url: The link.
+        :type url: str
+        :param depth: The depth the link would be crawled at.
+        :type depth: int
+        :returns: Whether or not the link should be crawled.
+        :rtype: bool
+        """
+        if depth > self.max_depth:
+            return False
+
+        if self.same_domain and registered_domain(url) not in self.domains:
+            return False
+
+        if self.allow and not any(pattern.search(url) for pattern in self.allow):
+            return False
+
+        if any(pattern.search(url) for pattern in self.deny):
+            return False
+
+        return True
+
+    def crawl(self):
+        """
+        Runs the crawl, yielding each page as it's fetched.
+
+        :returns: Each page fetched, as a dict with the url, depth, response, links and error, if there was one.
+        :rtype: generator
+        """
+        for seed in self.seeds:
+            self.frontier.add(seed, 0)
+
+        results = queue.Queue()
+        threads = self.threads = []
+        for number in range(self.workers):
+            # The frontier keeps each host's politeness delay, so the workers don't sleep on their own.
+            worker_bagger = self.bagger.clone()
+            worker_bagger.mininum_wait_time = 0
+            thread = threading.Thread(
+                target=self._work, args=(worker_bagger, results), name="carpetbag-crawler-%s" % number)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        running = len(threads)
+        try:
+            while running:
+                page = results.get()
+                if page is None:
+                    running -= 1
+                    continue
+                yield page
+        finally:
+            self.stop()
+
+    def run(self, callback=None):
+        """
+        Runs the crawl to the end, then closes the frontier once the workers have finished, so everything queued is
+        written out.
+
+        :param callback: Called with each page as it's fetched, optional.
+        :type callback: callable
+        :returns: The number of pages fetched.
+        :rtype: int
+        """
+        try:
+            for page in self.crawl():
+                if callback:
+                    callback(page)
+        finally:
+            self.stop()
+            for thread in self.threads:
+                thread.join()
+            self.frontier.close()
+
+        return self.fetched
+
+    def stop(self):
+        """
+        Stops the crawl, pages being fetched right now are finished.
+
+        """
+        self.stopped.set()
+
+    def _work(self, bagger, results):
+        """
+        Worker thread, fetches urls from the frontier until the crawl is finished.
+
+        :param bagger: The worker's own CarpetBag.
+        :type bagger: <CarpetBag> obj
+        :param results: Where to put the fetched pages, None is put when the worker finishes.
+        :type results: <queue.Queue> obj
+        """
+        try:
+            while not self.stopped.is_set():
+                item = self.frontier.pop(timeout=0.25)
+                if item is None:
+                    if self.frontier.idle():
+                        break
+                    continue
+
+                url, depth = item
+                if not self._claim():
+                    self.frontier.release(url, depth)
+                    break
+
+                try:
+                    page = self._fetch(bagger, url, depth)
+                finally:
+                    self.frontier.done(url)
+                results.put(page)
+        finally:
+            results.put(None)
+
+    def _claim(self):
+        """
+        Claims one of the max_pages fetches.
+
+        :returns: Whether or not there was a fetch left to claim.
+        :rtype: bool
+        """
+        with self.fetched_lock:
+            if self.fetched >= self.max_pages:
+                self.stopped.set()
+                return False
+            self.fetched += 1
+            return True
+
+    def _fetch(self, bagger, url, depth):
+        """
+        Fetches a single page, and queues its links which are in scope.
+
+        :param bagger: The worker's own CarpetBag.
+        :type bagger: <CarpetBag> obj
+        :param url: The url to fetch.
+        :type url: str
+        :param depth: The url's depth.
+        :type depth: int
+        :returns: The page, with the url, depth, response, links and error, if there was one.
+        :rtype: dict
+        """
+        page = {
+            "url": url,
+            "depth": depth,
+            "response": None,
+            "links": [],
+            "error": None,
+        }
+        try:
+            self._robots_delay(bagger, url)
+            response = bagger.get(url)
+        except Exception as e:
+            self.logger.warning("Crawler failed to fetch %s: %s" % (url, e))
+            page["error"] = "%s: %s" % (e.__class__.__name__, e)
+            return page
+
+        page["response"] = response
+        content_type = response.headers.get("Content-Type", "")
+        if response.status_code >= 400 or (content_type and "html" not in content_type):
+            return page
+
+        parsed = bagger.parse(response)
+        links = parsed.get_links()
+        page["links"] = links["local"] + links["remote"]
+        for link in page["links"]:
+            if self.in_scope(link, depth + 1) and self._robots_allowed(bagger, link):
+                self.frontier.add(link, depth + 1)
+
+        return page
+
+    def _robots_delay(self, bagger, url):
+        """
+        Sets a host's politeness delay from its robots.txt Crawl-delay, the first time the host is fetched.
+
+        :param bagger: The worker's own CarpetBag.
+        :type bagger: <CarpetBag> obj
+        :param url: The url about to be fetched.
+        :type url: str
+        """
+        host = ct.url_host(url)
+        if bagger.robots_cache is None:
+            return
+
+        with self.delayed_hosts_lock:
+            if host in self.delayed_hosts:
+                return
+            self.delayed_hosts.add(host)
+
+        crawl_delay = bagger.robots_cache.rules(url).crawl_delay
+        if crawl_delay and crawl_delay > self.frontier.delay:
+            self.frontier.set_delay(host, crawl_delay)
+
+    def _robots_allowed(self, bagger, url):
+        """
+        Checks a link against its host's robots.txt, if it's already cached, so disallowed links aren't queued.
+
+        :param bagger: The worker's own CarpetBag.
+        :type bagger: <CarpetBag> obj
+        :param url: The link.
+        :type url: str
+        :returns: Whether or not the link may be queued.
+        :rtype: bool
+        """
+        if bagger.robots_cache is None:
+            return True
+
+        rules = bagger.robots_cache.cached(url)
+        return rules is None or rules.allowed(url)
+
+# EndFile: carpetbag/carpetbag/crawler.py
@@ -28,4 +28,24 @@ class CannotOverwriteFile(Error):
     """Raised when trying to download a file to a local location that already has a file by the requested name."""
     pass
 
+
+class CircuitOpen(Error):
+    """Raised when the circuit breaker for a host is open, and requests to it are failing fast."""
+    pass
+
+
+class InvalidParserBackend(Error):
+    """Raised when an unknown parse backend is requested for ParseResponse."""
+    pass
+
+
+class ParserBackendUnavailable(InvalidParserBackend):
+    """Raised when a parse backend is requested whose parser isn't installed, ie lxml."""
+    pass
+
+
+class DisallowedByRobots(Error):
+    """Raised when a url is disallowed by its host's robots.txt, and robots.txt is being obeyed."""
+    pass
+
 # EndFile: carpetbag/carpetbag/errors.py
@@ -0,0 +1,324 @@
+"""Json Stream
+Pulls the items out of one path of a JSON document as its body streams in, without holding the whole document in
+memory. Only one item, plus the chunk being read, is held at a time, so a response of hundreds of MB with one big
+array can be worked through in constant memory.
+
+    for bag in json_stream.iter_response_items(bagger.get(url), "objects.*"):
+        print(bag["id"])
+
+Paths are dotted, with * for every item of an array, or every value of an object, ie "objects.*", "data.results.*"
+or "*" for a document which is just an array. Numbers pick one item of an array, ie "pages.0". The empty path gives
+the whole document as one item.
+
+Navigating to the path is done a token at a time. Each item found is decoded by the standard json decoder, straight
+out of the read buffer. Scalars outside the path, and not inside an array, are kept in fields, so a page's
+total_pages or next cursor is still available after streaming its objects. The parts of the document which are
+skipped aren't validated.
+
+"""
+import codecs
+import json
+import re
+
+from . import charset
+
+NEED_MORE = object()
+TOKEN = re.compile(r'[\[\]{}:,]|"(?:[^"\\]|\\.)*"|[^\s\[\]{}:,"]+')
+WHITESPACE = re.compile(r"\s*")
+DELIMITERS = frozenset(" \t\r\n,]}")
+DECODER = json.JSONDecoder()
+
+
+class JsonStream(object):
+
+    def __init__(self, path="*", encoding="utf-8"):
+        """
+        Creates an incremental parser for one path of a JSON document.
+
+        :param path: The dotted path to the items, ie "objects.*".
+        :type path: str
+        :param encoding: The encoding of bytes fed in.
+        :type encoding: str
+        """
+        self.path = [segment for segment in path.split(".") if segment] if path else []
+        self.decoder = codecs.getincrementaldecoder(encoding)("strict")
+        self.fields = {}
+        self.buffer = ""
+        self.pos = 0
+        self.pending = []
+        self.pending_size = 0
+        self.retry_at = 0
+        self.eof = False
+        self.done = False
+        self.parser = self._parse()
+
+    def __repr__(self):
+        return "<JsonStream %s>" % ".".join(self.path)
+
+    def feed(self, data):
+        """
+        Feeds the next chunk of the document in.
+
+        :param data: The chunk.
+        :type data: bytes or str
+        :returns: The items completed by the chunk.
+        :rtype: list
+        """
+        if isinstance(data, bytes):
+            data = self.decoder.decode(data)
+        if data:
+            self.pending.append(data)
+            self.pending_size += len(data)
+
+        # An item which didn't fit in the buffer isn't retried until the buffer has doubled, so a big item isn't
+        # decoded from the start over and over.
+        if len(self.buffer) + self.pending_size < self.retry_at:
+            return []
+        return self._run()
+
+    def close(self):
+        """
+        Ends the document.
+
+        :returns: The last items.
+        :rtype: list
+        :raises: ValueError if the document ended before the path was fully read.
+        """
+        self.feed(self.decoder.decode(b"", final=True))
+        self.eof = True
+        items = self._run()
+        if not self.done:
+            raise ValueError("JSON document ended early")
+        return items
+
+    def _run(self):
+        """
+        Runs the parser over everything fed in so far.
+
+        :returns: The items completed.
+        :rtype: list
+        """
+        if self.pending:
+            self.buffer = self.buffer[self.pos:] + "".join(self.pending)
+            self.pos = 0
+            self.pending = []
+            self.pending_size = 0
+
+        items = []
+        while not self.done:
+            try:
+                item = next(self.parser)
+            except StopIteration:
+                self.done = True
+                break
+            if item is NEED_MORE:
+                break
+            items.append(item)
+
+        return items
+
+    def _parse(self):
+        """
+        The parser, a generator yielding each item found, and NEED_MORE when the buffer runs out.
+
+        """
+        yield from self._walk(0, self.fields)
+
+    def _walk(self, index, fields):
+        """
+        Walks a value, following the path from the index'th segment.
+
+        :param index: The path segment the value is at.
+        :type index: int
+        :param fields: Where to keep scalars outside the path at this level.
+        :type fields: dict
+        """
+        if index == len(self.path):
+            item = yield from self._value()
+            yield item
+            return
+
+        segment = self.path[index]
+        char = yield from self._peek()
+        if char == "{":
+            yield from self._token()
+            if (yield from self._peek()) == "}":
+                yield from self._token()
+                return
+
+            while True:
+                key = json.loads((yield from self._token()))
+                yield from self._token()
+                if segment == "*" or key == segment:
+                    yield from self._walk(index + 1, {})
+                else:
+                    value = yield from self._skip()
+                    if isinstance(value, dict):
+                        fields[key] = value
+                    elif value is not None:
+                        fields[key] = json.loads(value)
+
+                if (yield from self._token()) == "}":
+                    return
+
+        elif char == "[":
+            yield from self._token()
+            if (yield from self._peek()) == "]":
+                yield from self._token()
+                return
+
+            position = 0
+            while True:
+                if segment == "*" or segment == str(position):
+                    yield from self._walk(index + 1, {})
+                else:
+                    yield from self._skip(keep=False)
+                position += 1
+                if (yield from self._token()) == "]":
+                    return
+
+        else:
+            yield from self._skip(keep=False)
+
+    def _skip(self, keep=True):
+        """
+        Skips a value, token by token. Scalars, and objects of scalars, are kept.
+
+        :param keep: Whether or not to keep scalars.
+        :type keep: bool
+        :returns: The scalar's JSON text, or a dict of the object's scalars, or None.
+        :rtype: mixed
+        """
+        char = yield from self._peek()
+        if char == "{" and keep:
+            fields = {}
+            yield from self._token()
+            if (yield from self._peek()) == "}":
+                yield from self._token()
+                return fields
+
+            while True:
+                key = json.loads((yield from self._token()))
+                yield from self._token()
+                value = yield from self._skip()
+                if isinstance(value, dict):
+                    fields[key] = value
+                elif value is not None:
+                    fields[key] = json.loads(value)
+                if (yield from self._token()) == "}":
+                    return fields
+
+        depth = 0
+        while True:
+            token = yield from self._token()
+            if token == "[" or token == "{":
+                depth += 1
+            elif token == "]" or token == "}":
+                depth -= 1
+            if not depth:
+                return token if keep and token not in ["]", "}"] else None
+
+    def _value(self):
+        """
+        Decodes the complete value at the read position. A value is only taken once it's followed by a delimiter, or
+        the document has ended, as a number cut off by the end of a chunk, ie "1." or "1e", decodes as a shorter
+        number.
+
+        :returns: The value.
+        :rtype: mixed
+        """
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            try:
+                value, end = DECODER.raw_decode(self.buffer, self.pos)
+                if end < len(self.buffer) and self.buffer[end] in DELIMITERS or end == len(self.buffer) and self.eof:
+                    self.pos = end
+                    return value
+                if self.eof:
+                    raise ValueError("Invalid JSON value at %s" % end)
+            except ValueError:
+                if self.eof:
+                    raise
+            yield from self._more()
+
+    def _token(self):
+        """
+        Reads the next complete token.
+
+        :returns: The token's text.
+        :rtype: str
+        """
+        while True:
+            start = WHITESPACE.match(self.buffer, self.pos).end()
+            match = TOKEN.match(self.buffer, start)
+            if match and (match.end() < len(self.buffer) or self.eof or match.group()[0] in '[]{}:,"'):
+                self.pos = match.end()
+                return match.group()
+            yield from self._more()
+
+    def _peek(self):
+        """
+        Gets the next character which isn't whitespace, without reading it.
+
+        :returns: The character.
+        :rtype: str
+        """
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            yield from self._more()
+
+    def _more(self):
+        """
+        Waits for more of the document.
+
+        :raises: ValueError if the document has ended.
+        """
+        if self.eof:
+            raise ValueError("JSON document ended early")
+
+        self.retry_at = len(self.buffer) - self.pos + 1 if self.pos else len(self.buffer) * 2
+        yield NEED_MORE
+
+
+def iter_items(chunks, path="*", encoding="utf-8"):
+    """
+    Pulls the items out of one path of a JSON document as its chunks come in.
+
+    :param chunks: The document, in chunks of bytes or text.
+    :type chunks: iterable
+    :param path: The dotted path to the items, ie "objects.*".
+    :type path: str
+    :param encoding: The encoding of the chunks.
+    :type encoding: str
+    :returns: Each item.
+    :rtype: generator
+    """
+    stream = JsonStream(path, encoding)
+    for chunk in chunks:
+        for item in stream.feed(chunk):
+            yield item
+
+    for item in stream.close():
+        yield item
+
+
+def iter_response_items(response, path="*", chunk_size=65536):
+    """
+    Pulls the items out of one path of a response's JSON body as it downloads. The response's content is used up by
+    this, so it can't be read again afterwards.
+
+    :param response: A streamed response, ie from CarpetBag.get().
+    :type response: <Requests.response> obj
+    :param path: The dotted path to the items, ie "objects.*".
+    :type path: str
+    :param chunk_size: The number of bytes to read at a time.
+    :type chunk_size: int
+    :returns: Each item.
+    :rtype: generator
+    """
+    encoding = charset.header_encoding(response.headers.get("Content-Type")) or "utf-8"
+    return iter_items(response.iter_content(chunk_size), path, encoding)
+
+# EndFile: carpetbag/carpetbag/json_stream.py
@@ -0,0 +1,251 @@
+"""Link Extractor
+Pulls the links out of a page with an incremental tokenizer, without building a document tree. Content can be fed in
+chunks as it comes off the wire. Links are resolved against the page url, or the page's <base> tag, de-duplicated in
+the order they're found, and sorted into local and remote by registered domain.
+
+"""
+import codecs
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+from . import charset
+
+LINK_SCHEMES = ["http", "https"]
+
+registered_domains = {}
+
+
+def registered_domain(url):
+    """
+    Gets the registered domain of a url, ie "https://news.google.co.uk/" is "google.co.uk". IP addresses and host
+    names that aren't on a public suffix are used as is.
+
+    :param url: The url to get the registered domain from.
+    :type url: str
+    :returns: The registered domain.
+    :rtype: str
+    """
+    return host_registered_domain(urlsplit(url).hostname)
+
+
+def host_registered_domain(host):
+    """
+    Gets the registered domain of a host name. Lookups are cached per host.
+
+    :param host: The host name.
+    :type host: str
+    :returns: The registered domain.
+    :rtype: str
+    """
+    host = host or ""
+    if host not in registered_domains:
+        import tld
+
+        registered_domains[host] = tld.get_fld("http://%s" % host, fail_silently=True) or host
+
+    return registered_domains[host]
+
+
+class LinkExtractor(HTMLParser):
+
+    def __init__(self, url):
+        """
+        Creates a new link extractor for a page.
+
+        :param url: The page's url, which relative links are resolved against.
+        :type url: str
+        """
+        super().__init__(convert_charrefs=True)
+        self.url = url
+        self.base_url = url
+        self.base_set = False
+        self.domain = registered_domain(url)
+        self.seen = set()
+        self.seen_hrefs = set()
+        self.local = []
+        self.remote = []
+
+    def __repr__(self):
+        return "<LinkExtractor %s local:%s remote:%s>" % (self.url, len(self.local), len(self.remote))
+
+    def handle_starttag(self, tag, attrs):
+        """
+        Picks the hrefs out of anchors, and the first <base> tag.
+
+        :param tag: The tag name.
+        :type tag: str
+        :param attrs: The tag's attributes.
+        :type attrs: list
+        """
+        if tag == "a":
+            for name, value in attrs:
+                if name == "href":
+                    self.add(value)
+                    return
+
+        elif tag == "base" and not self.base_set:
+            for name, value in attrs:
+                if name == "href" and value:
+                    self.base_url = urljoin(self.url, value.strip())
+                    self.base_set = True
+                    self.seen_hrefs = set()
+                    return
+
+    def add(self, href):
+        """
+        Resolves, de-duplicates and sorts a single href. In page anchors and non http(s) links like "mailto:" and
+        "javascript:" are skipped.
+
+        :param href: The href to add.
+        :type href: str
+        :returns: Whether or not the link was new.
+        :rtype: bool
+        """
+        if not href or href in self.seen_hrefs:
+            return False
+        self.seen_hrefs.add(href)
+
+        href = href.strip()
+        if not href or href[0] == "#":
+            return False
+
+        link = urljoin(self.base_url, href)
+        parts = urlsplit(link)
+        if parts.scheme not in LINK_SCHEMES:
+            return False
+
+        if parts.fragment or link[-1] == "#":
+            link = link[:link.index("#")]
+
+        if link in self.seen:
+            return False
+
+        self.seen.add(link)
+        if host_registered_domain(parts.hostname) == self.domain:
+            self.local.append(link)
+        else:
+            self.remote.append(link)
+
+        return True
+
+    def links(self):
+        """
+        Gets the links found so far.
+
+        :returns: The links, organized by local or remote.
+        :rtype: dict
+        """
+        return {
+            "local": self.local,
+            "remote": self.remote,
+        }
+
+
+class LxmlLinkExtractor(LinkExtractor):
+
+    def __init__(self, url):
+        """
+        Creates a new link extractor for a page, tokenizing with lxml's HTML parser in place of Python's. lxml only
+        calls back with each start tag, no document tree is built, and it's many times faster. Needs lxml installed.
+
+        :param url: The page's url, which relative links are resolved against.
+        :type url: str
+        """
+        import lxml.etree
+
+        super().__init__(url)
+        self.lxml_parser = lxml.etree.HTMLParser(target=self, recover=True)
+
+    def feed(self, data):
+        """
+        Feeds a chunk of content to lxml.
+
+        :param data: The chunk of content.
+        :type data: str
+        """
+        if data:
+            self.lxml_parser.feed(data)
+
+    def close(self):
+        """
+        Finishes tokenizing the content fed so far.
+
+        """
+        try:
+            self.lxml_parser.close()
+        except Exception:
+            # lxml raises when it was never fed any content.
+            pass
+
+    def start(self, tag, attrib):
+        """
+        lxml target callback for every start tag.
+
+        :param tag: The tag name.
+        :type tag: str
+        :param attrib: The tag's attributes.
+        :type attrib: dict
+        """
+        if tag == "a" or tag == "base":
+            self.handle_starttag(tag, list(attrib.items()))
+
+    def end(self, tag):
+        pass
+
+    def data(self, data):
+        pass
+
+
+def make_decoder(encoding):
+    """
+    Creates an incremental decoder, falling back to UTF-8 for unknown encodings.
+
+    :param encoding: The encoding.
+    :type encoding: str
+    :returns: The decoder.
+    :rtype: <codecs.IncrementalDecoder> obj
+    """
+    try:
+        return codecs.getincrementaldecoder(encoding)(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+
+TOKENIZERS = {
+    "html.parser": LinkExtractor,
+    "lxml": LxmlLinkExtractor,
+    "lxml-direct": LxmlLinkExtractor,
+}
+
+
+def extract_links(url, chunks, encoding=None, tokenizer="html.parser"):
+    """
+    Extracts the links from a page, feeding the tokenizer a chunk at a time, ie from response.iter_content().
+
+    :param url: The page's url.
+    :type url: str
+    :param chunks: The page content, in str or bytes chunks.
+    :type chunks: iterable
+    :param encoding: The encoding of byte chunks, or None to detect it from the first chunk, see carpetbag.charset.
+    :type encoding: str
+    :param tokenizer: Tokenize with Python's "html.parser", or "lxml".
+    :type tokenizer: str
+    :returns: The links, organized by local or remote.
+    :rtype: dict
+    """
+    extractor = TOKENIZERS[tokenizer](url)
+    decoder = None
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            if not decoder:
+                decoder = make_decoder(encoding or charset.detect_encoding(chunk))
+            chunk = decoder.decode(chunk)
+        extractor.feed(chunk)
+
+    if decoder:
+        extractor.feed(decoder.decode(b"", final=True))
+    extractor.close()
+
+    return extractor.links()
+
+# EndFile: carpetbag/carpetbag/link_extractor.py
@@ -0,0 +1,365 @@
+"""Parse Backends
+The HTML parsers ParseResponse can use. Each backend builds its own kind of document tree and knows how to run the
+ParseResponse extractors against it.
+
+    "html.parser"   Beautiful Soup with Python's built in parser. Slowest, but has no extra dependencies.
+    "lxml"          Beautiful Soup with the lxml parser. Needs lxml installed.
+    "lxml-direct"   lxml's own HTML tree, skipping Beautiful Soup entirely. The fastest, needs lxml installed.
+
+Beautiful Soup is only imported when a tree is first built, so importing CarpetBag doesn't pay for it. The lxml
+backends check lxml is installed when they're selected, lxml is an extra, ie pip install carpetbag[lxml].
+
+"""
+import functools
+import importlib.util
+import re
+
+from . import errors
+
+CLASS_XPATH = "contains(concat(' ', normalize-space(@class), ' '), ' %s ')"
+MULTI_VALUED_ATTRIBUTES = ["class", "rel"]
+META_KEYS = ["name", "property", "http-equiv"]
+
+
+class SoupBackend(object):
+
+    name = "html.parser"
+    features = "html.parser"
+    requires = None
+    supports_strainers = True
+    parses_bytes = False
+
+    def __repr__(self):
+        return "<ParseBackend %s>" % self.name
+
+    def make_tree(self, content, strainer=None):
+        """
+        Parses content into a Beautiful Soup tree. With a strainer only the matching tags, and everything inside them,
+        make it into the tree.
+
+        :param content: The html to parse.
+        :type content: str
+        :param strainer: The tag name and attributes to keep, ie ("div", {"class": "result"}), or a list of them.
+        :type strainer: tuple or list
+        :returns: The parsed tree.
+        :rtype: <BeautifulSoup> obj
+        """
+        from bs4 import BeautifulSoup
+
+        if strainer:
+            return BeautifulSoup(content, self.features, parse_only=self._make_strainer(strainer))
+        return BeautifulSoup(content, self.features)
+
+    def _make_strainer(self, strainer):
+        """
+        Creates a SoupStrainer from a tag name and attributes. While parsing, the strainer sees multi valued attributes
+        like class as the raw string, so a class is matched as a whole word of it, ie "result" matches
+        "result web-result".
+        A list of several strainers keeps every tag with one of their names, whatever its attributes, as Beautiful
+        Soup can't OR attribute filters together. The extractors filter on the attributes themselves, so the extra
+        tags are only ever skipped over.
+
+        :param strainer: The tag name and attributes to keep, or a list of them.
+        :type strainer: tuple or list
+        :returns: The strainer.
+        :rtype: <SoupStrainer> obj
+        """
+        from bs4 import SoupStrainer
+
+        if isinstance(strainer, list):
+            if len(strainer) > 1:
+                return SoupStrainer(sorted(set(name for name, attrs in strainer)))
+            strainer = strainer[0]
+
+        name, attrs = strainer
+        attrs = dict(attrs)
+        for attr in MULTI_VALUED_ATTRIBUTES:
+            if isinstance(attrs.get(attr), str):
+                attrs[attr] = re.compile(r"(^|\s)%s(\s|$)" % re.escape(attrs[attr]))
+        return SoupStrainer(name, attrs)
+
+    def title(self, tree):
+        """
+        Gets the title from a tree.
+
+        :param tree: The parsed tree.
+        :type tree: <BeautifulSoup> obj
+        :returns: The page's title, or "" if there isn't one.
+        :rtype: str
+        """
+        if not tree:
+            return ""
+        elif not tree.title:
+            return ""
+        elif not tree.title.string:
+            return ""
+        return tree.title.string.strip()
+
+    def hrefs(self, tree):
+        """
+        Gets the href of every anchor in a tree.
+
+        :param tree: The parsed tree, or a piece of it.
+        :type tree: <BeautifulSoup> obj
+        :returns: The anchor hrefs, in document order.
+        :rtype: list
+        """
+        return [anchor.get("href") for anchor in tree.find_all("a")]
+
+    def meta(self, tree):
+        """
+        Gets the <meta> tags from a tree, keyed by their name, property or http-equiv. The first tag for a key wins.
+
+        :param tree: The parsed tree.
+        :type tree: <BeautifulSoup> obj
+        :returns: The meta tag contents.
+        :rtype: dict
+        """
+        meta = {}
+        if not tree:
+            return meta
+
+        for tag in tree.find_all("meta"):
+            add_meta(meta, tag.get)
+        return meta
+
+    def canonical(self, tree):
+        """
+        Gets the href of the <link rel="canonical"> tag from a tree.
+
+        :param tree: The parsed tree.
+        :type tree: <BeautifulSoup> obj
+        :returns: The canonical href, or None if there isn't one.
+        :rtype: str
+        """
+        if not tree:
+            return None
+
+        for link in tree.find_all("link"):
+            if "canonical" in (link.get("rel") or []) and link.get("href"):
+                return link.get("href").strip()
+        return None
+
+    def duckduckgo_results(self, tree):
+        """
+        Gets the results from a duckduckgo.com search result page tree.
+
+        :param tree: The parsed tree.
+        :type tree: <BeautifulSoup> obj
+        :returns: The search results, each with a title, description and url.
+        :rtype: list
+        """
+        results = []
+        for link in tree.find_all("div", {"class": "result"}):
+            results.append(
+                {
+                    "title": link.h2.text.strip(),
+                    "description": link.find("a", {"class": "result__snippet"}).text.strip(),
+                    "url": link.find("a", {"class": "result__url"}).text.strip()
+                }
+            )
+        return results
+
+
+class LxmlSoupBackend(SoupBackend):
+
+    name = "lxml"
+    features = "lxml"
+    requires = "lxml"
+
+
+class LxmlBackend(object):
+
+    name = "lxml-direct"
+    requires = "lxml"
+    supports_strainers = False
+    parses_bytes = True
+
+    def __repr__(self):
+        return "<ParseBackend %s>" % self.name
+
+    def make_tree(self, content, strainer=None, encoding=None):
+        """
+        Parses content into an lxml html tree. lxml builds the full tree fast enough that strainers are ignored. The
+        content is parsed as bytes with the encoding handed to lxml's parser, as lxml won't parse text with an XML
+        encoding declaration, ie an XHTML page's <?xml version="1.0" encoding="utf-8"?>.
+
+        :param content: The html to parse, raw bytes or text.
+        :type content: bytes or str
+        :param strainer: Not used.
+        :type strainer: tuple
+        :param encoding: The encoding of raw bytes, as detected by carpetbag.charset.
+        :type encoding: str
+        :returns: The parsed tree, or None if there was no content.
+        :rtype: <lxml.html.HtmlElement> obj
+        """
+        import lxml.etree
+        import lxml.html
+
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+            encoding = "utf-8"
+
+        try:
+            parser = lxml.html.HTMLParser(encoding=encoding)
+        except LookupError:
+            # An encoding Python knows but libxml2 doesn't, hand lxml UTF-8 instead.
+            content = content.decode(encoding, errors="replace").encode("utf-8")
+            parser = lxml.html.HTMLParser(encoding="utf-8")
+
+        try:
+            return lxml.html.document_fromstring(content, parser=parser)
+        except lxml.etree.ParserError:
+            # The document is empty, or only whitespace.
+            return None
+
+    def title(self, tree):
+        """
+        Gets the title from a tree.
+
+        :param tree: The parsed tree.
+        :type tree: <lxml.html.HtmlElement> obj
+        :returns: The page's title, or "" if there isn't one.
+        :rtype: str
+        """
+        if tree is None:
+            return ""
+
+        title = tree.find(".//title")
+        if title is None:
+            return ""
+        return title.text_content().strip()
+
+    def hrefs(self, tree):
+        """
+        Gets the href of every anchor in a tree.
+
+        :param tree: The parsed tree, or a piece of it.
+        :type tree: <lxml.html.HtmlElement> obj
+        :returns: The anchor hrefs, in document order.
+        :rtype: list
+        """
+        if tree is None:
+            return []
+        return [anchor.get("href") for anchor in tree.iter("a")]
+
+    def meta(self, tree):
+        """
+        Gets the <meta> tags from a tree, keyed by their name, property or http-equiv. The first tag for a key wins.
+
+        :param tree: The parsed tree.
+        :type tree: <lxml.html.HtmlElement> obj
+        :returns: The meta tag contents.
+        :rtype: dict
+        """
+        meta = {}
+        if tree is None:
+            return meta
+
+        for tag in tree.iter("meta"):
+            add_meta(meta, tag.get)
+        return meta
+
+    def canonical(self, tree):
+        """
+        Gets the href of the <link rel="canonical"> tag from a tree.
+
+        :param tree: The parsed tree.
+        :type tree: <lxml.html.HtmlElement> obj
+        :returns: The canonical href, or None if there isn't one.
+        :rtype: str
+        """
+        if tree is None:
+            return None
+
+        for link in tree.iter("link"):
+            if "canonical" in (link.get("rel") or "").lower().split() and link.get("href"):
+                return link.get("href").strip()
+        return None
+
+    def duckduckgo_results(self, tree):
+        """
+        Gets the results from a duckduckgo.com search result page tree.
+
+        :param tree: The parsed tree.
+        :type tree: <lxml.html.HtmlElement> obj
+        :returns: The search results, each with a title, description and url.
+        :rtype: list
+        """
+        if tree is None:
+            return []
+
+        results = []
+        for link in tree.xpath("//div[%s]" % CLASS_XPATH % "result"):
+            results.append(
+                {
+                    "title": link.find(".//h2").text_content().strip(),
+                    "description": link.xpath(".//a[%s]" % CLASS_XPATH % "result__snippet")[0].text_content().strip(),
+                    "url": link.xpath(".//a[%s]" % CLASS_XPATH % "result__url")[0].text_content().strip()
+                }
+            )
+        return results
+
+
+def add_meta(meta, get):
+    """
+    Adds a single <meta> tag's content to a meta dict, keyed by the tag's lowercased name, property or http-equiv.
+
+    :param meta: The meta dict being built.
+    :type meta: dict
+    :param get: The tag's attribute getter.
+    :type get: callable
+    """
+    content = get("content")
+    if content is None:
+        return
+
+    for key in META_KEYS:
+        value = get(key)
+        if value:
+            meta.setdefault(value.strip().lower(), content.strip())
+            return
+
+
+BACKENDS = {
+    SoupBackend.name: SoupBackend(),
+    LxmlSoupBackend.name: LxmlSoupBackend(),
+    LxmlBackend.name: LxmlBackend(),
+}
+
+
+def get_backend(name):
+    """
+    Gets a parse backend by name.
+
+    :param name: The backend name, "html.parser", "lxml" or "lxml-direct".
+    :type name: str
+    :returns: The parse backend.
+    :rtype: <SoupBackend> or <LxmlBackend> obj
+    :raises: carpetbag.errors.InvalidParserBackend, carpetbag.errors.ParserBackendUnavailable
+    """
+    if name not in BACKENDS:
+        raise errors.InvalidParserBackend(name)
+
+    backend = BACKENDS[name]
+    if backend.requires and not module_available(backend.requires):
+        raise errors.ParserBackendUnavailable(
+            "The %s parse backend needs %s installed, ie pip install carpetbag[%s]" % (
+                name, backend.requires, backend.requires))
+
+    return backend
+
+
+@functools.lru_cache(maxsize=None)
+def module_available(name):
+    """
+    Checks if a module is installed, without importing it.
+
+    :param name: The module's name.
+    :type name: str
+    :returns: Whether or not the module can be imported.
+    :rtype: bool
+    """
+    return importlib.util.find_spec(name) is not None
+
+# EndFile: carpetbag/carpetbag/parse_backends.py
@@ -0,0 +1,184 @@
+"""Parse Cache
+Keeps ParseResponse extractor results keyed by a hash of the page body, so re-fetching a page that hasn't changed
+doesn't mean parsing it again. Results are kept pickled, in memory up to a byte budget, dropping the least recently
+used first, and optionally on disk, where any process on the host can pick them up.
+
+"""
+from collections import OrderedDict
+from hashlib import blake2b
+import logging
+import os
+import pickle
+import threading
+
+MISSING = object()
+
+
+def content_hash(content):
+    """
+    Hashes a page body with BLAKE2b, which is faster than MD5 on 64 bit machines.
+
+    :param content: The page body.
+    :type content: bytes
+    :returns: The hex digest.
+    :rtype: str
+    """
+    return blake2b(content, digest_size=16).hexdigest()
+
+
+class ParseCache(object):
+
+    def __init__(self, max_bytes=67108864, path=None):
+        """
+        Creates a new parse cache.
+
+        :param max_bytes: The most bytes of pickled results to keep in memory, default 64 MegaBytes.
+        :type max_bytes: int
+        :param path: A directory to keep results in on disk as well, optional. Disk entries are never evicted.
+        :type path: str
+        """
+        self.max_bytes = max_bytes
+        self.path = path
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def __repr__(self):
+        return "<ParseCache %s entries %s/%s bytes>" % (len(self.entries), self.size, self.max_bytes)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        Gets a cached result, checking memory first and then the disk.
+
+        :param key: The cache key, see ParseResponse.cache_key().
+        :type key: str
+        :returns: The cached result, or MISSING if it's not cached.
+        :rtype: mixed
+        """
+        with self.lock:
+            pickled = self.entries.get(key)
+            if pickled is not None:
+                self.entries.move_to_end(key)
+
+        if pickled is None:
+            pickled = self._read(key)
+            if pickled is None:
+                self.misses += 1
+                return MISSING
+            self._remember(key, pickled)
+
+        self.hits += 1
+        return pickle.loads(pickled)
+
+    def set(self, key, value):
+        """
+        Caches a result.
+
+        :param key: The cache key, see ParseResponse.cache_key().
+        :type key: str
+        :param value: The extractor's result, which must pickle.
+        :type value: mixed
+        :returns: Whether or not the result was cached.
+        :rtype: bool
+        """
+        try:
+            pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            self.logger.debug("Not caching %s, result doesn't pickle: %s" % (key, e))
+            return False
+
+        self._remember(key, pickled)
+        self._write(key, pickled)
+        return True
+
+    def clear(self):
+        """
+        Empties the in memory cache. Results on disk are kept.
+
+        """
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _remember(self, key, pickled):
+        """
+        Keeps a pickled result in memory, evicting the least recently used results to stay under max_bytes.
+
+        :param key: The cache key.
+        :type key: str
+        :param pickled: The pickled result.
+        :type pickled: bytes
+        """
+        if len(pickled) > self.max_bytes:
+            return
+
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+
+            self.entries[key] = pickled
+            self.size += len(pickled)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def _disk_path(self, key):
+        """
+        Gets the file a result is kept in on disk, fanned out over sub directories by the key's hash.
+
+        :param key: The cache key.
+        :type key: str
+        :returns: The file path.
+        :rtype: str
+        """
+        name = content_hash(key.encode("utf-8"))
+        return os.path.join(self.path, name[:2], "%s.pickle" % name)
+
+    def _read(self, key):
+        """
+        Reads a pickled result from disk.
+
+        :param key: The cache key.
+        :type key: str
+        :returns: The pickled result, or None if it's not on disk.
+        :rtype: bytes
+        """
+        if not self.path:
+            return None
+
+        try:
+            with open(self._disk_path(key), "rb") as phile:
+                return phile.read()
+        except (IOError, OSError):
+            return None
+
+    def _write(self, key, pickled):
+        """
+        Writes a pickled result to disk atomically.
+
+        :param key: The cache key.
+        :type key: str
+        :param pickled: The pickled result.
+        :type pickled: bytes
+        """
+        if not self.path:
+            return
+
+        phile_path = self._disk_path(key)
+        tmp_path = "%s.%s.%s.tmp" % (phile_path, os.getpid(), threading.get_ident())
+        try:
+            os.makedirs(os.path.dirname(phile_path), exist_ok=True)
+            with open(tmp_path, "wb") as phile:
+                phile.write(pickled)
+            os.replace(tmp_path, phile_path)
+        except (IOError, OSError) as e:
+            self.logger.warning("Could not write parse cache file %s: %s" % (phile_path, e))
+
+# EndFile: carpetbag/carpetbag/parse_cache.py
@@ -0,0 +1,210 @@
+"""Parse Pool
+Runs ParseResponse extractors in worker processes, so parsing scales across every core instead of fighting the fetch
+threads for the GIL. Only plain data crosses the process boundary: each page goes out as its url, raw bytes and headers,
+and comes back as a dict of extractor results.
+
+"""
+import logging
+import os
+
+from requests.structures import CaseInsensitiveDict
+
+from . import charset
+from .parse_cache import MISSING
+from .parse_response import ParseResponse
+from .schema import Schema
+
+DEFAULT_EXTRACTORS = ["get_title", "get_meta", "get_canonical", "get_links"]
+
+
+class RawResponse(object):
+
+    def __init__(self, url, content, headers=None):
+        """
+        A minimal stand in for a Requests response, holding only what ParseResponse needs, so it can be pickled and
+        sent to a worker process.
+
+        :param url: The response's url.
+        :type url: str
+        :param content: The response's raw body.
+        :type content: bytes
+        :param headers: The response's headers, looked up case insensitively like a Requests response's.
+        :type headers: dict
+        """
+        self.url = url
+        self.content = content
+        self.headers = CaseInsensitiveDict(headers or {})
+
+    def __repr__(self):
+        return "<RawResponse %s>" % self.url
+
+    @property
+    def text(self):
+        return charset.decode(self.content, self.headers.get("Content-Type"))
+
+    @classmethod
+    def from_response(cls, response):
+        """
+        Creates a RawResponse from a Requests response, or anything else with a url and content or text.
+
+        :param response: The response.
+        :type response: <Response> obj
+        :returns: The raw response.
+        :rtype: <RawResponse> obj
+        """
+        content = getattr(response, "content", None)
+        if not isinstance(content, bytes):
+            content = response.text.encode("utf-8")
+            headers = {"Content-Type": "text/html; charset=utf-8"}
+        else:
+            headers = CaseInsensitiveDict(getattr(response, "headers", None) or {})
+
+        return cls(response.url, content, headers)
+
+
+def result_key(extractor):
+    """
+    Gets the results dict key for an extractor, ie "get_title" is "title", and a Schema's is its name.
+
+    :param extractor: The extractor's ParseResponse method name, or a Schema.
+    :type extractor: str or <Schema> obj
+    :returns: The results key.
+    :rtype: str
+    """
+    if isinstance(extractor, Schema):
+        return extractor.name
+    if extractor.startswith("get_"):
+        return extractor[4:]
+    return extractor
+
+
+def parse_job(job):
+    """
+    Parses a single page and runs the extractors against it. This runs in the worker process.
+
+    :param job: The raw response, parser backend name and extractors, ParseResponse method names or Schemas.
+    :type job: tuple
+    :returns: The url and each extractor's result, or the error if parsing failed.
+    :rtype: dict
+    """
+    raw, parser, extractors = job
+    result = {"url": raw.url}
+    try:
+        parsed = ParseResponse(raw, parser)
+        parsed.prepare(extractors)
+        for extractor in extractors:
+            result[result_key(extractor)] = parsed.run(extractor)
+    except Exception as e:
+        result["error"] = "%s: %s" % (e.__class__.__name__, e)
+
+    return result
+
+
+class ParsePool(object):
+
+    def __init__(self, processes=None):
+        """
+        Creates a new parse pool. Worker processes are started the first time they're needed, and kept until close().
+
+        :param processes: Number of worker processes, defaults to the number of cores. With 1 or less, pages are
+            parsed in this process.
+        :type processes: int
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.executor = None
+        self.logger = logging.getLogger(__name__)
+
+    def __repr__(self):
+        return "<ParsePool %s>" % self.processes
+
+    def parse_many(self, responses, parser="html.parser", extractors=None, cache=None, chunksize=4):
+        """
+        Parses many responses, running the extractors against each one.
+
+        :param responses: The responses to parse.
+        :type responses: list
+        :param parser: The parse backend to use, see parse_backends.
+        :type parser: str
+        :param extractors: The ParseResponse method names or Schemas to run, defaults to DEFAULT_EXTRACTORS.
+        :type extractors: list
+        :param cache: A parse cache, pages with every result cached aren't sent to the workers.
+        :type cache: <ParseCache> obj
+        :param chunksize: Number of pages sent to a worker at a time.
+        :type chunksize: int
+        :returns: One dict per response, in order, keyed by the extractor names without "get_" and the schema
+            names, plus the url and an "error" key for pages which failed.
+        :rtype: list
+        """
+        extractors = list(extractors or DEFAULT_EXTRACTORS)
+        jobs = [(RawResponse.from_response(response), parser, extractors) for response in responses]
+        results = [None] * len(jobs)
+        cache_keys = {}
+        if cache is not None:
+            for index, job in enumerate(jobs):
+                results[index], cache_keys[index] = self._cached_result(job, cache)
+
+        todo = [index for index, result in enumerate(results) if result is None]
+        for index, result in zip(todo, self._parse_jobs([jobs[index] for index in todo], chunksize)):
+            results[index] = result
+            if cache is not None:
+                for extractor, key in zip(extractors, cache_keys[index]):
+                    if result_key(extractor) in result:
+                        cache.set(key, result[result_key(extractor)])
+
+        return results
+
+    def _parse_jobs(self, jobs, chunksize=4):
+        """
+        Runs parse jobs, in the worker processes when there's more than one job.
+
+        :param jobs: The parse jobs.
+        :type jobs: list
+        :param chunksize: Number of pages sent to a worker at a time.
+        :type chunksize: int
+        :returns: The parse job results, in order.
+        :rtype: list
+        """
+        if self.processes <= 1 or len(jobs) <= 1:
+            return [parse_job(job) for job in jobs]
+
+        if not self.executor:
+            from concurrent.futures import ProcessPoolExecutor
+
+            self.logger.debug("Starting %s parse worker processes" % self.processes)
+            self.executor = ProcessPoolExecutor(self.processes)
+
+        return list(self.executor.map(parse_job, jobs, chunksize=chunksize))
+
+    def _cached_result(self, job, cache):
+        """
+        Gets a page's results from the parse cache.
+
+        :param job: The parse job.
+        :type job: tuple
+        :param cache: The parse cache.
+        :type cache: <ParseCache> obj
+        :returns: The page's results, or None unless every extractor's result was cached, and the cache keys.
+        :rtype: tuple
+        """
+        raw, parser, extractors = job
+        parsed = ParseResponse(raw, parser, cache)
+        keys = [parsed.cache_key(extractor) for extractor in extractors]
+        result = {"url": raw.url}
+        for extractor, key in zip(extractors, keys):
+            value = cache.get(key)
+            if value is MISSING:
+                return None, keys
+            result[result_key(extractor)] = value
+
+        return result, keys
+
+    def close(self):
+        """
+        Shuts down the worker processes.
+
+        """
+        if self.executor:
+            self.executor.shutdown()
+            self.executor = None
+
+# EndFile: carpetbag/carpetbag/parse_pool.py
@@ -2,29 +2,280 @@
 Handles parsing various html pages. This module is pretty experimental right now and may prove not necessary later on.
 
 """
-from bs4 import BeautifulSoup
-import tld
+import functools
+from urllib.parse import urljoin
 
 from . import carpet_tools as ct
+from . import charset
+from . import parse_backends
+from . import link_extractor
+from . import parse_cache
+from . import simhash
+
+
+def cached(extractor):
+    """
+    Decorates a ParseResponse extractor so its result is kept in the ParseResponse's parse cache, when there is one and
+    the extractor is called without arguments.
+
+    :param extractor: The extractor method.
+    :type extractor: callable
+    :returns: The wrapped extractor.
+    :rtype: callable
+    """
+    @functools.wraps(extractor)
+    def wrapper(self, *args, **kwargs):
+        if self.cache is None or args or kwargs:
+            return extractor(self, *args, **kwargs)
+        return self.cached_run(extractor.__name__, lambda: extractor(self))
+
+    return wrapper
 
 
 class ParseResponse(object):
 
-    def __init__(self, response=None):
+    # The part of the document each targeted extractor needs, as the tag name and attributes to parse. When the full
+    # tree has not been built, these extractors parse only what they need with a strainer.
+    strainers = {
+        "get_title": ("title", {}),
+        "get_meta": ("meta", {}),
+        "get_canonical": ("link", {"rel": "canonical"}),
+        "duckduckgo_results": ("div", {"class": "result"}),
+        "anchors": ("a", {}),
+    }
+
+    # Extractors whose results depend on the page url as well as its content, so the url is part of their cache key.
+    url_dependent = ["get_links", "get_canonical"]
+
+    def __init__(self, response=None, parser="html.parser", cache=None):
         """
-        Creates a new response parser.
+        Creates a new response parser. Nothing is parsed up front, the content, domain and tree are each worked out
+        the first time they're used and then kept.
 
         :param response: The response from the Requests module
         :type response: <Requests>
+        :param parser: The parse backend to use, "html.parser", "lxml" or "lxml-direct". See parse_backends.
+        :type parser: str
+        :param cache: A parse cache to keep extractor results in, keyed by the content's hash, optional.
+        :type cache: <ParseCache> obj
+        :raises: carpetbag.errors.InvalidParserBackend
         """
         self.response = response
-        self.content = None
-        self.domain = None
-        self.soup = self._make_soup()
+        self.parser = parse_backends.get_backend(parser)
+        self.cache = cache
+        self._content = None
+        self._raw = None
+        self._content_hash = None
+        self._domain = None
+        self._tree = None
+        self._soup = None
+        self._strained_trees = {}
 
     def __repr__(self):
         return "<Parsed %s>" % self.response.url
 
+    @property
+    def content(self):
+        """
+        The response's decoded content. The raw bytes are decoded once, with the charset from the headers, a byte order
+        mark or an early <meta> tag, see carpetbag.charset. Responses without raw bytes use their text.
+
+        :returns: The response's content.
+        :rtype: str
+        """
+        if self._content is None:
+            raw = getattr(self.response, "content", None)
+            if isinstance(raw, bytes):
+                headers = getattr(self.response, "headers", None) or {}
+                self._content = charset.decode(raw, headers.get("Content-Type"))
+            else:
+                self._content = self.response.text
+        return self._content
+
+    @content.setter
+    def content(self, value):
+        self._content = value
+        self._raw = value.encode("utf-8") if value is not None else None
+        self._content_hash = None
+        self._tree = None
+        self._soup = None
+        self._strained_trees = {}
+
+    @property
+    def content_hash(self):
+        """
+        A hash of the response's raw body, or of the content if it's been replaced.
+
+        :returns: The hex digest.
+        :rtype: str
+        """
+        if self._content_hash is None:
+            raw = self._raw
+            if raw is None:
+                raw = getattr(self.response, "content", None)
+                if not isinstance(raw, bytes):
+                    raw = self.content.encode("utf-8")
+            self._content_hash = parse_cache.content_hash(raw)
+        return self._content_hash
+
+    @property
+    def domain(self):
+        """
+        The response url's top level domain.
+
+        :returns: The response url's top level domain.
+        :rtype: str
+        """
+        if self._domain is None:
+            import tld
+
+            self._domain = tld.get_tld(self.response.url)
+        return self._domain
+
+    @property
+    def tree(self):
+        """
+        The response's content parsed by the parse backend. For the "html.parser" and "lxml" backends this is the
+        Beautiful Soup tree, for "lxml-direct" it's an lxml html tree.
+
+        :returns: The parsed content.
+        :rtype: <BeautifulSoup> or <lxml.html.HtmlElement> obj
+        """
+        if self._tree is None:
+            if self.parser.parses_bytes:
+                raw, encoding = self._raw_content()
+                self._tree = self.parser.make_tree(raw, encoding=encoding)
+            else:
+                self._tree = self.parser.make_tree(self.content)
+        return self._tree
+
+    @property
+    def soup(self):
+        """
+        The response's content parsed with Beautiful Soup. When the parse backend is not a Beautiful Soup backend, a
+        soup is built with Python's html.parser the first time it's asked for.
+
+        :returns: The parsed content.
+        :rtype: <BeautifulSoup> obj
+        """
+        if isinstance(self.parser, parse_backends.SoupBackend):
+            return self.tree
+
+        if self._soup is None:
+            self._soup = self._make_soup()
+        return self._soup
+
+    def extractor_tree(self, extractor):
+        """
+        Gets the tree an extractor should run against. If the full tree has already been built it's used, otherwise
+        only the part of the document declared for the extractor in self.strainers is parsed, and kept for the next
+        time it's needed.
+
+        :param extractor: The extractor's name in self.strainers.
+        :type extractor: str
+        :returns: The full or partial tree.
+        :rtype: <BeautifulSoup> or <lxml.html.HtmlElement> obj
+        """
+        strainer = self.strainers.get(extractor)
+        if self._tree is not None or not strainer or not self.parser.supports_strainers:
+            return self.tree
+
+        if extractor not in self._strained_trees:
+            self._strained_trees[extractor] = self.parser.make_tree(self.content, strainer)
+        return self._strained_trees[extractor]
+
+    def prepare(self, extractors):
+        """
+        Gets ready to run several extractors. When more than one of them would parse its own strained tree, a single
+        tree keeping everything they need is parsed instead and shared between them. If one of them needs the full
+        Beautiful Soup tree, ie a Schema, it's built up front and used by them all.
+
+        :param extractors: The extractors' method names, or Schemas.
+        :type extractors: list
+        """
+        if self._tree is not None or not self.parser.supports_strainers:
+            return
+
+        if any(not isinstance(extractor, str) for extractor in extractors):
+            self.tree
+            return
+
+        strained = []
+        for extractor in extractors:
+            if extractor in self.strainers and extractor not in self._strained_trees and extractor not in strained:
+                strained.append(extractor)
+        if len(strained) < 2:
+            return
+
+        tree = self.parser.make_tree(self.content, [self.strainers[extractor] for extractor in strained])
+        for extractor in strained:
+            self._strained_trees[extractor] = tree
+
+    def cache_key(self, extractor):
+        """
+        Creates the parse cache key for an extractor's result on this page.
+
+        :param extractor: The extractor's method name, or a Schema.
+        :type extractor: str or <Schema> obj
+        :returns: The cache key.
+        :rtype: str
+        """
+        url = ""
+        if isinstance(extractor, str):
+            name = extractor
+            if extractor in self.url_dependent:
+                url = self.response.url
+        else:
+            name = "schema:%s" % extractor.key
+
+        return "%s:%s:%s:%s" % (self.content_hash, self.parser.name, name, url)
+
+    def cached_run(self, extractor, run):
+        """
+        Gets an extractor's result from the parse cache, or runs it and caches the result.
+
+        :param extractor: The extractor's method name, or a Schema.
+        :type extractor: str or <Schema> obj
+        :param run: Runs the extractor.
+        :type run: callable
+        :returns: The extractor's result.
+        :rtype: mixed
+        """
+        key = self.cache_key(extractor)
+        value = self.cache.get(key)
+        if value is parse_cache.MISSING:
+            value = run()
+            self.cache.set(key, value)
+        return value
+
+    def run(self, extractor):
+        """
+        Runs an extractor by its method name, or a Schema.
+
+        :param extractor: The extractor's method name, ie "get_title", or a Schema.
+        :type extractor: str or <Schema> obj
+        :returns: The extractor's result.
+        :rtype: mixed
+        """
+        if isinstance(extractor, str):
+            return getattr(self, extractor)()
+        return self.extract(extractor)
+
+    def get_anchors(self):
+        """
+        Gets all the anchor tags in the content, parsing only the anchors.
+
+        :returns: The anchor tags.
+        :rtype: list
+        """
+        tree = self.extractor_tree("anchors")
+        if isinstance(self.parser, parse_backends.SoupBackend):
+            return tree.find_all("a")
+        if tree is None:
+            return []
+        return list(tree.iter("a"))
+
+    @cached
     def get_title(self):
         """
         Gets the title of the current content
@@ -32,81 +283,116 @@ class ParseResponse(object):
         :returns: The page"s title.
         :rtype: str
         """
-        if not self.soup:
-            return ""
-        elif not self.soup.title:
-            return ""
-        elif not self.soup.title.string:
-            return ""
-        return self.soup.title.string.strip()
+        return self.parser.title(self.extractor_tree("get_title"))
 
-    def get_links(self, content=None):
+    @cached
+    def get_meta(self):
         """
-        Grabs all anchor links for the content and organizes it by local or remote.
+        Gets the page's <meta> tags, keyed by their lowercased name, property or http-equiv, ie "description" or
+        "og:title".
 
-        :param content: A partial piece of content, optional, otherwise scans the entire segment.
-        :type content: str
+        :returns: The meta tag contents.
+        :rtype: dict
         """
-        if content:
-            soup = content
-        else:
-            soup = self.soup
+        return self.parser.meta(self.extractor_tree("get_meta"))
 
-        anchors = soup.findAll("a")
+    @cached
+    def get_canonical(self):
+        """
+        Gets the page's canonical url from its <link rel="canonical"> tag, resolved against the response url.
 
-        ret = {
-            "local": [],
-            "remote": []
-        }
-        for anchor in anchors:
-            if not anchor.get("href"):
-                continue
-            if anchor["href"][0] == "#":
-                continue
+        :returns: The canonical url, or None if the page doesn't have one.
+        :rtype: str
+        """
+        canonical = self.parser.canonical(self.extractor_tree("get_canonical"))
+        if not canonical:
+            return None
+        return urljoin(self.response.url, canonical)
 
-            if self._get_remote_links(anchor["href"]):
-                if anchor["href"] not in ret["remote"]:
-                    ret["remote"].append(anchor["href"])
-                    continue
+    @cached
+    def get_simhash(self):
+        """
+        Gets the SimHash fingerprint of the page's text, see carpetbag.simhash.
 
-            ret["local"].append(anchor["href"])
-        return ret
+        :returns: The 64 bit fingerprint.
+        :rtype: int
+        """
+        return simhash.fingerprint_html(self.content)
 
-    def _get_remote_links(self, anchor):
+    @cached
+    def get_links(self, content=None):
         """
-        Looks for anchors that are linking to other sites.
+        Grabs all anchor links for the content and organizes it by local or remote. Links are resolved against the
+        page url or <base> tag, de-duplicated in the order they're found, and are local when they're on the page's
+        registered domain. The content is tokenized with LinkExtractor, using lxml's tokenizer for the lxml parse
+        backends, and no document tree is built.
 
-        :param anchor: Url to inspect for local or remote url.
-        :type anchor: str
+        :param content: A partial piece of content, optional, otherwise scans the entire segment.
+        :type content: str or a parsed tree
+        :returns: The links, organized by local or remote.
+        :rtype: dict
         """
-        if anchor[:7] == "http://" or anchor[:8] == "https://":
-            return True
-        return False
+        extractor = link_extractor.TOKENIZERS[self.parser.name](self.response.url)
+        if content is None:
+            content = self.content
+
+        if isinstance(content, str):
+            extractor.feed(content)
+            extractor.close()
+        else:
+            for href in self.parser.hrefs(content):
+                extractor.add(href)
+
+        return extractor.links()
 
+    def extract(self, schema):
+        """
+        Extracts a declarative schema's fields from the page, see carpetbag.schema. Schemas run against the Beautiful
+        Soup tree, which with the "lxml-direct" backend is built the first time it's needed.
+
+        :param schema: The compiled schema.
+        :type schema: <Schema> obj
+        :returns: The extracted fields.
+        :rtype: dict or tuple
+        """
+        if self.cache is None:
+            return schema.extract(self.soup)
+        return self.cached_run(schema, lambda: schema.extract(self.soup))
+
+    @cached
     def duckduckgo_results(self):
         """
         Parses a search result page from duckduckgo.com
 
         """
-        links = self.soup.findAll("div", {"class": "result"})
-        results = []
-        for link in links:
-            results.append(
-                {
-                    "title": link.h2.text.strip(),
-                    "description": link.find("a", {"class": "result__snippet"}).text.strip(),
-                    "url": ct.url_add_missing_protocol(link.find("a", {"class": "result__url"}).text.strip())
-                }
-            )
+        results = self.parser.duckduckgo_results(self.extractor_tree("duckduckgo_results"))
+        for result in results:
+            result["url"] = ct.url_add_missing_protocol(result["url"])
         return results
 
+    def _raw_content(self):
+        """
+        Gets the response's raw bytes and their detected encoding, for parse backends which parse bytes. Content which
+        has been replaced, or responses without raw bytes, are encoded as UTF-8.
+
+        :returns: The raw bytes and their encoding.
+        :rtype: tuple
+        """
+        if self._raw is not None:
+            return self._raw, "utf-8"
+
+        raw = getattr(self.response, "content", None)
+        if not isinstance(raw, bytes):
+            return self.content.encode("utf-8"), "utf-8"
+
+        headers = getattr(self.response, "headers", None) or {}
+        return raw, charset.detect_encoding(raw, headers.get("Content-Type"))
+
     def _make_soup(self):
         """
         Converts the self.content var into soup.
 
         """
-        self.content = self.response.text
-        self.domain = tld.get_tld(self.response.url)
-        return BeautifulSoup(self.content, "html.parser")
+        return parse_backends.get_backend("html.parser").make_tree(self.content)
 
 # EndFile: carpetbag/carpetbag/parse_response.py
@@ -0,0 +1,283 @@
+"""Proxy Cache
+Keeps the public proxy list fetched from bad-actor.services on the local disk, along with local health stats for each
+proxy, so every CarpetBag process on a host can share one fetch instead of hitting the remote service at startup.
+
+"""
+from contextlib import contextmanager
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Non POSIX systems get no file locking.
+    fcntl = None
+
+
+class ProxyCache(object):
+
+    def __init__(self, path=None, ttl=3600):
+        """
+        Creates a new on disk proxy cache.
+
+        :param path: Where to store the cache file, defaults to a file in the system temp dir so all processes on the
+            host share it.
+        :type path: str
+        :param ttl: Seconds a fetched proxy list is considered fresh.
+        :type ttl: int
+        """
+        if not path:
+            path = os.path.join(tempfile.gettempdir(), "carpetbag-proxies.json")
+        self.path = path
+        self.ttl = ttl
+        self.stats_flush_every = 25
+        self.pending_stats = {}
+        self.pending_stats_count = 0
+        self.pending_stats_lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def __repr__(self):
+        return "<ProxyCache %s>" % self.path
+
+    def get(self, key=""):
+        """
+        Gets a cached proxy list.
+
+        :param key: The cache key of the proxy list, usually built from the continent filter.
+        :type key: str
+        :returns: The cached proxies or None if nothing is cached, and whether or not the list is stale.
+        :rtype: tuple
+        """
+        with self._lock():
+            data = self._read()
+
+        cached = data["lists"].get(key)
+        if not cached:
+            return None, True
+
+        stale = time.time() - cached["fetched"] > self.ttl
+        return cached["proxies"], stale
+
+    def set(self, key, proxies):
+        """
+        Stores a freshly fetched proxy list.
+
+        :param key: The cache key of the proxy list, usually built from the continent filter.
+        :type key: str
+        :param proxies: The proxies fetched from bad-actor.services.
+        :type proxies: list
+        :returns: Success if the cache was written.
+        :rtype: bool
+        """
+        with self._lock(exclusive=True):
+            data = self._read()
+            data["lists"][key] = {
+                "fetched": time.time(),
+                "proxies": proxies,
+            }
+            self._merge_pending_stats(data, self._take_pending_stats())
+            self._write(data)
+
+        return True
+
+    def record(self, address, success, roundtrip=None):
+        """
+        Records the outcome of a request made through a proxy. Stats are kept in memory and merged into the cache file
+        every self.stats_flush_every records, so the request path is not doing disk writes every time.
+
+        :param address: The proxy address, ie "https://103.92.154.98:44863".
+        :type address: str
+        :param success: Whether or not the request through the proxy worked.
+        :type success: bool
+        :param roundtrip: The round trip time of the request in milliseconds.
+        :type roundtrip: int
+        """
+        with self.pending_stats_lock:
+            stats = self.pending_stats.setdefault(address, {"success": 0, "failure": 0, "roundtrip_total": 0})
+            if success:
+                stats["success"] += 1
+                if roundtrip:
+                    stats["roundtrip_total"] += roundtrip
+            else:
+                stats["failure"] += 1
+
+            self.pending_stats_count += 1
+            flush = self.pending_stats_count >= self.stats_flush_every
+
+        if flush:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """
+        Merges the in memory proxy stats into the cache file.
+
+        :returns: Success if stats were written.
+        :rtype: bool
+        """
+        if not self.pending_stats:
+            return True
+
+        with self._lock(exclusive=True):
+            data = self._read()
+            self._merge_pending_stats(data, self._take_pending_stats())
+            self._write(data)
+
+        return True
+
+    def stats(self, address=None):
+        """
+        Gets the local health stats for all proxies, or a single proxy.
+
+        :param address: The proxy address to get stats for.
+        :type address: str
+        :returns: The health stats.
+        :rtype: dict
+        """
+        with self._lock():
+            data = self._read()
+
+        # Merge a copy, the pending stats stay pending until they're flushed.
+        with self.pending_stats_lock:
+            pending = dict((address, dict(stats)) for address, stats in self.pending_stats.items())
+        self._merge_pending_stats(data, pending)
+
+        if address:
+            return data["stats"].get(address, {})
+        return data["stats"]
+
+    def rank(self, proxies):
+        """
+        Orders a proxy list so proxies which have been failing locally more than they succeed go to the back of the
+        list. The original order is kept otherwise, so shuffled lists stay shuffled.
+
+        :param proxies: The proxies to order.
+        :type proxies: list
+        :returns: The ordered proxies.
+        :rtype: list
+        """
+        stats = self.stats()
+
+        def health(proxy):
+            proxy_stats = stats.get(proxy["address"])
+            if not proxy_stats:
+                return 0
+            return proxy_stats["failure"] - proxy_stats["success"]
+
+        return sorted(proxies, key=lambda proxy: health(proxy) > 0)
+
+    @contextmanager
+    def try_refresh_lock(self):
+        """
+        Attempts to grab the refresh lock without blocking, so only one process on the host refreshes a stale proxy
+        list at a time.
+
+        :returns: Whether or not the lock was acquired.
+        :rtype: bool
+        """
+        if not fcntl:
+            yield True
+            return
+
+        phile = open(self.path + ".refresh", "a")
+        try:
+            fcntl.flock(phile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (IOError, OSError):
+            phile.close()
+            yield False
+            return
+
+        try:
+            yield True
+        finally:
+            fcntl.flock(phile, fcntl.LOCK_UN)
+            phile.close()
+
+    def _take_pending_stats(self):
+        """
+        Takes the in memory proxy stats for writing to the cache file, leaving none pending.
+
+        :returns: The pending stats.
+        :rtype: dict
+        """
+        with self.pending_stats_lock:
+            pending_stats = self.pending_stats
+            self.pending_stats = {}
+            self.pending_stats_count = 0
+
+        return pending_stats
+
+    def _merge_pending_stats(self, data, pending_stats):
+        """
+        Merges in memory proxy stats into the cache data.
+
+        :param data: The cache data read from disk.
+        :type data: dict
+        :param pending_stats: The in memory stats to merge.
+        :type pending_stats: dict
+        """
+        for address, pending in pending_stats.items():
+            stats = data["stats"].setdefault(address, {"success": 0, "failure": 0, "avg_roundtrip": None})
+            roundtrip_total = (stats["avg_roundtrip"] or 0) * stats["success"] + pending["roundtrip_total"]
+            stats["success"] += pending["success"]
+            stats["failure"] += pending["failure"]
+            if stats["success"]:
+                stats["avg_roundtrip"] = roundtrip_total / stats["success"]
+            stats["last_used"] = time.time()
+
+    @contextmanager
+    def _lock(self, exclusive=False):
+        """
+        Locks the cache file's sidecar lock file for reading or writing between processes.
+
+        :param exclusive: Grab an exclusive lock for writing, otherwise a shared lock for reading.
+        :type exclusive: bool
+        """
+        if not fcntl:
+            yield
+            return
+
+        with open(self.path + ".lock", "a") as phile:
+            if exclusive:
+                fcntl.flock(phile, fcntl.LOCK_EX)
+            else:
+                fcntl.flock(phile, fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(phile, fcntl.LOCK_UN)
+
+    def _read(self):
+        """
+        Reads the cache file, the caller should be holding the lock.
+
+        :returns: The cache data.
+        :rtype: dict
+        """
+        data = {"lists": {}, "stats": {}}
+        if not os.path.exists(self.path):
+            return data
+
+        try:
+            with open(self.path, "r") as phile:
+                data.update(json.load(phile))
+        except (IOError, OSError, ValueError):
+            self.logger.warning("Could not read proxy cache %s, ignoring it." % self.path)
+
+        return data
+
+    def _write(self, data):
+        """
+        Writes the cache file atomically, the caller should be holding the exclusive lock.
+
+        :param data: The cache data.
+        :type data: dict
+        """
+        tmp_path = "%s.%s.tmp" % (self.path, os.getpid())
+        with open(tmp_path, "w") as phile:
+            json.dump(data, phile)
+        os.replace(tmp_path, self.path)
+
+# EndFile: carpetbag/carpetbag/proxy_cache.py
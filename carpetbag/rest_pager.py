@@ -0,0 +1,320 @@
+"""Rest Pager
+Walks a paginated REST resource a page at a time, so objects can be processed as they arrive instead of after the
+whole resource is held in memory. While a page is being processed, the next one is already being fetched in the
+background.
+
+Three pagination styles are understood.
+    page: A page number parameter, with the total pages in the body, as set in CarpetBag.paginatation_map.
+    link: A Link header with a rel="next" url, like GitHub's API.
+    cursor: A cursor in the body, ie {"next_cursor": "abc"}, sent back as a parameter for the next page.
+
+    for bag in bagger.iter_rest_objects("https://www.bad-actor.services/api/bags"):
+        print(bag["id"])
+
+With stream=True, each page's objects are pulled out of its body as it downloads with a JsonStream, for APIs whose
+pages are too big to parse whole.
+
+"""
+from itertools import chain
+import logging
+from urllib.parse import urljoin
+
+from requests.utils import parse_header_links
+
+from . import charset
+from .json_stream import JsonStream
+
+STYLES = ["page", "link", "cursor"]
+
+
+class RestPager(object):
+
+    def __init__(
+        self,
+        bagger,
+        url,
+        payload=None,
+        style=None,
+        cursor_field="next_cursor",
+        cursor_param="cursor",
+        max_pages=None
+    ):
+        """
+        Creates a pager over a REST resource.
+
+        :param bagger: The CarpetBag to fetch with, the next page is fetched in the background by a clone of it.
+        :type bagger: <CarpetBag> obj
+        :param url: The resource's url.
+        :type url: str
+        :param payload: The data to be sent over GET with every page.
+        :type payload: dict
+        :param style: The pagination style, "page", "link" or "cursor", or None to pick one from the first page.
+        :type style: str
+        :param cursor_field: The body field holding the next cursor, dots for nested fields ie "meta.next".
+        :type cursor_field: str
+        :param cursor_param: The parameter the cursor is sent back as.
+        :type cursor_param: str
+        :param max_pages: The most pages to fetch.
+        :type max_pages: int
+        :raises: ValueError for an unknown style.
+        """
+        if style is not None and style not in STYLES:
+            raise ValueError("Unknown pagination style %s, use one of %s" % (style, ", ".join(STYLES)))
+
+        self.bagger = bagger
+        self.url = url
+        self.payload = dict(payload or {})
+        self.style = style
+        self.cursor_field = cursor_field
+        self.cursor_param = cursor_param
+        self.max_pages = max_pages
+        self.pages = 0
+        self.logger = logging.getLogger(__name__)
+
+    def __repr__(self):
+        return "<RestPager %s %s pages>" % (self.url, self.pages)
+
+    def iter_pages(self):
+        """
+        Fetches the resource's pages, one ahead of the consumer. The next page's body is downloaded in the background
+        too, not just its headers. If the consumer stops early, the page fetched ahead is closed.
+
+        :returns: Each page's response, in order.
+        :rtype: generator
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        fetcher = self.bagger.clone()
+        executor = ThreadPoolExecutor(max_workers=1)
+        future = None
+        try:
+            request = (self.url, self.payload)
+            response = self.bagger.get(*request)
+            while response is not None:
+                if response.status_code not in [200]:
+                    self.logger.warning("Could not get page %s of %s: <%s>" % (
+                        self.pages + 1, self.url, response.status_code))
+                    return
+
+                self.pages += 1
+                request = None
+                if self.max_pages is None or self.pages < self.max_pages:
+                    request = self.next_request(response.url, response)
+                if request:
+                    future = executor.submit(self._fetch_page, fetcher, request)
+
+                yield response
+
+                response = future.result() if request else None
+                future = None
+        finally:
+            if future and not future.cancel():
+                future.add_done_callback(close_fetched_page)
+            executor.shutdown(wait=False)
+
+    def iter_objects(self, data_field=None, stream=False):
+        """
+        Fetches the resource's objects, a page at a time.
+
+        :param data_field: The body field holding each page's objects, defaults to the paginatation_map's. A body
+            which is just a list is used as is.
+        :type data_field: str
+        :param stream: Stream each page's objects out of its body as it downloads, for pages too big to parse whole.
+        :type stream: bool
+        :returns: Each object, in order.
+        :rtype: generator
+        """
+        data_field = data_field or self.bagger.paginatation_map.get("field_name_data")
+        if stream:
+            yield from self._iter_streamed_objects(data_field)
+            return
+
+        for response in self.iter_pages():
+            page_json = getattr(response, "page_json", None)
+            if page_json is None:
+                page_json = response.json()
+            objects = page_json if isinstance(page_json, list) else get_field(page_json, data_field)
+            for obj in objects or []:
+                yield obj
+
+    def next_request(self, url, response, page_json=None, objects=None):
+        """
+        Works out the request for the page after a response, picking the pagination style from the first page if it
+        wasn't given. The parsed body is kept on the response as page_json, so it's only parsed once.
+
+        :param url: The url the response came from.
+        :type url: str
+        :param response: The page's response.
+        :type response: <Requests.response> obj
+        :param page_json: The page's body, if it's already been read, ie a JsonStream's fields.
+        :type page_json: dict
+        :param objects: The number of objects on the page, if they aren't in page_json.
+        :type objects: int
+        :returns: The url and payload for the next page, or None if it was the last.
+        :rtype: tuple
+        """
+        next_link = self._next_link(url, response)
+        if page_json is None and self.style != "link":
+            page_json = response.json()
+            response.page_json = page_json
+
+        if self.style is None:
+            if next_link:
+                self.style = "link"
+            elif isinstance(page_json, dict) and get_field(page_json, self.cursor_field) is not None:
+                self.style = "cursor"
+            else:
+                self.style = "page"
+            self.logger.debug("Paginating %s by %s" % (self.url, self.style))
+
+        if self.style == "link":
+            return (next_link, None) if next_link else None
+
+        if self.style == "cursor":
+            cursor = get_field(page_json, self.cursor_field) if isinstance(page_json, dict) else None
+            if cursor in [None, ""]:
+                return None
+            payload = dict(self.payload)
+            payload[self.cursor_param] = cursor
+            return self.url, payload
+
+        return self._next_page_request(page_json, objects)
+
+    def _fetch_page(self, fetcher, request):
+        """
+        Fetches a page and downloads its body, GET responses are streamed so the body isn't read with the headers.
+
+        :param fetcher: The CarpetBag fetching pages ahead.
+        :type fetcher: <CarpetBag> obj
+        :param request: The url and payload of the page.
+        :type request: tuple
+        :returns: The page's response.
+        :rtype: <Requests.response> obj
+        """
+        response = fetcher.get(*request)
+        # Reading the content downloads and keeps the whole body.
+        response.content
+
+        return response
+
+    def _iter_streamed_objects(self, data_field, chunk_size=65536):
+        """
+        Fetches the resource's objects, streaming each page's body through a JsonStream so not even one page is held
+        in memory. Unlike iter_pages(), the next page isn't fetched until a page has been read, as its cursor or total
+        pages might come after its objects.
+
+        :param data_field: The body field holding each page's objects.
+        :type data_field: str
+        :param chunk_size: The number of bytes to read at a time.
+        :type chunk_size: int
+        :returns: Each object, in order.
+        :rtype: generator
+        """
+        request = (self.url, self.payload)
+        while request:
+            response = self.bagger.get(*request)
+            if response.status_code not in [200]:
+                self.logger.warning("Could not get page %s of %s: <%s>" % (
+                    self.pages + 1, self.url, response.status_code))
+                return
+
+            self.pages += 1
+            chunks = response.iter_content(chunk_size)
+            first = next(chunks, b"")
+            path = "*" if first.lstrip()[:1] in [b"[", "["] else "%s.*" % data_field
+            stream = JsonStream(path, charset.header_encoding(response.headers.get("Content-Type")) or "utf-8")
+
+            objects = 0
+            for chunk in chain([first], chunks):
+                for obj in stream.feed(chunk):
+                    objects += 1
+                    yield obj
+            for obj in stream.close():
+                objects += 1
+                yield obj
+
+            request = None
+            if self.max_pages is None or self.pages < self.max_pages:
+                request = self.next_request(response.url, response, stream.fields, objects)
+
+    def _next_link(self, url, response):
+        """
+        Gets the rel="next" url from a response's Link header.
+
+        :param url: The url the response came from, to resolve a relative link against.
+        :type url: str
+        :param response: The page's response.
+        :type response: <Requests.response> obj
+        :returns: The next page's url, or None.
+        :rtype: str
+        """
+        header = response.headers.get("Link")
+        if not header:
+            return None
+
+        for link in parse_header_links(header):
+            if "next" in link.get("rel", "").split() and link.get("url"):
+                return urljoin(url, link["url"])
+
+        return None
+
+    def _next_page_request(self, page_json, objects=None):
+        """
+        Works out the next page number request from the paginatation_map's fields. Without a total pages field,
+        paging stops at the first page without objects.
+
+        :param page_json: The page's body.
+        :type page_json: dict
+        :param objects: The number of objects on the page, if they aren't in page_json.
+        :type objects: int
+        :returns: The url and payload for the next page, or None if it was the last.
+        :rtype: tuple
+        """
+        pagination_map = self.bagger.paginatation_map
+        if not isinstance(page_json, dict):
+            return None
+
+        page = page_json.get(pagination_map.get("field_name_page")) or self.pages
+        total_pages = page_json.get(pagination_map.get("field_name_total_pages"))
+        if total_pages is not None and page >= total_pages:
+            return None
+        if objects is None:
+            objects = len(get_field(page_json, pagination_map.get("field_name_data")) or [])
+        if total_pages is None and not objects:
+            return None
+
+        payload = dict(self.payload)
+        payload[pagination_map.get("field_name_page")] = page + 1
+        return self.url, payload
+
+
+def close_fetched_page(future):
+    """
+    Closes the response of a page fetched ahead which the consumer never took, once it's fetched.
+
+    :param future: The page's fetch.
+    :type future: <Future> obj
+    """
+    if not future.exception():
+        future.result().close()
+
+
+def get_field(data, field):
+    """
+    Gets a field from a json body, following dots into nested objects.
+
+    :param data: The json body.
+    :type data: dict
+    :param field: The field, ie "meta.next_cursor".
+    :type field: str
+    :returns: The field's value, or None if it's missing.
+    :rtype: mixed
+    """
+    for key in field.split("."):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+# EndFile: carpetbag/carpetbag/rest_pager.py
@@ -0,0 +1,280 @@
+"""Robots
+Fetches, caches and checks urls against robots.txt files, following RFC 9309. Each host's robots.txt is fetched once
+per ttl, and its rules for our user agent are compiled into regexes, longest first, so checking a url is a few regex
+matches without touching the network.
+
+A robots.txt which 404s, or any other 4xx, allows everything. One which 5xxs or can't be reached disallows everything,
+and is retried after error_ttl.
+
+"""
+import logging
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+class RobotsRules(object):
+
+    def __init__(self, content="", user_agent="*", allow_all=False, disallow_all=False):
+        """
+        Parses a robots.txt for one user agent.
+
+        :param content: The robots.txt body.
+        :type content: str
+        :param user_agent: The user agent's product token, ie "CarpetBag".
+        :type user_agent: str
+        :param allow_all: Allow every url, ie when robots.txt is missing.
+        :type allow_all: bool
+        :param disallow_all: Disallow every url, ie when robots.txt can't be reached.
+        :type disallow_all: bool
+        """
+        self.user_agent = re.split(r"[/\s]", user_agent.strip())[0].lower() or "*"
+        self.rules = []
+        self.crawl_delay = None
+        self.sitemaps = []
+        if disallow_all:
+            self.rules = [(re.compile(""), False)]
+        elif not allow_all:
+            self._parse(content)
+
+    def __repr__(self):
+        return "<RobotsRules %s %s rules>" % (self.user_agent, len(self.rules))
+
+    def allowed(self, url):
+        """
+        Checks if a url may be fetched. The longest matching rule wins, and Allow wins a tie.
+
+        :param url: The url, or just its path and query.
+        :type url: str
+        :returns: Whether or not the url is allowed.
+        :rtype: bool
+        """
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path = "%s?%s" % (path, parts.query)
+
+        for pattern, allow in self.rules:
+            if pattern.match(path):
+                return allow
+
+        return True
+
+    def _parse(self, content):
+        """
+        Reads the groups of rules out of a robots.txt, keeping the rules of every group for our user agent, or the "*"
+        groups if none name it.
+
+        :param content: The robots.txt body.
+        :type content: str
+        """
+        groups = []
+        group = None
+        for line in content.splitlines():
+            line = line.split("#", 1)[0].strip()
+            if ":" not in line:
+                continue
+
+            key, value = line.split(":", 1)
+            key = key.strip().lower()
+            value = value.strip()
+            if key == "sitemap":
+                self.sitemaps.append(value)
+            elif key == "user-agent":
+                # User-agent lines in a row share a group, one after a rule starts a new group.
+                if group is None or group["closed"]:
+                    group = {"agents": [], "rules": [], "crawl_delay": None, "closed": False}
+                    groups.append(group)
+                group["agents"].append(value.lower())
+            elif group is None:
+                continue
+            elif key in ["allow", "disallow"]:
+                group["closed"] = True
+                if value:
+                    group["rules"].append((value, key == "allow"))
+            elif key == "crawl-delay":
+                group["closed"] = True
+                try:
+                    group["crawl_delay"] = float(value)
+                except ValueError:
+                    pass
+
+        matched = [group for group in groups if self.user_agent in group["agents"]]
+        if not matched:
+            matched = [group for group in groups if "*" in group["agents"]]
+
+        rules = []
+        for group in matched:
+            rules.extend(group["rules"])
+            if group["crawl_delay"] is not None:
+                self.crawl_delay = group["crawl_delay"]
+
+        rules.sort(key=lambda rule: (len(rule[0]), rule[1]), reverse=True)
+        self.rules = [(compile_rule(path), allow) for path, allow in rules]
+
+
+def compile_rule(path):
+    """
+    Compiles a robots.txt path, with its * and $ wildcards, into a regex matching from the start of a url's path.
+
+    :param path: The rule's path.
+    :type path: str
+    :returns: The compiled rule.
+    :rtype: <re.Pattern> obj
+    """
+    anchored = path.endswith("$")
+    if anchored:
+        path = path[:-1]
+    pattern = ".*".join(re.escape(piece) for piece in path.split("*"))
+    if anchored:
+        pattern += r"\Z"
+    return re.compile(pattern)
+
+
+class RobotsCache(object):
+
+    def __init__(self, fetch, user_agent="CarpetBag", ttl=86400, error_ttl=300):
+        """
+        Creates a new, empty, robots.txt cache.
+
+        :param fetch: Called with a robots.txt url, returns its status code and body. Any exception it raises is
+            treated as the host being unreachable.
+        :type fetch: callable
+        :param user_agent: The user agent's product token to match robots.txt groups against.
+        :type user_agent: str
+        :param ttl: Seconds to keep a fetched robots.txt.
+        :type ttl: int
+        :param error_ttl: Seconds to keep a robots.txt that couldn't be fetched before trying again.
+        :type error_ttl: int
+        """
+        self.fetch = fetch
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.entries = {}
+        self.host_locks = {}
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def __repr__(self):
+        return "<RobotsCache %s hosts>" % len(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def rules(self, url):
+        """
+        Gets the robots.txt rules for a url's host, fetching them if they aren't cached. Only one thread fetches a
+        host's robots.txt at a time, the others wait for it.
+
+        :param url: Any url on the host.
+        :type url: str
+        :returns: The host's rules.
+        :rtype: <RobotsRules> obj
+        """
+        key = robots_url(url)
+        rules = self.cached(url)
+        if rules is not None:
+            return rules
+
+        with self.lock:
+            host_lock = self.host_locks.setdefault(key, threading.Lock())
+
+        with host_lock:
+            rules = self.cached(url)
+            if rules is not None:
+                return rules
+
+            rules, ttl = self._fetch(key)
+            with self.lock:
+                self.entries[key] = (rules, time.time() + ttl)
+                self.host_locks.pop(key, None)
+
+        return rules
+
+    def cached(self, url):
+        """
+        Gets the cached robots.txt rules for a url's host, without fetching them.
+
+        :param url: Any url on the host.
+        :type url: str
+        :returns: The host's rules, or None if they aren't cached or have expired.
+        :rtype: <RobotsRules> obj
+        """
+        entry = self.entries.get(robots_url(url))
+        if not entry or entry[1] < time.time():
+            return None
+        return entry[0]
+
+    def allowed(self, url):
+        """
+        Checks if a url may be fetched.
+
+        :param url: The url.
+        :type url: str
+        :returns: Whether or not the url is allowed.
+        :rtype: bool
+        """
+        return self.rules(url).allowed(url)
+
+    def crawl_delay(self, url):
+        """
+        Gets the Crawl-delay for a url's host, if its robots.txt is cached.
+
+        :param url: Any url on the host.
+        :type url: str
+        :returns: The delay in seconds, or None.
+        :rtype: float
+        """
+        rules = self.cached(url)
+        if rules is None:
+            return None
+        return rules.crawl_delay
+
+    def clear(self):
+        """
+        Empties the cache.
+
+        """
+        with self.lock:
+            self.entries = {}
+
+    def _fetch(self, url):
+        """
+        Fetches and parses a robots.txt.
+
+        :param url: The robots.txt url.
+        :type url: str
+        :returns: The rules, and how long to cache them for.
+        :rtype: tuple
+        """
+        try:
+            status_code, content = self.fetch(url)
+        except Exception as e:
+            self.logger.warning("Could not fetch %s, disallowing the host: %s" % (url, e))
+            return RobotsRules(user_agent=self.user_agent, disallow_all=True), self.error_ttl
+
+        if status_code >= 500:
+            self.logger.warning("%s returned %s, disallowing the host" % (url, status_code))
+            return RobotsRules(user_agent=self.user_agent, disallow_all=True), self.error_ttl
+
+        if status_code >= 400:
+            return RobotsRules(user_agent=self.user_agent, allow_all=True), self.ttl
+
+        return RobotsRules(content, self.user_agent), self.ttl
+
+
+def robots_url(url):
+    """
+    Gets the robots.txt url for a url's scheme and host.
+
+    :param url: Any url.
+    :type url: str
+    :returns: The robots.txt url.
+    :rtype: str
+    """
+    parts = urlsplit(url)
+    return "%s://%s/robots.txt" % (parts.scheme.lower(), parts.netloc.lower())
+
+# EndFile: carpetbag/carpetbag/robots.py
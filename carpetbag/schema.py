@@ -0,0 +1,193 @@
+"""Schema
+Declarative extraction schemas. A schema maps field names to CSS selectors, with attributes, lists and nesting, and is
+compiled once then applied to as many pages as needed, instead of walking the soup by hand for every site.
+
+    products = Schema({
+        "title": "h1",
+        "canonical": "link[rel=canonical]@href",
+        "items": Field("div.product", many=True, fields={
+            "name": "h2",
+            "url": "a@href",
+            "price": Field("span.price", default="0"),
+        }),
+    }, name="products")
+    products.extract(bagger.parse(response).soup)
+
+Field shorthand strings are "selector" for the matched tag's text, "selector@attr" for one of its attributes, and
+"@attr" for an attribute of the tag being extracted from. The compiled selectors pickle, so schemas are sent to
+parse_many() worker processes already compiled.
+
+"""
+from .parse_cache import content_hash
+
+
+class Field(object):
+
+    def __init__(self, selector=None, attr=None, many=False, fields=None, default=None):
+        """
+        Creates a schema field.
+
+        :param selector: The CSS selector to match, or None for the tag being extracted from.
+        :type selector: str
+        :param attr: The attribute to take from the matched tag, otherwise its stripped text is used.
+        :type attr: str
+        :param many: Extract every match into a list, rather than just the first.
+        :type many: bool
+        :param fields: Nested fields to extract from each match, as for a Schema.
+        :type fields: dict
+        :param default: The value when nothing matches.
+        :type default: mixed
+        """
+        self.selector = selector
+        self.attr = attr
+        self.many = many
+        self.fields = compile_fields(fields) if fields else None
+        self.default = default
+        self.compiled = None
+        if selector:
+            import soupsieve
+
+            self.compiled = soupsieve.compile(selector)
+
+    def __repr__(self):
+        return "<Field %s%s>" % (self.selector or "", "@%s" % self.attr if self.attr else "")
+
+    def spec(self):
+        """
+        Gets everything that decides what the field extracts, as plain data.
+
+        :returns: The field's selector, attribute, many flag, default and nested field specs.
+        :rtype: tuple
+        """
+        nested = None
+        if self.fields:
+            nested = tuple((name, field.spec()) for name, field in self.fields.items())
+        return (self.selector, self.attr, self.many, repr(self.default), nested)
+
+    @classmethod
+    def from_spec(cls, spec):
+        """
+        Creates a field from a Field or a shorthand string, ie "div.title", "a@href" or "@id".
+
+        :param spec: The field or shorthand.
+        :type spec: <Field> or str
+        :returns: The field.
+        :rtype: <Field> obj
+        """
+        if isinstance(spec, Field):
+            return spec
+
+        selector, _, attr = spec.partition("@")
+        return cls(selector.strip() or None, attr.strip() or None)
+
+    def extract(self, tag, as_tuple=False):
+        """
+        Extracts the field's value from a tag.
+
+        :param tag: The tag to extract from.
+        :type tag: <bs4.element.Tag> obj
+        :param as_tuple: Return nested fields as tuples rather than dicts.
+        :type as_tuple: bool
+        :returns: The value, a list of values for many fields.
+        :rtype: mixed
+        """
+        if self.many:
+            matches = self.compiled.select(tag) if self.compiled else [tag]
+            return [self.value(match, as_tuple) for match in matches]
+
+        match = self.compiled.select_one(tag) if self.compiled else tag
+        if match is None:
+            return self.default
+        return self.value(match, as_tuple)
+
+    def value(self, tag, as_tuple=False):
+        """
+        Gets the value of a single matched tag.
+
+        :param tag: The matched tag.
+        :type tag: <bs4.element.Tag> obj
+        :param as_tuple: Return nested fields as tuples rather than dicts.
+        :type as_tuple: bool
+        :returns: The nested fields, attribute or stripped text.
+        :rtype: mixed
+        """
+        if self.fields:
+            return extract_fields(self.fields, tag, as_tuple)
+
+        if self.attr:
+            value = tag.get(self.attr)
+            if value is None:
+                return self.default
+            # Multi valued attributes like class come back from Beautiful Soup as a list.
+            if isinstance(value, list):
+                return " ".join(value)
+            return value
+
+        return tag.get_text().strip()
+
+
+class Schema(object):
+
+    def __init__(self, fields, name="schema", as_tuple=False):
+        """
+        Creates and compiles a schema.
+
+        :param fields: The field names, mapped to Fields or shorthand strings.
+        :type fields: dict
+        :param name: The schema's name, used as its key in parse_many() results.
+        :type name: str
+        :param as_tuple: Extract tuples, in field order, rather than dicts.
+        :type as_tuple: bool
+        """
+        self.fields = compile_fields(fields)
+        self.name = name
+        self.as_tuple = as_tuple
+        # The key identifies what the schema extracts, for caching results, and is the same in every process.
+        spec = (as_tuple, tuple((field_name, field.spec()) for field_name, field in self.fields.items()))
+        self.key = content_hash(repr(spec).encode("utf-8"))
+
+    def __repr__(self):
+        return "<Schema %s %s>" % (self.name, list(self.fields))
+
+    def extract(self, tree):
+        """
+        Extracts the schema's fields from a parsed page, or a piece of one.
+
+        :param tree: The parsed tree.
+        :type tree: <BeautifulSoup> obj
+        :returns: The extracted fields.
+        :rtype: dict or tuple
+        """
+        return extract_fields(self.fields, tree, self.as_tuple)
+
+
+def compile_fields(fields):
+    """
+    Compiles a dict of field specs into Fields, keeping their order.
+
+    :param fields: The field names, mapped to Fields or shorthand strings.
+    :type fields: dict
+    :returns: The field names, mapped to Fields.
+    :rtype: dict
+    """
+    return {name: Field.from_spec(spec) for name, spec in fields.items()}
+
+
+def extract_fields(fields, tag, as_tuple=False):
+    """
+    Extracts compiled fields from a tag.
+
+    :param fields: The field names, mapped to Fields.
+    :type fields: dict
+    :param tag: The tag to extract from.
+    :type tag: <bs4.element.Tag> obj
+    :param as_tuple: Return tuples rather than dicts.
+    :type as_tuple: bool
+    :returns: The extracted fields.
+    :rtype: dict or tuple
+    """
+    if as_tuple:
+        return tuple(field.extract(tag, as_tuple) for field in fields.values())
+    return {name: field.extract(tag, as_tuple) for name, field in fields.items()}
+
+# EndFile: carpetbag/carpetbag/schema.py
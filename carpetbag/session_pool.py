@@ -0,0 +1,115 @@
+"""Session Pool
+Keeps one Requests session, and with it one pool of kept alive connections, per proxy. Repeat requests through the same
+proxy reuse a warm connection instead of setting up a new tunnel and TLS handshake every time. The number of open
+sessions is capped, closing the least recently used one when the cap is hit.
+
+"""
+from collections import OrderedDict
+from http.cookiejar import DefaultCookiePolicy
+import logging
+import threading
+
+import requests
+
+
+class SessionPool(object):
+
+    def __init__(self, max_pools=32):
+        """
+        Creates a new session pool.
+
+        :param max_pools: The max number of proxy sessions to keep open at once.
+        :type max_pools: int
+        """
+        self.max_pools = max_pools
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def __repr__(self):
+        return "<SessionPool %s/%s>" % (len(self.sessions), self.max_pools)
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def get(self, proxies=None):
+        """
+        Gets the session for a proxy, creating it if needed.
+
+        :param proxies: The Requests style proxies dict, ie {"https": "https://103.92.154.98:44863"}, or None for
+            direct connections.
+        :type proxies: dict
+        :returns: The session for the proxy.
+        :rtype: <requests.Session> obj
+        """
+        key = self._key(proxies)
+        with self.lock:
+            session = self.sessions.get(key)
+            if session:
+                self.sessions.move_to_end(key)
+                return session
+
+            session = self._new_session()
+            self.sessions[key] = session
+            while len(self.sessions) > self.max_pools:
+                old_key, old_session = self.sessions.popitem(last=False)
+                self.logger.debug("Closing least recently used session for %s" % (old_key,))
+                old_session.close()
+
+        return session
+
+    def discard(self, proxies=None):
+        """
+        Closes and removes the session for a proxy, for when a proxy has gone bad.
+
+        :param proxies: The Requests style proxies dict.
+        :type proxies: dict
+        :returns: Whether or not a session was discarded.
+        :rtype: bool
+        """
+        with self.lock:
+            session = self.sessions.pop(self._key(proxies), None)
+        if not session:
+            return False
+
+        session.close()
+        return True
+
+    def close(self):
+        """
+        Closes all open sessions.
+
+        """
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+
+        for session in sessions:
+            session.close()
+
+    def _key(self, proxies):
+        """
+        Creates the pool key for a proxies dict.
+
+        :param proxies: The Requests style proxies dict.
+        :type proxies: dict
+        :returns: The pool key.
+        :rtype: tuple
+        """
+        if not proxies:
+            return ()
+        return tuple(sorted(proxies.items()))
+
+    def _new_session(self):
+        """
+        Creates a new session. Cookies are not stored on the session, so pooling connections does not change how
+        requests are sent compared to making them one off.
+
+        :returns: The new session.
+        :rtype: <requests.Session> obj
+        """
+        session = requests.Session()
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        return session
+
+# EndFile: carpetbag/carpetbag/session_pool.py
@@ -0,0 +1,191 @@
+"""SimHash
+64 bit SimHash fingerprints of a page's text, for spotting pages that only changed in their ads or timestamps. Near
+identical pages get fingerprints a small Hamming distance apart.
+
+The fingerprint is built from the set of word shingles in the page's text. Every shingle is hashed, and each bit of
+the fingerprint is set when that bit is set in more than half of the shingle hashes.
+
+SimHashIndex finds a stored fingerprint within max_distance bits of a new one without comparing against every
+fingerprint. Fingerprints are split into max_distance + 1 bands, and by the pigeonhole principle two fingerprints that
+differ in max_distance bits or less must be identical in at least one band, so only fingerprints sharing a band value
+are compared.
+
+"""
+from hashlib import blake2b
+import re
+import threading
+
+BITS = 64
+TAGS = re.compile(r"<script.*?</script>|<style.*?</style>|<!--.*?-->|<[^>]*>", re.S | re.I)
+WORDS = re.compile(r"\w+", re.U)
+
+
+def hamming_distance(first, second):
+    """
+    Counts the bits that differ between two fingerprints.
+
+    :param first: A fingerprint.
+    :type first: int
+    :param second: Another fingerprint.
+    :type second: int
+    :returns: The number of differing bits.
+    :rtype: int
+    """
+    return bin(first ^ second).count("1")
+
+
+def html_text(html):
+    """
+    Strips the tags, scripts, styles and comments out of a page, without parsing it.
+
+    :param html: The page's html.
+    :type html: str
+    :returns: The page's text.
+    :rtype: str
+    """
+    return TAGS.sub(" ", html)
+
+
+def shingles(text, size=3):
+    """
+    Gets the set of word shingles in some text, ie "one two three four" has "one two three" and "two three four".
+
+    :param text: The text.
+    :type text: str
+    :param size: Words per shingle.
+    :type size: int
+    :returns: The unique shingles.
+    :rtype: set
+    """
+    words = WORDS.findall(text.lower())
+    if len(words) <= size:
+        return set([" ".join(words)]) if words else set()
+    return set(" ".join(words[index:index + size]) for index in range(len(words) - size + 1))
+
+
+def fingerprint(text, shingle_size=3):
+    """
+    Creates the SimHash fingerprint of some text.
+
+    :param text: The text.
+    :type text: str
+    :param shingle_size: Words per shingle.
+    :type shingle_size: int
+    :returns: The 64 bit fingerprint, 0 for text without any words.
+    :rtype: int
+    """
+    features = shingles(text, shingle_size)
+
+    # Count how many shingle hashes have each bit set, 64 counters at once. Each plane holds one binary digit of all 64
+    # counters, and adding a hash ripples a carry up the planes.
+    planes = []
+    for feature in features:
+        carry = int.from_bytes(blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for index, plane in enumerate(planes):
+            planes[index] = plane ^ carry
+            carry &= plane
+            if not carry:
+                break
+        if carry:
+            planes.append(carry)
+
+    half = len(features) // 2
+    fingerprint = 0
+    for bit in range(BITS):
+        count = 0
+        for index, plane in enumerate(planes):
+            count |= ((plane >> bit) & 1) << index
+        if count > half:
+            fingerprint |= 1 << bit
+
+    return fingerprint
+
+
+def fingerprint_html(html, shingle_size=3):
+    """
+    Creates the SimHash fingerprint of a page's text.
+
+    :param html: The page's html.
+    :type html: str
+    :param shingle_size: Words per shingle.
+    :type shingle_size: int
+    :returns: The 64 bit fingerprint.
+    :rtype: int
+    """
+    return fingerprint(html_text(html), shingle_size)
+
+
+class SimHashIndex(object):
+
+    def __init__(self, max_distance=3):
+        """
+        Creates a new, empty, fingerprint index.
+
+        :param max_distance: The most bits two fingerprints can differ by and still be near duplicates.
+        :type max_distance: int
+        """
+        self.max_distance = max_distance
+        self.bands = self._make_bands(max_distance + 1)
+        self.tables = [{} for _ in self.bands]
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return "<SimHashIndex %s k=%s>" % (self.count, self.max_distance)
+
+    def __len__(self):
+        return self.count
+
+    def add(self, fingerprint, key=None):
+        """
+        Adds a fingerprint to the index.
+
+        :param fingerprint: The fingerprint.
+        :type fingerprint: int
+        :param key: What the fingerprint belongs to, ie the page url.
+        :type key: str
+        """
+        with self.lock:
+            for (shift, mask), table in zip(self.bands, self.tables):
+                table.setdefault((fingerprint >> shift) & mask, []).append((fingerprint, key))
+            self.count += 1
+
+    def find(self, fingerprint):
+        """
+        Finds the closest fingerprint in the index within max_distance bits.
+
+        :param fingerprint: The fingerprint to look for.
+        :type fingerprint: int
+        :returns: The matching fingerprint's key and distance, or None if there isn't a near duplicate.
+        :rtype: tuple
+        """
+        best = None
+        with self.lock:
+            for (shift, mask), table in zip(self.bands, self.tables):
+                for candidate, key in table.get((fingerprint >> shift) & mask, ()):
+                    distance = hamming_distance(fingerprint, candidate)
+                    if distance <= self.max_distance and (best is None or distance < best[1]):
+                        best = (key, distance)
+                        if not distance:
+                            return best
+
+        return best
+
+    def _make_bands(self, count):
+        """
+        Splits the fingerprint bits into bands.
+
+        :param count: Number of bands.
+        :type count: int
+        :returns: The shift and mask of each band.
+        :rtype: list
+        """
+        width = BITS // count
+        bands = []
+        for index in range(count):
+            shift = index * width
+            bits = BITS - shift if index == count - 1 else width
+            bands.append((shift, (1 << bits) - 1))
+        return bands
+
+# EndFile: carpetbag/carpetbag/simhash.py
@@ -0,0 +1,325 @@
+"""Sitemap
+Streams the urls out of a site's sitemaps. Each sitemap is read as it downloads, gunzipped on the fly when it's a
+.xml.gz, and parsed incrementally, dropping every <url> once it's been read, so a sitemap of hundreds of MB is read
+in constant memory. Sitemap indexes are followed, with several sitemaps read at once.
+
+    for entry in bagger.iter_sitemap("https://www.bad-actor.services/", since="2024-01-01"):
+        print(entry["loc"], entry["lastmod"])
+
+With since, sitemaps in an index and urls last modified before it are skipped, for incremental recrawls.
+
+"""
+import logging
+import queue
+import threading
+from urllib.parse import urlsplit
+from xml.etree import ElementTree
+import zlib
+
+from . import carpet_tools as ct
+from .robots import RobotsRules, robots_url
+
+GZIP_MAGIC = b"\x1f\x8b"
+DONE = object()
+
+
+def iter_entries(chunks):
+    """
+    Parses a sitemap or sitemap index as its chunks come in.
+
+    :param chunks: The sitemap's body, in chunks of bytes, gzipped or not.
+    :type chunks: iterable
+    :returns: Each entry, as its kind, "url" or "sitemap", its loc and its lastmod or None.
+    :rtype: generator
+    """
+    parser = ElementTree.XMLPullParser(events=("start", "end"))
+    root = None
+    for chunk in gunzip(chunks):
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if root is None:
+                root = element
+                continue
+
+            if event != "end" or local_name(element.tag) not in ["url", "sitemap"]:
+                continue
+
+            loc = None
+            lastmod = None
+            for child in element:
+                name = local_name(child.tag)
+                if name == "loc":
+                    loc = (child.text or "").strip()
+                elif name == "lastmod":
+                    lastmod = (child.text or "").strip() or None
+
+            # Drop what's been read, so memory doesn't grow with the sitemap.
+            kind = local_name(element.tag)
+            root.clear()
+            if loc:
+                yield kind, loc, lastmod
+
+    parser.close()
+
+
+def gunzip(chunks):
+    """
+    Decompresses chunks of a body on the fly when it starts with the gzip magic bytes, otherwise passes them through.
+
+    :param chunks: The body, in chunks of bytes.
+    :type chunks: iterable
+    :returns: The decompressed chunks.
+    :rtype: generator
+    """
+    decompressor = None
+    first = True
+    for chunk in chunks:
+        if not chunk:
+            continue
+
+        if first:
+            first = False
+            if chunk[:2] == GZIP_MAGIC:
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        if decompressor:
+            chunk = decompressor.decompress(chunk)
+        yield chunk
+
+    if decompressor:
+        yield decompressor.flush()
+
+
+def local_name(tag):
+    """
+    Strips the namespace from an element's tag.
+
+    :param tag: The tag, ie "{http://www.sitemaps.org/schemas/sitemap/0.9}url".
+    :type tag: str
+    :returns: The tag without its namespace, ie "url".
+    :rtype: str
+    """
+    return tag.rsplit("}", 1)[-1]
+
+
+def modified_since(lastmod, since):
+    """
+    Checks if an entry was modified since a time. Entries without a lastmod, or with one that can't be read, are
+    assumed to have been.
+
+    :param lastmod: The entry's lastmod, a W3C datetime.
+    :type lastmod: str
+    :param since: The time to check against.
+    :type since: <arrow.Arrow> obj
+    :returns: Whether or not the entry was modified since.
+    :rtype: bool
+    """
+    if since is None or not lastmod:
+        return True
+
+    import arrow
+
+    try:
+        return arrow.get(lastmod) >= since
+    except (arrow.parser.ParserError, ValueError):
+        return True
+
+
+class SitemapReader(object):
+
+    def __init__(self, bagger, workers=4, since=None, max_depth=3, chunk_size=65536, queue_size=10000):
+        """
+        Creates a sitemap reader.
+
+        :param bagger: The CarpetBag to fetch with, each worker thread gets its own clone of it.
+        :type bagger: <CarpetBag> obj
+        :param workers: Number of sitemaps to read at once.
+        :type workers: int
+        :param since: Skip sitemaps and urls last modified before this, a datetime or W3C datetime string.
+        :type since: str
+        :param max_depth: The most sitemap indexes to follow down from the first sitemap.
+        :type max_depth: int
+        :param chunk_size: The number of bytes to read at a time.
+        :type chunk_size: int
+        :param queue_size: The most urls read ahead of the consumer.
+        :type queue_size: int
+        """
+        self.bagger = bagger
+        self.workers = workers
+        self.since = None
+        if since:
+            import arrow
+
+            self.since = arrow.get(since)
+        self.max_depth = max_depth
+        self.chunk_size = chunk_size
+        self.queue_size = queue_size
+        self.logger = logging.getLogger(__name__)
+
+    def __repr__(self):
+        return "<SitemapReader %s workers>" % self.workers
+
+    def discover(self, url):
+        """
+        Finds a site's sitemaps from the Sitemap lines in its robots.txt, falling back to /sitemap.xml.
+
+        :param url: Any url on the site.
+        :type url: str
+        :returns: The sitemap urls.
+        :rtype: list
+        """
+        url = ct.url_add_missing_protocol(url)
+        if self.bagger.robots_cache is not None:
+            rules = self.bagger.robots_cache.rules(url)
+        else:
+            try:
+                status_code, content = self.bagger._fetch_robots(robots_url(url))
+                rules = RobotsRules(content if status_code < 400 else "")
+            except Exception as e:
+                self.logger.warning("Could not fetch robots.txt for %s: %s" % (url, e))
+                rules = RobotsRules()
+
+        if rules.sitemaps:
+            return list(rules.sitemaps)
+        return [robots_url(url).replace("/robots.txt", "/sitemap.xml")]
+
+    def iter_urls(self, url):
+        """
+        Reads every url out of a sitemap, following sitemap indexes. Urls come out in the order they're read, which
+        isn't the sitemaps' order when several are read at once. A url given without a path has its sitemaps
+        discovered first.
+
+        :param url: The sitemap, or sitemap index, url.
+        :type url: str
+        :returns: Each url, as a dict with its loc, lastmod and the sitemap it came from.
+        :rtype: generator
+        """
+        url = ct.url_add_missing_protocol(url)
+        if urlsplit(url).path in ["", "/"]:
+            sitemaps = self.discover(url)
+        else:
+            sitemaps = [url]
+
+        jobs = queue.Queue()
+        results = queue.Queue(self.queue_size)
+        state = {"pending": len(sitemaps), "seen": set(sitemaps), "lock": threading.Lock()}
+        stopped = threading.Event()
+        for sitemap in sitemaps:
+            jobs.put((sitemap, 0))
+
+        threads = []
+        for number in range(self.workers):
+            thread = threading.Thread(
+                target=self._work,
+                args=(self.bagger.clone(), jobs, results, state, stopped),
+                name="carpetbag-sitemap-%s" % number)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        try:
+            while True:
+                entry = results.get()
+                if entry is DONE:
+                    break
+                yield entry
+        finally:
+            stopped.set()
+            for _ in threads:
+                jobs.put(None)
+
+    def _work(self, bagger, jobs, results, state, stopped):
+        """
+        Worker thread, reads sitemaps until there are none left.
+
+        :param bagger: The worker's own CarpetBag.
+        :type bagger: <CarpetBag> obj
+        :param jobs: The sitemaps to read, with their depth. None stops the worker.
+        :type jobs: <queue.Queue> obj
+        :param results: Where to put the urls read, DONE is put when the last sitemap is finished.
+        :type results: <queue.Queue> obj
+        :param state: The count of sitemaps not yet finished, the sitemaps seen and the lock for them.
+        :type state: dict
+        :param stopped: Set when the consumer stops reading.
+        :type stopped: <threading.Event> obj
+        """
+        while not stopped.is_set():
+            job = jobs.get()
+            if job is None:
+                return
+
+            try:
+                self._read(bagger, job[0], job[1], jobs, results, state, stopped)
+            except Exception as e:
+                self.logger.warning("Could not read sitemap %s: %s" % (job[0], e))
+
+            with state["lock"]:
+                state["pending"] -= 1
+                finished = not state["pending"]
+            if finished:
+                self._put(results, DONE, stopped)
+                for _ in range(self.workers):
+                    jobs.put(None)
+
+    def _read(self, bagger, url, depth, jobs, results, state, stopped):
+        """
+        Reads one sitemap, putting its urls into results and queueing the sitemaps it indexes.
+
+        :param bagger: The worker's own CarpetBag.
+        :type bagger: <CarpetBag> obj
+        :param url: The sitemap url.
+        :type url: str
+        :param depth: The number of sitemap indexes followed to reach it.
+        :type depth: int
+        :param jobs: The sitemaps to read.
+        :type jobs: <queue.Queue> obj
+        :param results: Where to put the urls read.
+        :type results: <queue.Queue> obj
+        :param state: The count of sitemaps not yet finished, the sitemaps seen and the lock for them.
+        :type state: dict
+        :param stopped: Set when the consumer stops reading.
+        :type stopped: <threading.Event> obj
+        """
+        response = bagger.get(url)
+        try:
+            if response.status_code >= 400:
+                self.logger.warning("Sitemap %s returned %s" % (url, response.status_code))
+                return
+
+            for kind, loc, lastmod in iter_entries(response.iter_content(self.chunk_size)):
+                if stopped.is_set():
+                    return
+                if not modified_since(lastmod, self.since):
+                    continue
+
+                if kind == "url":
+                    self._put(results, {"loc": loc, "lastmod": lastmod, "sitemap": url}, stopped)
+                elif depth < self.max_depth:
+                    with state["lock"]:
+                        if loc in state["seen"]:
+                            continue
+                        state["seen"].add(loc)
+                        state["pending"] += 1
+                    jobs.put((loc, depth + 1))
+        finally:
+            response.close()
+
+    def _put(self, results, item, stopped):
+        """
+        Puts an item into the results, waiting while the consumer catches up, unless it stops reading.
+
+        :param results: The results queue.
+        :type results: <queue.Queue> obj
+        :param item: The item.
+        :type item: dict
+        :param stopped: Set when the consumer stops reading.
+        :type stopped: <threading.Event> obj
+        """
+        while not stopped.is_set():
+            try:
+                results.put(item, timeout=0.25)
+                return
+            except queue.Full:
+                continue
+
+# EndFile: carpetbag/carpetbag/sitemap.py
@@ -0,0 +1,415 @@
+"""SQLite Frontier
+A crawl frontier kept in a local SQLite database, so a crawl survives a crash or deploy and picks up where it left
+off, and several worker processes on one box can pull from the same crawl. It's a drop in for the in memory Frontier.
+
+    frontier = SqliteFrontier("/var/lib/carpetbag/crawl.db", delay=2)
+    crawler = Crawler(bagger, ["https://www.bad-actor.services/"], frontier=frontier)
+
+Every url ever queued is kept, by its canonical form, so the database is also the crawl's seen set. Each host keeps
+its politeness delay and when it's next allowed to be fetched. Urls handed out by pop() are leased to the process
+fetching them, if it dies before calling done() the url is handed out again once the lease runs out. Leases held by a
+process on this machine which has died are reclaimed straight away when the frontier is opened, so a crawl restarted
+after a crash doesn't wait out the lease for the urls it was fetching.
+
+The database runs in WAL mode, so readers don't block the writer, and add() buffers urls to write them in batches.
+
+"""
+from contextlib import contextmanager
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from . import carpet_tools as ct
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    canonical TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    host TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    state INTEGER NOT NULL DEFAULT 0,
+    leased_until REAL NOT NULL DEFAULT 0,
+    owner TEXT
+);
+CREATE INDEX IF NOT EXISTS urls_host_state ON urls (host, state, id);
+CREATE INDEX IF NOT EXISTS urls_state ON urls (state, leased_until);
+CREATE TABLE IF NOT EXISTS hosts (
+    host TEXT PRIMARY KEY,
+    delay REAL,
+    next_at REAL NOT NULL DEFAULT 0,
+    busy_until REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS hosts_next_at ON hosts (next_at);
+"""
+
+QUEUED = 0
+IN_FLIGHT = 1
+DONE = 2
+
+
+class SqliteFrontier(object):
+
+    def __init__(self, path, delay=0, batch_size=500, lease=300, poll_interval=0.1):
+        """
+        Opens, or creates, a frontier database.
+
+        :param path: The SQLite database file.
+        :type path: str
+        :param delay: Seconds to wait between requests to the same host.
+        :type delay: int
+        :param batch_size: Number of added urls to buffer before writing them.
+        :type batch_size: int
+        :param lease: Seconds a popped url can go without done() before it's handed out again.
+        :type lease: int
+        :param poll_interval: Most seconds to sleep between checks for a ready host while waiting in pop().
+        :type poll_interval: float
+        """
+        self.path = path
+        self.delay = delay
+        self.batch_size = batch_size
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.buffer = []
+        self.buffered = set()
+        self.owner = "%s:%s" % (socket.gethostname(), os.getpid())
+        self.lock = threading.RLock()
+        self.logger = logging.getLogger(__name__)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self._migrate()
+        self.reclaim()
+
+    def __repr__(self):
+        return "<SqliteFrontier %s %s urls>" % (self.path, len(self))
+
+    def __len__(self):
+        with self.lock:
+            self.flush()
+            return self.connection.execute("SELECT COUNT(*) FROM urls WHERE state = ?", (QUEUED,)).fetchone()[0]
+
+    def add(self, url, depth=0):
+        """
+        Queues a url, unless it's canonical form has been queued before. Urls are buffered and written batch_size at a
+        time, so a url another process queues while this one's buffered is only dropped when the batch is written.
+
+        :param url: The url to queue.
+        :type url: str
+        :param depth: The number of links followed from a seed to reach the url.
+        :type depth: int
+        :returns: Whether or not the url was queued.
+        :rtype: bool
+        """
+        canonical = ct.url_canonical(url)
+        with self.lock:
+            if canonical in self.buffered:
+                return False
+            if self.connection.execute("SELECT 1 FROM urls WHERE canonical = ?", (canonical,)).fetchone():
+                return False
+
+            self.buffer.append((canonical, url, ct.url_host(url), depth))
+            self.buffered.add(canonical)
+            if len(self.buffer) >= self.batch_size:
+                return bool(self.flush())
+
+        return True
+
+    def flush(self):
+        """
+        Writes the buffered urls to the database, in one transaction.
+
+        :returns: The number of urls queued, leaving out any another process queued first.
+        :rtype: int
+        """
+        with self.lock:
+            if not self.buffer:
+                return 0
+
+            with self._transaction() as cursor:
+                queued = self._write_buffer(cursor)
+            self._clear_buffer()
+
+        return queued
+
+    def pop(self, timeout=None):
+        """
+        Gets the next url to fetch, from the host which has been ready the longest. The host is taken out of the
+        rotation until done() is called for it, or the url's lease runs out.
+
+        :param timeout: Seconds to wait for a url, or None to wait until one is ready.
+        :type timeout: float
+        :returns: The url and its depth, or None if nothing was ready in time or the frontier is idle.
+        :rtype: tuple
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            with self.lock:
+                self.flush()
+                now = time.time()
+                with self._transaction() as cursor:
+                    self._expire_leases(cursor, now)
+                    row = cursor.execute(
+                        """SELECT host FROM (
+                            SELECT hosts.host, next_at,
+                                (SELECT MIN(id) FROM urls WHERE urls.host = hosts.host AND state = ?) AS oldest
+                            FROM hosts WHERE next_at <= ? AND busy_until <= ?)
+                        WHERE oldest IS NOT NULL ORDER BY next_at, oldest LIMIT 1""", (QUEUED, now, now)).fetchone()
+                    if row:
+                        return self._lease(cursor, row[0], now)
+
+                    if self._idle(cursor):
+                        return None
+
+                    wait = cursor.execute(
+                        """SELECT MIN(MAX(next_at, busy_until)) FROM hosts
+                        WHERE EXISTS (SELECT 1 FROM urls WHERE urls.host = hosts.host AND state = ?)""",
+                        (QUEUED,)).fetchone()[0]
+
+            wait = self.poll_interval if wait is None else min(max(wait - now, 0), self.poll_interval)
+            if deadline is not None:
+                if deadline <= now:
+                    return None
+                wait = min(wait, deadline - now)
+            time.sleep(wait)
+
+    def done(self, url):
+        """
+        Marks the fetch of a url as finished, putting its host back into the rotation after its politeness delay. The
+        buffered urls, ie the links found on the page, are written in the same transaction, so a crash can't lose them
+        once the url is marked done.
+
+        :param url: The url fetched.
+        :type url: str
+        """
+        host = ct.url_host(url)
+        with self.lock:
+            with self._transaction() as cursor:
+                self._write_buffer(cursor)
+                cursor.execute(
+                    "UPDATE urls SET state = ?, leased_until = 0, owner = NULL WHERE canonical = ?",
+                    (DONE, ct.url_canonical(url)))
+                cursor.execute(
+                    "UPDATE hosts SET busy_until = 0, next_at = ? + COALESCE(delay, ?) WHERE host = ?",
+                    (time.time(), self.delay, host))
+            self._clear_buffer()
+
+    def release(self, url, depth=0):
+        """
+        Puts a url handed out by pop() back in the queue without fetching it, ie when the crawl hit max_pages, so a
+        resumed crawl still fetches it. The host goes straight back into the rotation.
+
+        :param url: The url which wasn't fetched.
+        :type url: str
+        :param depth: The url's depth, kept from when it was queued.
+        :type depth: int
+        """
+        with self.lock:
+            with self._transaction() as cursor:
+                self._write_buffer(cursor)
+                cursor.execute(
+                    "UPDATE urls SET state = ?, leased_until = 0, owner = NULL WHERE canonical = ? AND state = ?",
+                    (QUEUED, ct.url_canonical(url), IN_FLIGHT))
+                cursor.execute("UPDATE hosts SET busy_until = 0 WHERE host = ?", (ct.url_host(url),))
+            self._clear_buffer()
+
+    def set_delay(self, host, delay):
+        """
+        Sets the politeness delay for a single host, ie from its robots.txt Crawl-delay.
+
+        :param host: The host.
+        :type host: str
+        :param delay: Seconds to wait between requests to the host.
+        :type delay: float
+        """
+        with self.lock:
+            with self._transaction() as cursor:
+                cursor.execute(
+                    "INSERT INTO hosts (host, delay) VALUES (?, ?) ON CONFLICT (host) DO UPDATE SET delay = ?",
+                    (host.lower(), delay, delay))
+
+    def reclaim(self):
+        """
+        Requeues the urls leased by processes on this machine which have died, putting their hosts back into the
+        rotation, rather than waiting for the leases to run out. Leases held by other machines are left to run out.
+
+        :returns: The number of urls requeued.
+        :rtype: int
+        """
+        hostname = "%s:" % socket.gethostname()
+        requeued = 0
+        with self.lock:
+            with self._transaction() as cursor:
+                owners = cursor.execute(
+                    "SELECT DISTINCT owner FROM urls WHERE state = ? AND owner IS NOT NULL", (IN_FLIGHT,)).fetchall()
+                for owner, in owners:
+                    if not owner.startswith(hostname) or process_alive(int(owner[len(hostname):])):
+                        continue
+
+                    hosts = cursor.execute(
+                        "SELECT DISTINCT host FROM urls WHERE state = ? AND owner = ?", (IN_FLIGHT, owner)).fetchall()
+                    cursor.execute(
+                        "UPDATE urls SET state = ?, leased_until = 0, owner = NULL WHERE state = ? AND owner = ?",
+                        (QUEUED, IN_FLIGHT, owner))
+                    requeued += cursor.rowcount
+                    cursor.executemany("UPDATE hosts SET busy_until = 0 WHERE host = ?", hosts)
+
+        if requeued:
+            self.logger.warning("Reclaimed %s urls leased by dead processes" % requeued)
+
+        return requeued
+
+    def idle(self):
+        """
+        Checks if the frontier is finished, with no urls queued and none being fetched by any process.
+
+        :returns: Whether or not the frontier is idle.
+        :rtype: bool
+        """
+        with self.lock:
+            self.flush()
+            return self._idle(self.connection.cursor())
+
+    def close(self):
+        """
+        Writes any buffered urls and closes the database.
+
+        """
+        with self.lock:
+            self.flush()
+            self.connection.close()
+
+    def _idle(self, cursor):
+        """
+        Checks for queued or in flight urls.
+
+        :param cursor: The cursor to query with.
+        :type cursor: <sqlite3.Cursor> obj
+        :returns: Whether or not the frontier is idle.
+        :rtype: bool
+        """
+        return not cursor.execute("SELECT 1 FROM urls WHERE state IN (?, ?) LIMIT 1", (QUEUED, IN_FLIGHT)).fetchone()
+
+    def _lease(self, cursor, host, now):
+        """
+        Hands out a host's oldest queued url.
+
+        :param cursor: The cursor in the pop() transaction.
+        :type cursor: <sqlite3.Cursor> obj
+        :param host: The ready host.
+        :type host: str
+        :param now: The current time.
+        :type now: float
+        :returns: The url and its depth.
+        :rtype: tuple
+        """
+        url_id, url, depth = cursor.execute(
+            "SELECT id, url, depth FROM urls WHERE host = ? AND state = ? ORDER BY id LIMIT 1",
+            (host, QUEUED)).fetchone()
+        cursor.execute(
+            "UPDATE urls SET state = ?, leased_until = ?, owner = ? WHERE id = ?",
+            (IN_FLIGHT, now + self.lease, self.owner, url_id))
+        cursor.execute("UPDATE hosts SET busy_until = ? WHERE host = ?", (now + self.lease, host))
+        return url, depth
+
+    def _expire_leases(self, cursor, now):
+        """
+        Requeues urls whose lease has run out, the process fetching them likely died.
+
+        :param cursor: The cursor in the pop() transaction.
+        :type cursor: <sqlite3.Cursor> obj
+        :param now: The current time.
+        :type now: float
+        """
+        cursor.execute(
+            "UPDATE urls SET state = ?, leased_until = 0, owner = NULL WHERE state = ? AND leased_until < ?",
+            (QUEUED, IN_FLIGHT, now))
+        if cursor.rowcount:
+            self.logger.warning("Requeued %s urls with expired leases" % cursor.rowcount)
+
+    def _write_buffer(self, cursor):
+        """
+        Writes the buffered urls inside a transaction, the caller should be holding the lock and clear the buffer once
+        the transaction commits.
+
+        :param cursor: The cursor in the transaction.
+        :type cursor: <sqlite3.Cursor> obj
+        :returns: The number of urls queued, leaving out any another process queued first.
+        :rtype: int
+        """
+        if not self.buffer:
+            return 0
+
+        cursor.executemany(
+            "INSERT OR IGNORE INTO urls (canonical, url, host, depth) VALUES (?, ?, ?, ?)", self.buffer)
+        queued = cursor.rowcount
+        cursor.executemany("INSERT OR IGNORE INTO hosts (host) VALUES (?)", set((item[2],) for item in self.buffer))
+
+        return queued
+
+    def _clear_buffer(self):
+        """
+        Empties the buffer once its urls are written, the caller should be holding the lock.
+
+        """
+        self.buffer = []
+        self.buffered = set()
+
+    def _migrate(self):
+        """
+        Adds the lease owner column to a database created before leases had owners.
+
+        """
+        with self._transaction() as cursor:
+            columns = [row[1] for row in cursor.execute("PRAGMA table_info(urls)").fetchall()]
+            if "owner" not in columns:
+                cursor.execute("ALTER TABLE urls ADD COLUMN owner TEXT")
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Runs a write transaction, taking the database's write lock up front so processes don't deadlock upgrading
+        from a read. Commits on success and rolls back on an error.
+
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            yield cursor
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("COMMIT")
+
+
+def process_alive(pid):
+    """
+    Checks if a process on this machine is still running.
+
+    :param pid: The process id.
+    :type pid: int
+    :returns: Whether or not the process is running, or True if it can't be told.
+    :rtype: bool
+    """
+    if os.name != "posix":
+        return True
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+    return True
+
+# EndFile: carpetbag/carpetbag/sqlite_frontier.py
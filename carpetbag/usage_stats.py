@@ -0,0 +1,238 @@
+"""Usage Stats
+Queues proxy usage reports for bad-actor.services in memory and sends them in batches from a background thread, so
+reporting does not add a round trip to every request. Reports which cannot be delivered, because bad-actor.services
+can't be reached, are spooled to the local disk and sent on the next successful flush. Reports bad-actor.services
+rejects are dropped, retrying them would only block the reports behind them. The spool is capped, and is locked while
+it's read or written, so every CarpetBag process on a host can share it.
+
+"""
+import atexit
+from contextlib import contextmanager
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+
+import requests
+
+from . import errors
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Non POSIX systems get no file locking.
+    fcntl = None
+
+
+class UsageStatsReporter(object):
+
+    def __init__(self, send, batch_size=50, flush_interval=5, spool_path=None, max_spooled=10000):
+        """
+        Creates a new usage stats reporter.
+
+        :param send: Callable which delivers a single report, returning True when it was accepted. It may raise
+            carpetbag.errors.NoRemoteServicesConnection or a Requests exception when bad-actor.services can not be
+            reached.
+        :type send: callable
+        :param batch_size: Number of queued reports that triggers a flush.
+        :type batch_size: int
+        :param flush_interval: Max seconds a report waits in the queue before being flushed.
+        :type flush_interval: int
+        :param spool_path: Where to spool reports that could not be delivered, defaults to a file in the system temp
+            dir.
+        :type spool_path: str
+        :param max_spooled: Max number of reports kept in the spool, the oldest are dropped past it.
+        :type max_spooled: int
+        """
+        if not spool_path:
+            spool_path = os.path.join(tempfile.gettempdir(), "carpetbag-usage-stats.spool")
+        self.send = send
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self.max_spooled = max_spooled
+
+        self.queue = queue.Queue()
+        self.flush_lock = threading.Lock()
+        self.flush_event = threading.Event()
+        self.thread = None
+        self.atexit_registered = False
+        self.closed = False
+        self.sent_total = 0
+        self.spooled_total = 0
+        self.rejected_total = 0
+        self.logger = logging.getLogger(__name__)
+
+    def __repr__(self):
+        return "<UsageStatsReporter queued:%s>" % self.queue.qsize()
+
+    def report(self, payload):
+        """
+        Queues a usage report to be sent in the next batch.
+
+        :param payload: The proxy report to send to bad-actor.services.
+        :type payload: dict
+        :returns: Success if the report was queued.
+        :rtype: bool
+        """
+        if self.closed:
+            self.logger.warning("USAGE STATS: Reporter is closed, dropping report.")
+            return False
+
+        self.queue.put(payload)
+        self._start()
+        if self.queue.qsize() >= self.batch_size:
+            self.flush_event.set()
+
+        return True
+
+    def flush(self):
+        """
+        Sends all queued and spooled reports. A report which isn't accepted is dropped. Delivery stops at the first
+        report which can't reach bad-actor.services, and everything not yet delivered is spooled to disk.
+
+        :returns: The number of reports delivered.
+        :rtype: int
+        """
+        with self.flush_lock:
+            batch = self._read_spool()
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            sent = 0
+            for index, payload in enumerate(batch):
+                try:
+                    accepted = self.send(payload)
+                except (errors.NoRemoteServicesConnection, requests.RequestException):
+                    self.logger.warning("USAGE STATS: Can not reach bad-actor.services, spooling reports.")
+                    self._write_spool(batch[index:])
+                    break
+
+                if not accepted:
+                    self.logger.warning("USAGE STATS: Report was not accepted, dropping it.")
+                    self.rejected_total += 1
+                    continue
+                sent += 1
+
+            self.sent_total += sent
+
+        return sent
+
+    def close(self):
+        """
+        Stops the background thread and makes a final flush of all queued reports.
+
+        :returns: The number of reports delivered in the final flush.
+        :rtype: int
+        """
+        if self.closed:
+            return 0
+
+        self.closed = True
+        self.flush_event.set()
+        if self.atexit_registered:
+            atexit.unregister(self.close)
+            self.atexit_registered = False
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(self.flush_interval)
+
+        return self.flush()
+
+    def _start(self):
+        """
+        Starts the background flushing thread if it's not already running.
+
+        """
+        if self.thread and self.thread.is_alive():
+            return
+
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+        if not self.atexit_registered:
+            atexit.register(self.close)
+            self.atexit_registered = True
+
+    def _run(self):
+        """
+        Background thread loop, flushes whenever the batch size is hit or the flush interval passes.
+
+        """
+        while not self.closed:
+            self.flush_event.wait(self.flush_interval)
+            self.flush_event.clear()
+            if self.closed:
+                break
+            if not self.queue.empty():
+                self.flush()
+
+    def _read_spool(self):
+        """
+        Reads and removes the spooled reports that were not delivered on a previous flush.
+
+        :returns: The spooled reports.
+        :rtype: list
+        """
+        if not os.path.exists(self.spool_path):
+            return []
+
+        spooled = []
+        with self._lock():
+            try:
+                with open(self.spool_path, "r") as phile:
+                    for line in phile:
+                        if line.strip():
+                            spooled.append(json.loads(line))
+                os.remove(self.spool_path)
+            except (IOError, OSError, ValueError):
+                self.logger.error("USAGE STATS: Could not read spool %s" % self.spool_path)
+
+        return spooled
+
+    def _write_spool(self, reports):
+        """
+        Appends reports that could not be delivered to the spool file. If the spool would grow past
+        self.max_spooled reports, the oldest are dropped.
+
+        :param reports: The reports to spool.
+        :type reports: list
+        """
+        with self._lock():
+            lines = []
+            if os.path.exists(self.spool_path):
+                with open(self.spool_path, "r") as phile:
+                    lines = [line for line in phile if line.strip()]
+            lines.extend(json.dumps(payload) + "\n" for payload in reports)
+
+            if len(lines) > self.max_spooled:
+                self.logger.warning(
+                    "USAGE STATS: Spool is full, dropping %s oldest reports." % (len(lines) - self.max_spooled))
+                lines = lines[-self.max_spooled:]
+
+            with open(self.spool_path, "w") as phile:
+                phile.writelines(lines)
+        self.spooled_total += len(reports)
+
+    @contextmanager
+    def _lock(self):
+        """
+        Locks the spool file's sidecar lock file, so reading and removing the spool can't interleave with another
+        process' reads or writes.
+
+        """
+        if not fcntl:
+            yield
+            return
+
+        with open(self.spool_path + ".lock", "a") as phile:
+            fcntl.flock(phile, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(phile, fcntl.LOCK_UN)
+
+# EndFile: carpetbag/carpetbag/usage_stats.py
@@ -0,0 +1,232 @@
+"""User Agents
+A pool of browser identities, each a User Agent string with the Accept and Accept-Language headers that browser would
+send alongside it, so every identity looks like one consistent browser. The pool is built once, from the user_agent
+module or a JSON file, and each pick from it is O(1) with Walker's alias method, weighted by how common the User Agent
+is.
+
+    pool = UserAgentPool.generate()
+    pool.save("user_agents.json")
+    bagger.use_random_user_agent(pool=UserAgentPool.load("user_agents.json"))
+
+A JSON file is a list of identities, {"user_agent": "...", "weight": 3, "headers": {...}}, or just User Agent strings,
+with missing weights as 1 and missing headers filled in to match the browser.
+
+"""
+import json
+import os
+import random
+import tempfile
+import threading
+
+ACCEPT = {
+    "firefox": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "chrome": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8",
+    "ie": "text/html, application/xhtml+xml, */*",
+}
+ACCEPT_LANGUAGES = [
+    ("en-US,en;q=0.9", 60),
+    ("en-US,en;q=0.5", 15),
+    ("en-GB,en;q=0.9", 15),
+    ("en-CA,en;q=0.9,fr-CA;q=0.8", 5),
+    ("en-AU,en;q=0.9", 5),
+]
+
+default_pool = None
+default_pool_lock = threading.Lock()
+
+
+class UserAgentPool(object):
+
+    def __init__(self, identities, seed=None):
+        """
+        Creates a pool of browser identities.
+
+        :param identities: The identities, each a dict of user_agent, headers and weight.
+        :type identities: list
+        :param seed: Seed for picking identities, for repeatable picks.
+        :type seed: int
+        :raises: ValueError for an empty pool.
+        """
+        if not identities:
+            raise ValueError("A UserAgentPool needs at least one identity")
+
+        self.random = random.Random(seed)
+        self.identities = [make_identity(identity, self.random) for identity in identities]
+        self.probabilities, self.aliases = alias_table([identity["weight"] for identity in self.identities])
+
+    def __repr__(self):
+        return "<UserAgentPool %s identities>" % len(self.identities)
+
+    def __len__(self):
+        return len(self.identities)
+
+    @classmethod
+    def generate(cls, size=256, seed=None):
+        """
+        Builds a pool from the user_agent module's navigators. Repeated User Agents are kept once with a higher
+        weight, so picks follow the module's own browser mix.
+
+        :param size: Number of navigators to generate.
+        :type size: int
+        :param seed: Seed for picking identities, for repeatable picks.
+        :type seed: int
+        :returns: The pool.
+        :rtype: <UserAgentPool> obj
+        """
+        import user_agent
+
+        identities = {}
+        for _ in range(size):
+            navigator = user_agent.generate_navigator()
+            identity = identities.setdefault(navigator["user_agent"], {
+                "user_agent": navigator["user_agent"],
+                "browser": navigator.get("navigator_id"),
+                "weight": 0,
+            })
+            identity["weight"] += 1
+
+        return cls(list(identities.values()), seed)
+
+    @classmethod
+    def load(cls, path, seed=None):
+        """
+        Loads a pool from a JSON file.
+
+        :param path: The file to load.
+        :type path: str
+        :param seed: Seed for picking identities, for repeatable picks.
+        :type seed: int
+        :returns: The pool.
+        :rtype: <UserAgentPool> obj
+        """
+        with open(path, "r") as pool_file:
+            return cls(json.load(pool_file), seed)
+
+    def save(self, path):
+        """
+        Saves the pool to a JSON file, written to a temp file and moved into place.
+
+        :param path: The file to save to.
+        :type path: str
+        :returns: Success if saved.
+        :rtype: bool
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        handle, temp_path = tempfile.mkstemp(dir=directory, prefix=".user_agents-")
+        with os.fdopen(handle, "w") as pool_file:
+            json.dump(self.identities, pool_file, indent=2)
+        os.replace(temp_path, path)
+
+        return True
+
+    def pick(self, exclude=None):
+        """
+        Picks an identity, weighted by how common its User Agent is.
+
+        :param exclude: A User Agent not to pick, ie the current one, unless it's the only one in the pool.
+        :type exclude: str
+        :returns: The identity, a dict of user_agent, headers and weight.
+        :rtype: dict
+        """
+        for _ in range(8):
+            index = self.random.randrange(len(self.identities))
+            if self.random.random() >= self.probabilities[index]:
+                index = self.aliases[index]
+            if self.identities[index]["user_agent"] != exclude:
+                return self.identities[index]
+
+        # One identity carries nearly all the weight, step past it rather than keep drawing.
+        return self.identities[(index + 1) % len(self.identities)]
+
+
+def make_identity(identity, rng):
+    """
+    Fills in an identity's weight and the headers its browser sends.
+
+    :param identity: The identity, a dict with at least user_agent, or just a User Agent string.
+    :type identity: dict or str
+    :param rng: The random generator to pick the Accept-Language with.
+    :type rng: <random.Random> obj
+    :returns: The identity, a dict of user_agent, headers and weight.
+    :rtype: dict
+    """
+    if isinstance(identity, str):
+        identity = {"user_agent": identity}
+
+    headers = {
+        "Accept": ACCEPT[identity.get("browser") or browser_family(identity["user_agent"])],
+        "Accept-Language": rng.choices(
+            [language for language, _ in ACCEPT_LANGUAGES], [weight for _, weight in ACCEPT_LANGUAGES])[0],
+    }
+    headers.update(identity.get("headers") or {})
+
+    return {
+        "user_agent": identity["user_agent"],
+        "headers": headers,
+        "weight": identity.get("weight") or 1,
+    }
+
+
+def browser_family(user_agent):
+    """
+    Gets the browser family of a User Agent string, to match its headers to.
+
+    :param user_agent: The User Agent string.
+    :type user_agent: str
+    :returns: "firefox", "ie" or "chrome".
+    :rtype: str
+    """
+    if "Firefox/" in user_agent:
+        return "firefox"
+    if "Trident/" in user_agent or "MSIE " in user_agent:
+        return "ie"
+    return "chrome"
+
+
+def alias_table(weights):
+    """
+    Builds Walker's alias table for O(1) weighted picks, with Vose's method. Each slot keeps its own index with its
+    probability, and otherwise gives its alias.
+
+    :param weights: The weight of each item.
+    :type weights: list
+    :returns: Each slot's probability and alias.
+    :rtype: tuple
+    """
+    count = len(weights)
+    total = float(sum(weights))
+    scaled = [weight * count / total for weight in weights]
+    probabilities = [1.0] * count
+    aliases = list(range(count))
+
+    small = [index for index, probability in enumerate(scaled) if probability < 1]
+    large = [index for index, probability in enumerate(scaled) if probability >= 1]
+    while small and large:
+        less = small.pop()
+        more = large.pop()
+        probabilities[less] = scaled[less]
+        aliases[less] = more
+        scaled[more] += scaled[less] - 1
+        if scaled[more] < 1:
+            small.append(more)
+        else:
+            large.append(more)
+
+    return probabilities, aliases
+
+
+def get_default_pool():
+    """
+    Gets the pool shared by every CarpetBag in the process, generating it on first use.
+
+    :returns: The pool.
+    :rtype: <UserAgentPool> obj
+    """
+    global default_pool
+    with default_pool_lock:
+        if default_pool is None:
+            default_pool = UserAgentPool.generate()
+
+    return default_pool
+
+# EndFile: carpetbag/carpetbag/user_agents.py
@@ -3,24 +3,30 @@
 Builds packages so that each package can be imported (and allow relative imports)
 
 """
+import re
 
 import setuptools
 
-from carpetbag import CarpetBag
-
 
 with open("README.md", "r") as fh:
     long_description = fh.read()
 
+# Read the version out of the source, rather than importing CarpetBag and all its dependencies to get it.
+with open("carpetbag/base_carpetbag.py", "r") as fh:
+    version = re.search(r"__version__ = \"([^\"]+)\"", fh.read()).group(1)
+
 setuptools.setup(
     name="CarpetBag",
-    version=CarpetBag.__version__,
+    version=version,
     author="politeauthority",
     description="A python scraper that wont take no for an answer",
     long_description=long_description,
     # long_description_content_type="text/markdown",
     url="https://github.com/politeauthority/carpetbag",
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(exclude=["benchmarks", "benchmarks.*"]),
+    extras_require={
+        "lxml": ["lxml>=4.3.3"],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
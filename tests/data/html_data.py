@@ -0,0 +1,73 @@
+"""HTML pages for testing ParseResponse and its parse backends.
+
+"""
+
+DUCKDUCKGO_RESULTS = """
+<html>
+    <head>
+        <title>learn python at DuckDuckGo</title>
+    </head>
+    <body>
+        <div class="results">
+            <div class="result results_links web-result">
+                <h2 class="result__title"><a class="result__a" href="https://www.learnpython.org/">Learn Python</a></h2>
+                <a class="result__snippet" href="https://www.learnpython.org/">Free interactive Python tutorial.</a>
+                <a class="result__url" href="https://www.learnpython.org/">www.learnpython.org</a>
+            </div>
+            <div class="result results_links web-result">
+                <h2 class="result__title"><a class="result__a" href="https://docs.python.org/">Python Docs</a></h2>
+                <a class="result__snippet" href="https://docs.python.org/">The Python Tutorial.</a>
+                <a class="result__url" href="https://docs.python.org/">docs.python.org/3/tutorial</a>
+            </div>
+        </div>
+    </body>
+</html>"""
+
+LINKS = """
+<html>
+    <head>
+        <title>Links</title>
+        <base href="https://www.bad-actor.services/pages/">
+    </head>
+    <body>
+        <a href="/about">About</a>
+        <a href="#top">Top</a>
+        <a>No href</a>
+        <a href="mailto:admin@bad-actor.services">Email</a>
+        <a href="https://www.google.com/">Google</a>
+        <a href="contact.html">Contact</a>
+        <a href="https://api.bad-actor.services/docs#auth">API Docs</a>
+        <a href="https://www.google.com/#again">Google Again</a>
+        <a href="/about">About Again</a>
+    </body>
+</html>"""
+
+HEAD = """<!DOCTYPE html>
+<html>
+    <head>
+        <meta charset="utf-8">
+        <title>Carpet Bags for Sale</title>
+        <meta name="Description" content="Fine carpet bags.">
+        <meta property="og:title" content="Carpet Bags">
+        <meta name="description" content="Ignored, the first one wins.">
+        <link rel="stylesheet" href="/style.css">
+        <link rel="canonical" href="/bags/">
+    </head>
+    <body>
+%s
+    </body>
+</html>""" % ("        <p>Lots of bag details.</p>\n" * 500)
+
+XHTML = """<?xml version="1.0" encoding="iso-8859-1"?>
+<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Strict//EN" "http://www.w3.org/TR/xhtml1/DTD/xhtml1-strict.dtd">
+<html xmlns="http://www.w3.org/1999/xhtml">
+    <head>
+        <title>Carpet Bags Café</title>
+        <meta name="description" content="Fine carpet bags." />
+    </head>
+    <body>
+        <p>Bags.</p>
+    </body>
+</html>"""
+
+# End File: carpetbag/tests/data/html_data.py
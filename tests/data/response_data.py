@@ -1,3 +1,6 @@
+import json
+
+
 class GoogleDotComResponse(object):
 
     def __init__(self):
@@ -11,3 +14,42 @@ class GoogleDotComResponse(object):
     <body>
     </body>
 </html>"""
+
+
+class HtmlResponse(object):
+
+    def __init__(self, url, text):
+        self.status_code = 200
+        self.url = url
+        self.text = text
+
+
+class StreamedResponse(object):
+
+    def __init__(self, url, content, headers=None):
+        self.status_code = 200
+        self.url = url
+        self.content = content
+        self.headers = headers or {}
+        self.bytes_read = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            chunk = self.content[start:start + chunk_size]
+            self.bytes_read += len(chunk)
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+class JsonResponse(StreamedResponse):
+
+    def __init__(self, url, data, status_code=200, headers=None):
+        super().__init__(url, json.dumps(data).encode("utf-8"), headers or {"Content-Type": "application/json"})
+        self.status_code = status_code
+        self.text = self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.text)
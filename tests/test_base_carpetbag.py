@@ -14,7 +14,9 @@ from carpetbag import CarpetBag
 from carpetbag import carpet_tools as ct
 from carpetbag import errors
 
-from .data.response_data import GoogleDotComResponse
+from .data import proxy_bag
+from .data import html_data
+from .data.response_data import GoogleDotComResponse, StreamedResponse
 
 # UNIT_TEST_URL = os.environ.get("BAD_ACTOR_URL", "https//bas.bitgel.com")
 UNIT_TEST_URL = "https://bas.bitgel.com/api"
@@ -297,6 +299,160 @@ class TestBaseCarpetBag(object):
                 payload={},
                 retry=0)
 
+    def test__refill_proxy_bag(self, monkeypatch):
+        """
+        Tests the BaseCarpetBag._refill_proxy_bag() method to make sure new, valid proxies are merged into the back of
+        the proxy bag, skipping proxies already in the bag or already used.
+
+        """
+        bagger = CarpetBag()
+        bagger.proxy_bag = [proxy_bag.proxies[0]]
+        bagger.proxy_bag_spent.add(proxy_bag.proxies[1]["address"])
+        bad_proxy = proxy_bag.proxies[2]["address"]
+        monkeypatch.setattr(bagger, "_fetch_public_proxies", lambda continent: list(proxy_bag.proxies))
+        monkeypatch.setattr(bagger, "_validate_proxy", lambda proxy: proxy["address"] != bad_proxy)
+
+        added = bagger._refill_proxy_bag()
+        assert added == len(proxy_bag.proxies) - 3
+        assert bagger.proxy_bag[0] == proxy_bag.proxies[0]
+        addresses = [proxy["address"] for proxy in bagger.proxy_bag]
+        assert proxy_bag.proxies[1]["address"] not in addresses
+        assert bad_proxy not in addresses
+        assert len(addresses) == len(set(addresses))
+
+    def test__check_proxy_bag_low_water(self, monkeypatch):
+        """
+        Tests that a background refill starts when the proxy bag drops below the low water mark, and that
+        reset_proxy_from_bag() waits on it rather than raising EmptyProxyBag.
+
+        """
+        bagger = CarpetBag()
+        monkeypatch.setattr(bagger, "_fetch_public_proxies", lambda continent: list(proxy_bag.proxies))
+        assert not bagger._check_proxy_bag_low_water()
+
+        bagger.use_proxy_bag_refill(low_water_mark=2, validate_proxies=False)
+        bagger.proxy_bag = [proxy_bag.proxies[0]]
+        bagger.reset_proxy_from_bag()
+        bagger.reset_proxy_from_bag()
+        assert bagger.proxy_bag_refill_thread
+        assert bagger.proxy_current["address"] != proxy_bag.proxies[0]["address"]
+        assert len(bagger.proxy_bag) == len(proxy_bag.proxies) - 1
+
+        bagger.use_proxy_bag_refill(False)
+        bagger.proxy_bag = [bagger.proxy_current]
+        with pytest.raises(errors.EmptyProxyBag):
+            bagger.reset_proxy_from_bag()
+
+    def test__proxy_for_url(self):
+        """
+        Tests the BaseCarpetBag._proxy_for_url() method to make sure sticky proxies keep a domain on the same proxy
+        through proxy rotations, until that proxy fails.
+
+        """
+        bagger = CarpetBag()
+        bagger.random_proxy_bag = True
+        bagger.proxy_bag = list(proxy_bag.proxies)
+        bagger.reset_proxy_from_bag()
+        first_proxy = dict(bagger.proxy)
+        assert bagger._proxy_for_url("https://www.google.com/") == first_proxy
+
+        bagger.use_sticky_proxies()
+        assert bagger._proxy_for_url("https://www.google.com/") == first_proxy
+        bagger.reset_proxy_from_bag()
+        assert bagger.proxy != first_proxy
+        assert bagger._proxy_for_url("https://www.google.com/search") == first_proxy
+        assert bagger._proxy_for_url("https://www.bing.com/") == bagger.proxy
+
+        bagger._record_proxy_health(False, url="https://www.google.com/")
+        assert proxy_bag.proxies[0]["address"] in bagger.proxy_failed
+        assert bagger._proxy_for_url("https://www.google.com/") == bagger.proxy
+
+    def test__record_proxy_health(self):
+        """
+        Tests that only the proxy's own errors count against it, not the site's, and that a failure expires.
+
+        """
+        bagger = CarpetBag()
+        bagger.random_proxy_bag = True
+        bagger.proxy_bag = list(proxy_bag.proxies)
+        bagger.use_sticky_proxies(failure_ttl=60)
+        bagger.reset_proxy_from_bag()
+        address = bagger.proxy_current["address"]
+        responses = {}
+        for status_code in [407, 502, 503]:
+            responses[status_code] = requests.Response()
+            responses[status_code].status_code = status_code
+
+        assert not bagger._proxy_error_response("https://www.google.com/", responses[503])
+        assert not bagger._proxy_error_response("https://www.google.com/", responses[502])
+        assert bagger._proxy_error_response("http://www.google.com/", responses[502])
+        assert bagger._proxy_error_response("https://www.google.com/", responses[407])
+
+        bagger._record_proxy_health(False, url="https://www.google.com/")
+        assert bagger._proxy_failed_recently(address)
+        bagger._record_proxy_health(True, url="https://www.google.com/")
+        assert not bagger._proxy_failed_recently(address)
+
+        bagger._record_proxy_health(False, url="https://www.google.com/")
+        bagger.proxy_failed[address] -= 61
+        assert not bagger._proxy_failed_recently(address)
+        assert address not in bagger.proxy_failed
+
+        bagger.proxy = {}
+        bagger.proxy_current = {}
+        assert not bagger._proxy_error_response("https://www.google.com/", responses[407])
+
+    def test__drop_proxy(self):
+        """
+        Tests that a failed sticky proxy is dropped from the bag and the domain map by value, keeping the current
+        proxy.
+
+        """
+        bagger = CarpetBag()
+        bagger.random_proxy_bag = True
+        bagger.proxy_bag = list(proxy_bag.proxies)
+        bagger.use_sticky_proxies()
+        bagger.reset_proxy_from_bag()
+        sticky = bagger.proxy_current
+        bagger._proxy_for_url("https://www.google.com/")
+        bagger.reset_proxy_from_bag()
+        current = bagger.proxy_current
+        bagger.proxy_bag.insert(0, sticky)
+
+        bagger._drop_proxy(sticky)
+        assert bagger.proxy_current == current
+        assert sticky["address"] not in [proxy["address"] for proxy in bagger.proxy_bag]
+        assert current in bagger.proxy_bag
+        assert "google.com" not in bagger.proxy_domain_map
+
+        bagger._drop_proxy(current)
+        assert bagger.proxy_current != current
+        assert current not in bagger.proxy_bag
+
+    def test__read_head(self):
+        """
+        Tests that BaseCarpetBag()._read_head() stops reading at the end of the <head>, even when the tag is split
+        across chunks, or at max_bytes, and closes the response either way.
+
+        """
+        bagger = CarpetBag()
+        content = html_data.HEAD.encode("utf-8")
+        head_end = content.index(b"</head>") + len(b"</head>")
+
+        response = StreamedResponse("https://www.bad-actor.services/bags/", content)
+        head = bagger._read_head(response, chunk_size=head_end - 3)
+        assert head == content[:head_end]
+        assert response.closed
+        assert response.bytes_read < len(content)
+
+        response = StreamedResponse("https://www.bad-actor.services/bags/", content.replace(b"</head>", b"</HEAD>"))
+        assert bagger._read_head(response, chunk_size=64).endswith(b"</HEAD>")
+
+        response = StreamedResponse("https://www.bad-actor.services/bags/", content)
+        assert bagger._read_head(response, max_bytes=100, chunk_size=64) == content[:100]
+        assert response.bytes_read == 128
+        assert response.closed
+
     def test__after_request(self):
         """
         Tests the CarepetBag._after_request method to make sure we're setting class vars as expected.
@@ -0,0 +1,144 @@
+"""Tests Bloom Filter
+
+"""
+import os
+
+import pytest
+
+from carpetbag import CarpetBag
+from carpetbag import bloom_filter
+from carpetbag.bloom_filter import BloomFilter, ScalableBloomFilter
+from carpetbag.crawler import Frontier
+
+from .data.response_data import StreamedResponse
+
+
+class TestBloomFilter(object):
+
+    def test_bloom_filter(self):
+        """
+        Tests that a filter remembers everything added to it, and stays near its error rate when full.
+
+        """
+        bloom = BloomFilter(1000, 0.01)
+        assert bloom.num_bits == 9586
+        assert bloom.num_hashes == 7
+
+        urls = ["https://www.bad-actor.services/%s" % number for number in range(1000)]
+        added = sum(bloom.add(url) for url in urls)
+        assert added > 990
+        assert len(bloom) == added
+        assert not bloom.add(urls[0])
+        assert all(url in bloom for url in urls)
+        assert b"https://www.bad-actor.services/0" in bloom
+        assert not bloom.full()
+
+        false_positives = sum("https://www.google.com/%s" % number in bloom for number in range(10000))
+        assert false_positives < 200
+
+    def test_scalable_bloom_filter(self):
+        """
+        Tests that a scalable filter grows past its initial capacity while keeping under its error rate.
+
+        """
+        seen = ScalableBloomFilter(initial_capacity=100, error_rate=0.01)
+        assert "https://www.bad-actor.services/" not in seen
+        assert len(seen.filters) == 0
+
+        urls = ["https://www.bad-actor.services/%s" % number for number in range(1000)]
+        for url in urls:
+            seen.add(url)
+        assert all(url in seen for url in urls)
+        assert len(seen.filters) == 4
+        assert [bloom.capacity for bloom in seen.filters] == [100, 200, 400, 800]
+        assert [bloom.error_rate for bloom in seen.filters] == [0.005, 0.0025, 0.00125, 0.000625]
+
+        false_positives = sum("https://www.google.com/%s" % number in seen for number in range(10000))
+        assert false_positives < 150
+
+    def test_save_load(self, tmpdir):
+        """
+        Tests that a saved filter loads back, from memory or mmaped, and adding to an mmaped filter leaves the file
+        alone until it's saved.
+
+        """
+        path = os.path.join(str(tmpdir), "seen.bloom")
+        seen = ScalableBloomFilter(initial_capacity=10, error_rate=0.01)
+        for number in range(40):
+            seen.add("https://www.bad-actor.services/%s" % number)
+        seen.save(path)
+        saved = open(path, "rb").read()
+
+        for use_mmap in [True, False]:
+            loaded = ScalableBloomFilter.load(path, use_mmap)
+            assert len(loaded) == len(seen)
+            assert len(loaded.filters) == 3
+            assert all("https://www.bad-actor.services/%s" % number in loaded for number in range(40))
+            assert (loaded.mmap is not None) == use_mmap
+
+            for number in range(40, 100):
+                loaded.add("https://www.bad-actor.services/%s" % number)
+            assert all("https://www.bad-actor.services/%s" % number in loaded for number in range(100))
+            assert open(path, "rb").read() == saved
+
+        loaded.save(path)
+        assert "https://www.bad-actor.services/99" in ScalableBloomFilter.load(path)
+
+        with open(path, "wb") as phile:
+            phile.write(b"Not a filter")
+        with pytest.raises(ValueError):
+            ScalableBloomFilter.load(path)
+
+    def test_filter_seen(self):
+        """
+        Tests that filter_seen() drops urls seen before, in any equivalent form.
+
+        """
+        seen = ScalableBloomFilter()
+        assert bloom_filter.filter_seen(seen, [
+            "https://www.bad-actor.services/", "https://www.bad-actor.services/one"]) == [
+            "https://www.bad-actor.services/", "https://www.bad-actor.services/one"]
+        assert bloom_filter.filter_seen(seen, [
+            "https://WWW.bad-actor.services", "https://www.bad-actor.services/one#top",
+            "https://www.bad-actor.services/two"]) == ["https://www.bad-actor.services/two"]
+
+    def test_frontier_seen(self):
+        """
+        Tests that the frontier de-duplicates canonical urls in a Bloom filter by default, or any set given.
+
+        """
+        frontier = Frontier()
+        assert isinstance(frontier.seen, ScalableBloomFilter)
+        assert frontier.add("https://www.bad-actor.services/one?b=2&a=1")
+        assert not frontier.add("https://www.bad-actor.services:443/one?a=1&b=2#top")
+        assert frontier.pop(0) == ("https://www.bad-actor.services/one?b=2&a=1", 0)
+
+        seen = set()
+        frontier = Frontier(seen=seen)
+        frontier.add("https://www.bad-actor.services")
+        assert seen == set(["https://www.bad-actor.services/"])
+
+    def test_get_links_seen(self, monkeypatch):
+        """
+        Tests that CarpetBag.get_links() leaves out links already in a shared seen filter.
+
+        """
+        pages = {
+            "https://www.bad-actor.services/1": b'<a href="/one">One</a><a href="https://www.google.com/">G</a>',
+            "https://www.bad-actor.services/2": b'<a href="/one#top">One</a><a href="/two">Two</a>',
+        }
+        monkeypatch.setattr(
+            CarpetBag, "get", lambda bagger, url, payload={}: StreamedResponse(url, pages[url], {}))
+
+        bagger = CarpetBag()
+        seen = ScalableBloomFilter()
+        assert bagger.get_links("https://www.bad-actor.services/1", seen=seen) == {
+            "local": ["https://www.bad-actor.services/one"],
+            "remote": ["https://www.google.com/"],
+        }
+        assert bagger.get_links("https://www.bad-actor.services/2", seen=seen) == {
+            "local": ["https://www.bad-actor.services/two"],
+            "remote": [],
+        }
+
+# End File carpetbag/tests/test_bloom_filter.py
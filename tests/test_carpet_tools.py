@@ -138,6 +138,29 @@ class TestCarpetTools(object):
         assert ct.url_domain("http://localhost") == "localhost"
         assert ct.url_domain("http://192.168.1.19:5010") == "192.168.1.19"
 
+    def test_url_host(self):
+        """
+        Tests the CarpetBag.carpet_tools.url_host() method to see if it picks the host and port from a url.
+
+        """
+        assert ct.url_host("https://WWW.bad-actor.services/some/thing") == "www.bad-actor.services"
+        assert ct.url_host("www.bad-actor.services:5000/api") == "www.bad-actor.services:5000"
+        assert ct.url_host("http://192.168.1.19:5010") == "192.168.1.19:5010"
+
+    def test_url_canonical(self):
+        """
+        Tests the CarpetBag.carpet_tools.url_canonical() method to see if equivalent urls come out the same.
+
+        """
+        assert ct.url_canonical("HTTP://WWW.Bad-Actor.services:80/a/./b/../c?z=1&a=2#top") == \
+            "http://www.bad-actor.services/a/c?a=2&z=1"
+        assert ct.url_canonical("https://www.bad-actor.services") == "https://www.bad-actor.services/"
+        assert ct.url_canonical("https://www.bad-actor.services:443/") == "https://www.bad-actor.services/"
+        assert ct.url_canonical("https://www.bad-actor.services:8443/") == "https://www.bad-actor.services:8443/"
+        assert ct.url_canonical("www.bad-actor.services/one/..") == "http://www.bad-actor.services/"
+        assert ct.url_canonical("https://www.bad-actor.services/One/?b=&a=1&") == \
+            "https://www.bad-actor.services/One/?a=1&b="
+
     def test_url_port(self):
         """
         Tests the CarpetBag.carpet_tools.url_port() to make sure we're plucking the port from a url.
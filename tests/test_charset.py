@@ -0,0 +1,79 @@
+"""Tests Charset
+
+"""
+import codecs
+
+from carpetbag import charset
+from carpetbag import link_extractor
+from carpetbag.parse_response import ParseResponse
+
+from .data.response_data import StreamedResponse
+
+PAGE = "<html><head>%s<title>Café Crème</title></head><body><p>Naïve façade, 10€</p></body></html>"
+
+
+class TestCharset(object):
+
+    def test_detect_encoding(self):
+        """
+        Tests that the encoding is taken from the BOM, then the header, then a <meta> tag, before guessing.
+
+        """
+        page = PAGE % ""
+        assert charset.detect_encoding(codecs.BOM_UTF8 + page.encode("utf-8"), "text/html; charset=cp1252") == \
+            "utf-8-sig"
+        assert charset.detect_encoding(codecs.BOM_UTF16_LE + page.encode("utf-16-le")) == "utf-16"
+        assert charset.detect_encoding(page.encode("cp1252"), "text/html; charset=windows-1252") == "cp1252"
+        assert charset.detect_encoding(page.encode("utf-8"), "text/html; charset=\"UTF8\"") == "utf-8"
+
+        meta_page = PAGE % '<meta charset="windows-1252">'
+        assert charset.detect_encoding(meta_page.encode("cp1252"), "text/html") == "cp1252"
+        meta_page = PAGE % '<meta http-equiv="Content-Type" content="text/html; charset=koi8-r">'
+        assert charset.detect_encoding(meta_page.encode("utf-8"), "text/html") == "koi8-r"
+        meta_page = PAGE % '<meta charset="utf-16">'
+        assert charset.detect_encoding(meta_page.encode("utf-8")) == "utf-8"
+
+        # Unknown labels fall through to the next source.
+        assert charset.detect_encoding(page.encode("utf-8"), "text/html; charset=not-a-codec") == "utf-8"
+        assert charset.detect_encoding(b"") == "utf-8"
+
+    def test_utf8_encoding(self):
+        """
+        Tests that UTF-8 is checked over a bounded prefix, and a character split at the end of it is fine.
+
+        """
+        page = ("<p>€</p>" * (charset.DETECT_BYTES // 3)).encode("utf-8")
+        assert charset.utf8_encoding(page) == "utf-8"
+        assert charset.utf8_encoding((PAGE % "").encode("utf-8")) == "utf-8"
+        assert charset.utf8_encoding((PAGE % "").encode("cp1252")) is None
+        assert charset.utf8_encoding(b"caf\xc3") is None
+
+    def test_codec_name(self):
+        """
+        Tests that labels are normalized to Python codec names, with latin-1 and ascii read as windows-1252.
+
+        """
+        assert charset.codec_name("UTF-8") == "utf-8"
+        assert charset.codec_name("ISO-8859-1") == "cp1252"
+        assert charset.codec_name("us-ascii") == "cp1252"
+        assert charset.codec_name("Shift_JIS") == "shift_jis"
+        assert charset.codec_name("not-a-codec") is None
+
+    def test_parse_response_decoding(self):
+        """
+        Tests that ParseResponse decodes the raw bytes itself, and that extract_links() detects the encoding from the
+        first chunk.
+
+        """
+        page = PAGE % '<meta charset="windows-1252">'
+        response = StreamedResponse(
+            "https://www.bad-actor.services/", page.encode("cp1252"), {"Content-Type": "text/html"})
+        parsed = ParseResponse(response)
+        assert parsed.content == page
+        assert parsed.get_title() == "Café Crème"
+
+        page = '<meta charset="windows-1252"><a href="/café">Café</a>'
+        links = link_extractor.extract_links("https://www.bad-actor.services/", [page.encode("cp1252")])
+        assert links["local"] == ["https://www.bad-actor.services/café"]
+
+# End File carpetbag/tests/test_charset.py
@@ -0,0 +1,216 @@
+"""Tests Circuit Breaker
+
+"""
+import pytest
+import requests
+
+from carpetbag import CarpetBag
+from carpetbag import errors
+from carpetbag.circuit_breaker import CircuitBreaker, CircuitBreakers
+
+from .data import proxy_bag
+
+UNIT_TEST_URL_BROKEN = "http://0.0.0.0:90/"
+
+
+class DeadProxySession(object):
+    """
+    A session where requests through the dead proxy fail to connect, and everything else gets a 200. With no dead
+    proxy, every request fails to connect, like a host outage.
+
+    """
+
+    def __init__(self, dead_proxy=None):
+        self.dead_proxy = dead_proxy
+        self.proxies_used = []
+
+    def request(self, **request_args):
+        proxies = request_args.get("proxies") or {}
+        self.proxies_used.extend(proxies.values())
+        if not self.dead_proxy or self.dead_proxy in proxies.values():
+            raise requests.exceptions.ConnectionError("Dead proxy")
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request_args["url"]
+        response._content = b"ok"
+        return response
+
+
+class TestCircuitBreaker(object):
+
+    def test___init__(self):
+        """
+        Tests that the CircuitBreaker module init has correct default values.
+
+        """
+        breaker = CircuitBreaker()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.failure_threshold == 5
+        assert breaker.recovery_timeout == 30
+        assert breaker.allow()
+
+    def test_failure(self):
+        """
+        Tests that a breaker opens after the failure threshold and fails fast.
+
+        """
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30)
+        assert not breaker.failure()
+        assert breaker.allow()
+        assert breaker.failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+
+        breaker.success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.failures == 0
+
+    def test_half_open(self):
+        """
+        Tests that an open breaker lets a single probe through after the recovery timeout, and that the probe closes
+        or re-opens it.
+
+        """
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+        breaker.failure()
+        breaker.recovery_timeout = 30
+        breaker.opened_at -= 30
+        assert breaker.allow()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.allow()
+
+        assert breaker.failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        breaker.opened_at -= 30
+        assert breaker.allow()
+        breaker.success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_circuit_breakers(self):
+        """
+        Tests that CircuitBreakers keeps one breaker per key.
+
+        """
+        breakers = CircuitBreakers(failure_threshold=1)
+        assert breakers.get("www.google.com") is breakers.get("www.google.com")
+        breakers.get("www.google.com").failure()
+        assert breakers.get("www.bing.com").failure_threshold == 1
+        assert breakers.open_keys() == ["www.google.com"]
+
+    def test_failure_sources(self):
+        """
+        Tests that failures tagged with a single source don't open a breaker needing two sources, but ones from two
+        sources do, and that a success hands back the failures by source.
+
+        """
+        breaker = CircuitBreaker(failure_threshold=2)
+        assert not breaker.failure("http://1.1.1.1:80", 2)
+        assert not breaker.failure("http://1.1.1.1:80", 2)
+        assert not breaker.failure("http://1.1.1.1:80", 2)
+        assert breaker.failure("http://2.2.2.2:80", 2)
+
+        assert breaker.success() == {"http://1.1.1.1:80": 3, "http://2.2.2.2:80": 1}
+        assert breaker.sources == {}
+        assert not breaker.failure("http://1.1.1.1:80", 2)
+        assert breaker.failure(None, 2)
+
+        breaker.success()
+        assert not breaker.failure("http://1.1.1.1:80")
+        assert breaker.failure("http://1.1.1.1:80")
+
+    def test_dead_proxy_healthy_host(self, monkeypatch):
+        """
+        Tests that a dead proxy in front of a healthy host is rotated out, without opening the host's breaker.
+
+        """
+        bagger = CarpetBag()
+        bagger.use_circuit_breakers(failure_threshold=2)
+        bagger.random_proxy_bag = True
+        bagger.proxy_bag = list(proxy_bag.proxies)
+        bagger.reset_proxy_from_bag()
+        dead_proxy = bagger.proxy_current["address"]
+        bag_size = len(bagger.proxy_bag)
+
+        session = DeadProxySession(dead_proxy)
+        monkeypatch.setattr(bagger.session_pool, "get", lambda proxies: session)
+        response = bagger.get("https://example.com/")
+        assert response.status_code == 200
+        assert session.proxies_used.count(dead_proxy) == 1
+        assert bagger.proxy_current["address"] != dead_proxy
+        # One failure is blamed on the proxy once the host answered through another, its breaker is still closed.
+        assert bagger.proxy_bag[-1]["address"] == dead_proxy
+        assert bagger.proxy_breakers.get(dead_proxy).failures == 1
+
+        # The bag rotates back round to the dead proxy, its second failure opens its breaker and drops it.
+        bagger.proxy_bag.insert(0, bagger.proxy_bag.pop())
+        bagger.reset_proxy_from_bag()
+        assert bagger.proxy_current["address"] == dead_proxy
+        assert bagger.get("https://example.com/").status_code == 200
+        assert dead_proxy not in [proxy["address"] for proxy in bagger.proxy_bag]
+        assert len(bagger.proxy_bag) == bag_size - 2
+        assert bagger.host_breakers.open_keys() == []
+        assert bagger.proxy_breakers.open_keys() == [dead_proxy]
+
+    def test_host_outage(self, monkeypatch):
+        """
+        Tests that a host outage opens the host's breaker without blaming or dropping any of the proxies it was tried
+        through.
+
+        """
+        bagger = CarpetBag()
+        bagger.use_circuit_breakers(failure_threshold=3)
+        bagger.random_proxy_bag = True
+        bagger.proxy_bag = list(proxy_bag.proxies)
+        bagger.reset_proxy_from_bag()
+        bag_size = len(bagger.proxy_bag)
+
+        session = DeadProxySession()
+        monkeypatch.setattr(bagger.session_pool, "get", lambda proxies: session)
+        with pytest.raises(errors.CircuitOpen):
+            bagger.get("https://example.com/")
+        assert len(set(session.proxies_used)) == 3
+        assert len(bagger.proxy_bag) == bag_size
+        assert bagger.host_breakers.open_keys() == ["example.com"]
+        assert bagger.proxy_breakers.open_keys() == []
+
+    def test_fixed_proxy(self, monkeypatch):
+        """
+        Tests that failures through a single proxy set by hand still open the host's breaker.
+
+        """
+        bagger = CarpetBag()
+        bagger.use_circuit_breakers(failure_threshold=4)
+        bagger.retries_on_connection_failure = 1
+        bagger.proxy = {"http": "http://1.1.1.1:80"}
+
+        session = DeadProxySession()
+        monkeypatch.setattr(bagger.session_pool, "get", lambda proxies: session)
+        for _ in range(3):
+            with pytest.raises(requests.exceptions.ConnectionError):
+                bagger.get("http://example.com/")
+        assert bagger.host_breakers.open_keys() == []
+        with pytest.raises(errors.CircuitOpen):
+            bagger.get("http://example.com/")
+        assert bagger.host_breakers.open_keys() == ["example.com"]
+
+    def test_use_circuit_breakers(self):
+        """
+        Tests that CarpetBag fails fast on a host which has its circuit breaker open.
+
+        """
+        bagger = CarpetBag()
+        assert bagger.use_circuit_breakers(failure_threshold=2)
+        with pytest.raises(errors.CircuitOpen):
+            bagger.get(UNIT_TEST_URL_BROKEN)
+        assert bagger.request_total == 1
+        assert "CircuitOpen" in bagger.manifest[0]["errors"]
+
+        with pytest.raises(errors.CircuitOpen):
+            bagger.get(UNIT_TEST_URL_BROKEN)
+        assert bagger.request_total == 1
+
+        assert not bagger.use_circuit_breakers(False)
+        assert not bagger.host_breakers
+
+# End File carpetbag/tests/test_circuit_breaker.py
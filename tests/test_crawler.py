@@ -0,0 +1,208 @@
+"""Tests Crawler
+
+"""
+import threading
+import time
+
+from carpetbag import CarpetBag
+from carpetbag.crawler import Crawler, Frontier
+
+from .data import proxy_bag
+from .data.response_data import StreamedResponse
+
+SITE = {
+    "https://www.bad-actor.services/": ["/one", "/two", "https://www.google.com/", "https://api.bad-actor.services/"],
+    "https://www.bad-actor.services/one": ["/", "/one/deep", "/private/secret"],
+    "https://www.bad-actor.services/two": ["/one", "/bag.gif"],
+    "https://www.bad-actor.services/one/deep": ["/one/deeper"],
+    "https://www.bad-actor.services/one/deeper": [],
+    "https://www.bad-actor.services/bag.gif": [],
+    "https://api.bad-actor.services/": ["/v1"],
+    "https://api.bad-actor.services/v1": [],
+}
+
+
+def fake_get(bagger, url, payload={}):
+    """
+    Serves pages out of SITE, bag.gif as an image and anything else as a connection error.
+
+    """
+    if url not in SITE:
+        raise ConnectionError("No route to %s" % url)
+
+    bagger.fake_requests.append((url, time.time(), threading.current_thread().name))
+    if url.endswith(".gif"):
+        return StreamedResponse(url, b"GIF89a", {"Content-Type": "image/gif"})
+
+    html = "".join('<a href="%s">Link</a>' % link for link in SITE[url])
+    return StreamedResponse(url, html.encode("utf-8"), {"Content-Type": "text/html; charset=utf-8"})
+
+
+class TestCrawler(object):
+
+    def test_frontier(self):
+        """
+        Tests that the frontier de-duplicates urls and hands out hosts round robin, one url per host at a time.
+
+        """
+        frontier = Frontier()
+        assert frontier.add("https://one.bad-actor.services/1")
+        assert frontier.add("https://one.bad-actor.services/2")
+        assert frontier.add("https://two.bad-actor.services/1")
+        assert not frontier.add("https://one.bad-actor.services/1")
+        assert len(frontier) == 3
+
+        assert frontier.pop(0) == ("https://one.bad-actor.services/1", 0)
+        assert frontier.pop(0) == ("https://two.bad-actor.services/1", 0)
+        # one.bad-actor.services is still being fetched.
+        assert frontier.pop(0) is None
+        assert not frontier.idle()
+
+        frontier.done("https://one.bad-actor.services/1")
+        assert frontier.pop(0) == ("https://one.bad-actor.services/2", 0)
+        frontier.done("https://one.bad-actor.services/2")
+        frontier.done("https://two.bad-actor.services/1")
+        assert frontier.idle()
+        assert frontier.queues == {}
+
+    def test_frontier_release(self):
+        """
+        Tests that a url released without being fetched goes back to the front of its host's queue.
+
+        """
+        frontier = Frontier(delay=60)
+        frontier.add("https://one.bad-actor.services/1", 1)
+        frontier.add("https://one.bad-actor.services/2", 1)
+        assert frontier.pop(0) == ("https://one.bad-actor.services/1", 1)
+        frontier.release("https://one.bad-actor.services/1", 1)
+        assert len(frontier) == 2
+        assert frontier.pop(0) == ("https://one.bad-actor.services/1", 1)
+
+    def test_frontier_delay(self):
+        """
+        Tests that a host isn't handed out again until its politeness delay has passed.
+
+        """
+        frontier = Frontier(delay=0.2)
+        frontier.set_delay("Fast.bad-actor.services", 0)
+        for url in ["https://slow.bad-actor.services/1", "https://slow.bad-actor.services/2",
+                    "https://fast.bad-actor.services/1", "https://fast.bad-actor.services/2"]:
+            frontier.add(url, 1)
+
+        assert frontier.pop(0)[0] == "https://slow.bad-actor.services/1"
+        assert frontier.pop(0)[0] == "https://fast.bad-actor.services/1"
+        frontier.done("https://slow.bad-actor.services/1")
+        frontier.done("https://fast.bad-actor.services/1")
+
+        assert frontier.pop(0) == ("https://fast.bad-actor.services/2", 1)
+        assert frontier.pop(0) is None
+        start = time.time()
+        assert frontier.pop(1)[0] == "https://slow.bad-actor.services/2"
+        assert time.time() - start >= 0.1
+
+    def test_in_scope(self):
+        """
+        Tests the crawl scope rules.
+
+        """
+        crawler = Crawler(CarpetBag(), ["www.bad-actor.services"], max_depth=2, deny=["/private/"], allow=["services"])
+        assert crawler.seeds == ["http://www.bad-actor.services"]
+        assert crawler.in_scope("https://api.bad-actor.services/", 1)
+        assert not crawler.in_scope("https://api.bad-actor.services/", 3)
+        assert not crawler.in_scope("https://www.google.com/", 1)
+        assert not crawler.in_scope("https://www.bad-actor.services/private/secret", 1)
+
+        crawler = Crawler(CarpetBag(), ["https://www.bad-actor.services/"], same_domain=False, allow=[r"google\.com"])
+        assert crawler.in_scope("https://www.google.com/", 1)
+        assert not crawler.in_scope("https://www.bad-actor.services/about", 1)
+
+    def test_crawl(self, monkeypatch):
+        """
+        Tests that a crawl fetches every in scope page once, across worker threads, and reports failed fetches.
+
+        """
+        monkeypatch.setattr(CarpetBag, "get", fake_get)
+        bagger = CarpetBag()
+        bagger.fake_requests = []
+        bagger.mininum_wait_time = 0
+
+        pages = list(bagger.crawl(["https://www.bad-actor.services/"], max_depth=2, deny=["/private/"], workers=3))
+        fetched = sorted(page["url"] for page in pages)
+        assert fetched == [
+            "https://api.bad-actor.services/",
+            "https://api.bad-actor.services/v1",
+            "https://www.bad-actor.services/",
+            "https://www.bad-actor.services/bag.gif",
+            "https://www.bad-actor.services/one",
+            "https://www.bad-actor.services/one/deep",
+            "https://www.bad-actor.services/two",
+        ]
+        assert len(bagger.fake_requests) == len(fetched)
+        assert bagger.manifest == []
+
+        by_url = dict((page["url"], page) for page in pages)
+        assert by_url["https://www.bad-actor.services/one/deep"]["depth"] == 2
+        assert by_url["https://www.bad-actor.services/bag.gif"]["links"] == []
+        assert "https://www.google.com/" in by_url["https://www.bad-actor.services/"]["links"]
+
+        seeds = ["https://www.bad-actor.services/", "https://missing.bad-actor.services/"]
+        crawler = Crawler(bagger, seeds, max_depth=0)
+        pages = []
+        assert crawler.run(pages.append) == 2
+        errors = [page for page in pages if page["error"]]
+        assert [page["url"] for page in errors] == ["https://missing.bad-actor.services/"]
+
+    def test_crawl_max_pages(self, monkeypatch):
+        """
+        Tests that a crawl stops at max_pages.
+
+        """
+        monkeypatch.setattr(CarpetBag, "get", fake_get)
+        bagger = CarpetBag()
+        bagger.fake_requests = []
+        crawler = Crawler(bagger, ["https://www.bad-actor.services/"], max_pages=3, workers=2, delay=0)
+        assert len(list(crawler.crawl())) == 3
+        assert crawler.fetched == 3
+        assert len(bagger.fake_requests) == 3
+
+    def test_clone(self):
+        """
+        Tests that a clone shares settings and pools, but not its request state.
+
+        """
+        bagger = CarpetBag()
+        bagger.set_header("X-Test", "1")
+        bagger.manifest = [{"url": "https://www.bad-actor.services/"}]
+        bagger.use_parser_backend("lxml")
+
+        clone = bagger.clone()
+        assert clone.headers == bagger.headers
+        clone.set_header("X-Clone", "1")
+        assert "X-Clone" not in bagger.headers
+        assert clone.manifest == []
+        assert clone.parser_backend == "lxml"
+        assert clone.session_pool is bagger.session_pool
+        assert clone.proxy_bag == bagger.proxy_bag
+        assert clone.proxy_bag is not bagger.proxy_bag
+
+    def test_clone_proxy_bag(self):
+        """
+        Tests that rotating a clone's proxy doesn't take proxies out of the original's bag.
+
+        """
+        bagger = CarpetBag()
+        bagger.random_proxy_bag = True
+        bagger.proxy_bag = list(proxy_bag.proxies)
+        bagger.reset_proxy_from_bag()
+        current = bagger.proxy_current
+
+        clone = bagger.clone()
+        clone.reset_proxy_from_bag()
+        clone._drop_proxy(clone.proxy_current)
+        assert bagger.proxy_current == current
+        assert current in bagger.proxy_bag
+        assert len(bagger.proxy_bag) == len(proxy_bag.proxies)
+        assert len(clone.proxy_bag) == len(proxy_bag.proxies) - 2
+        assert not bagger.proxy_bag_spent
+
+# End File carpetbag/tests/test_crawler.py
@@ -0,0 +1,62 @@
+"""Tests Imports
+Guards the import time of CarpetBag, by checking that heavy dependencies are only loaded when they're first used.
+Each check runs in a fresh interpreter, as the other tests have already loaded everything into this one.
+
+"""
+import subprocess
+import sys
+
+from benchmarks.bench_import import DEFERRED
+
+
+def run(code):
+    """
+    Runs code in a fresh interpreter, returning the deferred dependencies it ended up loading.
+
+    """
+    code = "import sys\n%s\nprint(' '.join(m for m in %r if m in sys.modules))" % (code, DEFERRED)
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return output.split()
+
+
+class TestImports(object):
+
+    def test_import_is_light(self):
+        """
+        Tests that importing CarpetBag, and creating one, doesn't load any of the deferred dependencies.
+
+        """
+        assert run("import carpetbag\ncarpetbag.CarpetBag()") == []
+
+    def test_loaded_on_first_use(self):
+        """
+        Tests that each deferred dependency is loaded by the first thing that uses it.
+
+        """
+        assert run("from carpetbag import carpet_tools as ct\nct.url_domain('https://www.bad-actor.services/')") == [
+            "tld"]
+        assert "user_agent" in run("import carpetbag\ncarpetbag.CarpetBag().use_random_user_agent()")
+
+        parsed = run("\n".join([
+            "from carpetbag.parse_response import ParseResponse",
+            "from tests.data.response_data import GoogleDotComResponse",
+            "ParseResponse(GoogleDotComResponse()).get_title()",
+        ]))
+        assert "bs4" in parsed
+        assert "tld" not in parsed
+
+    def test_concurrency_deferred(self):
+        """
+        Tests that multiprocessing, concurrent.futures and the crawler aren't loaded by importing CarpetBag, only by
+        the first thing that uses them.
+
+        """
+        loaded = run("import carpetbag")
+        assert "multiprocessing" not in loaded
+        assert "concurrent.futures" not in loaded
+        assert run("import carpetbag\ncarpetbag.Crawler") == ["carpetbag.crawler"]
+        crawl = run("import carpetbag\ncarpetbag.CarpetBag().crawl(['https://www.bad-actor.services/'])")
+        assert "carpetbag.crawler" in crawl
+        assert "multiprocessing" not in crawl
+
+# End File carpetbag/tests/test_imports.py
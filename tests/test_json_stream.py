@@ -0,0 +1,135 @@
+"""Tests Json Stream
+
+"""
+import json
+
+import pytest
+
+from carpetbag import CarpetBag
+from carpetbag import json_stream
+
+from .data.response_data import JsonResponse
+
+DOCUMENT = {
+    "page": 2,
+    "total_pages": 5,
+    "meta": {"next": "abc", "sizes": [1, 2]},
+    "objects": [{"id": number, "name": 'wool "bag" ]}\\' * (number % 4), "price": 1.5e3, "tag": "é中"}
+                for number in range(200)],
+    "count": 200,
+}
+
+
+def chunked(content, size):
+    """
+    Splits content into chunks of size.
+
+    """
+    return [content[index:index + size] for index in range(0, len(content), size)]
+
+
+class TestJsonStream(object):
+
+    def test_iter_items(self):
+        """
+        Tests pulling items out of a path, with chunks splitting tokens, strings, numbers and multibyte characters.
+
+        """
+        content = json.dumps(DOCUMENT, ensure_ascii=False).encode("utf-8")
+        for size in [1, 3, 7, 100, len(content)]:
+            assert list(json_stream.iter_items(chunked(content, size), "objects.*")) == DOCUMENT["objects"]
+
+        assert list(json_stream.iter_items([b"[1, 2", b"3, 4]"], "*")) == [1, 23, 4]
+        assert list(json_stream.iter_items(['{"a": [{"b": 1}, {"b": 2}]}'], "a.1.b")) == [2]
+        assert list(json_stream.iter_items([b" 12", b"3 "], "")) == [123]
+        assert list(json_stream.iter_items([b"{}"], "objects.*")) == []
+        assert list(json_stream.iter_items([b'{"objects": []}'], "objects.*")) == []
+
+    def test_chunk_boundaries(self):
+        """
+        Tests that splitting a document at every byte offset, including inside numbers like 1.5, -2500.0 and 1e-07,
+        strings, literals and multibyte characters, gives the same items and fields.
+
+        """
+        documents = [
+            ("*", [1.5, -2500.0, 1e-07, 12, 0, -0.25, 3E+2, True, False, None, "a\\\"b", {"x": [1, 2.5]}, []]),
+            ("objects.*", {"total": 10.75, "objects": [-2500.0, {"price": 1.25e3, "tag": "é中"}, 7],
+                           "meta": {"next": -1.5, "flag": False}, "last": 123456}),
+            ("", {"a": 1.5}),
+            ("", -12.5e-3),
+        ]
+        for path, document in documents:
+            content = json.dumps(document, ensure_ascii=False).encode("utf-8")
+            whole = json_stream.JsonStream(path)
+            expected = whole.feed(content) + whole.close()
+            for offset in range(len(content) + 1):
+                stream = json_stream.JsonStream(path)
+                items = stream.feed(content[:offset]) + stream.feed(content[offset:]) + stream.close()
+                assert items == expected, (content, offset)
+                assert stream.fields == whole.fields, (content, offset)
+
+            assert list(json_stream.iter_items(chunked(content, 1), path)) == expected
+
+        stream = json_stream.JsonStream("*")
+        assert stream.feed(b"[1.") == []
+        assert stream.feed(b"5, 2]") == [1.5, 2]
+        assert stream.close() == []
+
+    def test_fields(self):
+        """
+        Tests that scalars outside the path are kept, but not ones inside arrays.
+
+        """
+        stream = json_stream.JsonStream("objects.*")
+        content = json.dumps(DOCUMENT).encode("utf-8")
+        items = []
+        for chunk in chunked(content, 50):
+            items.extend(stream.feed(chunk))
+        items.extend(stream.close())
+        assert len(items) == 200
+        assert stream.fields == {"page": 2, "total_pages": 5, "meta": {"next": "abc"}, "count": 200}
+
+    def test_buffer(self):
+        """
+        Tests that only the item being read is buffered, not the whole document.
+
+        """
+        stream = json_stream.JsonStream("objects.*")
+        content = json.dumps(DOCUMENT).encode("utf-8")
+        largest = 0
+        for chunk in chunked(content, 64):
+            stream.feed(chunk)
+            largest = max(largest, len(stream.buffer) + stream.pending_size)
+        stream.close()
+        assert largest < 400
+
+    def test_truncated(self):
+        """
+        Tests that a document which ends early raises.
+
+        """
+        with pytest.raises(ValueError):
+            list(json_stream.iter_items([b'{"objects": [1, 2'], "objects.*"))
+
+        with pytest.raises(ValueError):
+            list(json_stream.iter_items([b'{"objects": [{"id": 1}, {"id"'], "objects.*"))
+
+    def test_iter_json(self, monkeypatch):
+        """
+        Tests streaming a JSON document from CarpetBag.iter_json(), and from a response with a charset.
+
+        """
+        def fake_get(bagger, url, payload={}):
+            return JsonResponse(url, DOCUMENT)
+
+        monkeypatch.setattr(CarpetBag, "get", fake_get)
+        bagger = CarpetBag()
+        items = bagger.iter_json("https://www.bad-actor.services/api/bags", "objects.*")
+        assert [bag["id"] for bag in items] == list(range(200))
+
+        response = JsonResponse("https://www.bad-actor.services/api/bags", None)
+        response.content = '["wool", "tweed"]'.encode("utf-16")
+        response.headers = {"Content-Type": "application/json; charset=utf-16"}
+        assert list(json_stream.iter_response_items(response, chunk_size=3)) == ["wool", "tweed"]
+
+# End File carpetbag/tests/test_json_stream.py
@@ -0,0 +1,73 @@
+"""Tests Link Extractor
+
+"""
+from carpetbag import link_extractor
+from carpetbag.link_extractor import LinkExtractor
+
+from .data import html_data
+
+
+class TestLinkExtractor(object):
+
+    def test___init__(self):
+        """
+        Tests that the LinkExtractor module init has correct default values.
+
+        """
+        extractor = LinkExtractor("https://news.bad-actor.services/pages/")
+        assert extractor.url == "https://news.bad-actor.services/pages/"
+        assert extractor.base_url == extractor.url
+        assert extractor.domain == "bad-actor.services"
+        assert extractor.links() == {"local": [], "remote": []}
+
+    def test_registered_domain(self):
+        """
+        Tests that registered domains are found for domains, multi part public suffixes, IPs and host names.
+
+        """
+        assert link_extractor.registered_domain("https://news.google.co.uk/world") == "google.co.uk"
+        assert link_extractor.registered_domain("http://192.168.1.19:5010/") == "192.168.1.19"
+        assert link_extractor.registered_domain("http://localhost:5000/") == "localhost"
+
+    def test_add(self):
+        """
+        Tests that hrefs are resolved, de-duplicated in order and sorted into local and remote.
+
+        """
+        extractor = LinkExtractor("https://www.bad-actor.services/pages/one")
+        assert extractor.add("two")
+        assert extractor.add("https://api.bad-actor.services/")
+        assert extractor.add("http://www.google.com")
+        assert not extractor.add("/pages/two#section")
+        assert not extractor.add("#top")
+        assert not extractor.add("javascript:void(0)")
+        assert not extractor.add("")
+        assert not extractor.add(None)
+
+        links = extractor.links()
+        assert links["local"] == ["https://www.bad-actor.services/pages/two", "https://api.bad-actor.services/"]
+        assert links["remote"] == ["http://www.google.com"]
+
+    def test_extract_links(self):
+        """
+        Tests that links are pulled from a page fed in small byte chunks, respecting the <base> tag.
+
+        """
+        page = html_data.LINKS.encode("utf-8")
+        chunks = [page[index:index + 7] for index in range(0, len(page), 7)]
+        links = link_extractor.extract_links("https://www.bad-actor.services/", chunks)
+        assert links["local"] == [
+            "https://www.bad-actor.services/about",
+            "https://www.bad-actor.services/pages/contact.html",
+            "https://api.bad-actor.services/docs"]
+        assert links["remote"] == ["https://www.google.com/"]
+
+        links = link_extractor.extract_links("https://www.bad-actor.services/", [html_data.LINKS], "not-a-codec")
+        assert len(links["local"]) == 3
+
+        lxml_links = link_extractor.extract_links("https://www.bad-actor.services/", chunks, tokenizer="lxml")
+        assert lxml_links == link_extractor.extract_links("https://www.bad-actor.services/", chunks)
+        assert link_extractor.extract_links("https://www.bad-actor.services/", [], tokenizer="lxml") == {
+            "local": [], "remote": []}
+
+# End File carpetbag/tests/test_link_extractor.py
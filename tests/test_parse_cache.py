@@ -0,0 +1,128 @@
+"""Tests Parse Cache
+
+"""
+import threading
+
+from carpetbag import CarpetBag
+from carpetbag.parse_cache import MISSING, ParseCache, content_hash
+from carpetbag.parse_response import ParseResponse
+from carpetbag.schema import Schema
+
+from .data import html_data
+from .data.response_data import HtmlResponse
+
+
+class TestParseCache(object):
+
+    def test___init__(self):
+        """
+        Tests that the ParseCache module init has correct default values.
+
+        """
+        cache = ParseCache()
+        assert cache.max_bytes == 67108864
+        assert not cache.path
+        assert len(cache) == 0
+        assert cache.size == 0
+
+    def test_content_hash(self):
+        """
+        Tests that content hashes are stable, and differ with the content.
+
+        """
+        assert content_hash(b"<html></html>") == content_hash(b"<html></html>")
+        assert content_hash(b"<html></html>") != content_hash(b"<html> </html>")
+        assert len(content_hash(b"")) == 32
+
+    def test_get_set(self):
+        """
+        Tests that results are cached as copies, None is a result, and the least recently used results are evicted to
+        stay under the byte budget.
+
+        """
+        cache = ParseCache(max_bytes=200)
+        assert cache.get("a") is MISSING
+        assert cache.set("none", None)
+        assert cache.get("none") is None
+
+        links = {"local": ["https://www.bad-actor.services/"], "remote": []}
+        cache.set("links", links)
+        cached = cache.get("links")
+        assert cached == links
+        cached["local"].append("https://www.bad-actor.services/about")
+        assert cache.get("links") == links
+
+        cache.set("big", "x" * 150)
+        assert cache.size <= 200
+        assert cache.get("none") is MISSING
+        assert cache.get("big") == "x" * 150
+
+        cache.set("too-big", "x" * 500)
+        assert cache.get("too-big") is MISSING
+        assert not cache.set("lock", threading.Lock())
+        assert cache.hits and cache.misses
+
+    def test_disk(self, tmp_path):
+        """
+        Tests that results on disk are shared between caches, and are kept when the memory cache is cleared.
+
+        """
+        path = str(tmp_path / "parse-cache")
+        ParseCache(path=path).set("title", "Carpet Bags")
+
+        cache = ParseCache(path=path)
+        assert cache.get("title") == "Carpet Bags"
+        assert len(cache) == 1
+        cache.clear()
+        assert len(cache) == 0
+        assert cache.get("title") == "Carpet Bags"
+
+    def test_parse_response(self):
+        """
+        Tests that ParseResponse extractors return cached results for identical content without parsing, and that
+        url dependent results are keyed by url.
+
+        """
+        cache = ParseCache()
+        first = ParseResponse(HtmlResponse("https://www.bad-actor.services/bags/1", html_data.HEAD), cache=cache)
+        assert first.get_title() == "Carpet Bags for Sale"
+        assert first.get_canonical() == "https://www.bad-actor.services/bags/"
+
+        second = ParseResponse(HtmlResponse("https://www.bad-actor.services/bags/2", html_data.HEAD), cache=cache)
+        assert second.content_hash == first.content_hash
+        assert second.get_title() == "Carpet Bags for Sale"
+        assert second._strained_trees == {}
+        assert second._tree is None
+        assert second.cache_key("get_title") == first.cache_key("get_title")
+        assert second.cache_key("get_canonical") != first.cache_key("get_canonical")
+
+        # Called with arguments, extractors skip the cache.
+        assert second.get_links("<a href='/'>Home</a>")["local"] == ["https://www.bad-actor.services/"]
+
+        schema = Schema({"description": "meta[name=Description]@content"})
+        assert second.extract(schema) == {"description": "Fine carpet bags."}
+        assert first.cache.get(first.cache_key(schema)) == {"description": "Fine carpet bags."}
+
+        second.content = "<title>Changed</title>"
+        assert second.content_hash != first.content_hash
+        assert second.get_title() == "Changed"
+
+    def test_carpetbag(self):
+        """
+        Tests that CarpetBag.parse() and CarpetBag.parse_many() use the parse cache.
+
+        """
+        bagger = CarpetBag()
+        assert bagger.use_parse_cache(max_bytes=1024 * 1024)
+        responses = [HtmlResponse("https://www.bad-actor.services/bags/%s" % index, html_data.HEAD) for index in [1, 2]]
+        assert bagger.parse(responses[0]).cache is bagger.parse_cache
+
+        results = bagger.parse_many(responses, processes=1)
+        hits = bagger.parse_cache.hits
+        assert bagger.parse_many(responses, processes=1) == results
+        assert bagger.parse_cache.hits == hits + 8
+
+        assert not bagger.use_parse_cache(False)
+        assert bagger.parse(responses[0]).cache is None
+
+# End File carpetbag/tests/test_parse_cache.py
@@ -0,0 +1,76 @@
+"""Tests Parse Pool
+
+"""
+import pickle
+
+from carpetbag import CarpetBag
+from carpetbag.parse_pool import ParsePool, RawResponse, parse_job
+
+from .data import html_data
+from .data.response_data import GoogleDotComResponse, HtmlResponse, StreamedResponse
+
+
+class TestParsePool(object):
+
+    def test_raw_response(self):
+        """
+        Tests that RawResponse keeps the raw bytes and headers, and falls back to the text for responses without bytes.
+
+        """
+        response = StreamedResponse(
+            "https://www.bad-actor.services/", "<title>Café</title>".encode("cp1252"),
+            {"content-type": "text/html; charset=windows-1252"})
+        raw = RawResponse.from_response(response)
+        assert raw.content == response.content
+        assert raw.headers["Content-Type"] == "text/html; charset=windows-1252"
+        assert raw.text == "<title>Café</title>"
+        assert pickle.loads(pickle.dumps(raw)).headers.get("CONTENT-TYPE") == "text/html; charset=windows-1252"
+
+        raw = RawResponse.from_response(GoogleDotComResponse())
+        assert raw.url == "https://www.google.com/"
+        assert "Here's a title" in raw.text
+
+    def test_parse_job(self):
+        """
+        Tests that a parse job returns plain data for each extractor, and the error for a bad extractor.
+
+        """
+        raw = RawResponse.from_response(HtmlResponse("https://www.bad-actor.services/bags/1", html_data.HEAD))
+        result = parse_job((raw, "html.parser", ["get_title", "get_canonical", "duckduckgo_results"]))
+        assert result == {
+            "url": "https://www.bad-actor.services/bags/1",
+            "title": "Carpet Bags for Sale",
+            "canonical": "https://www.bad-actor.services/bags/",
+            "duckduckgo_results": [],
+        }
+
+        result = parse_job((raw, "html.parser", ["get_title", "not_an_extractor"]))
+        assert result["title"] == "Carpet Bags for Sale"
+        assert result["error"].startswith("AttributeError")
+
+    def test_parse_many(self):
+        """
+        Tests that parse_many() gives the same results, in order, in worker processes as it does in process.
+
+        """
+        responses = [
+            HtmlResponse("https://www.bad-actor.services/bags/%s" % index, html_data.HEAD) for index in range(5)]
+        responses.append(HtmlResponse("https://www.bad-actor.services/", html_data.LINKS))
+
+        in_process = ParsePool(1).parse_many(responses)
+        assert [result["url"] for result in in_process] == [response.url for response in responses]
+        assert in_process[0]["meta"]["og:title"] == "Carpet Bags"
+        assert in_process[-1]["links"]["remote"] == ["https://www.google.com/"]
+
+        bagger = CarpetBag()
+        try:
+            assert bagger.parse_many(responses, processes=2) == in_process
+            pool = bagger.parse_pool
+            assert pool.executor
+            assert bagger.parse_many(responses[:2], processes=2) == in_process[:2]
+            assert bagger.parse_pool is pool
+        finally:
+            bagger.close()
+        assert bagger.parse_pool is None
+
+# End File carpetbag/tests/test_parse_pool.py
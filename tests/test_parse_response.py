@@ -1,9 +1,20 @@
 """Tests ParseResponse
 
 """
+import pytest
+
+from carpetbag import CarpetBag
+from carpetbag import errors
+from carpetbag import parse_backends
+from carpetbag.parse_pool import DEFAULT_EXTRACTORS
 from carpetbag.parse_response import ParseResponse
+from carpetbag.schema import Schema
+
+from benchmarks.bench_parse_backends import assert_multi_extractor
+from benchmarks.corpus import make_corpus
 
-from .data.response_data import GoogleDotComResponse
+from .data import html_data
+from .data.response_data import GoogleDotComResponse, HtmlResponse, StreamedResponse
 
 
 class TestParseResponse(object):
@@ -16,11 +27,219 @@ class TestParseResponse(object):
         r = GoogleDotComResponse()
         pr = ParseResponse(r)
         assert pr.response == r
+        assert pr._soup is None
         assert pr.content
 
+    def test_lazy_parsing(self):
+        """
+        Tests that the soup and domain are only built when used, and only built once.
+
+        """
+        r = GoogleDotComResponse()
+        pr = ParseResponse(r)
+        assert pr._soup is None
+        assert pr._domain is None
+
+        soup = pr.soup
+        assert soup is pr.soup
+        assert pr.domain == "com"
+        assert pr._domain == "com"
+
+        pr.content = "<html><head><title>New title</title></head></html>"
+        assert pr._soup is None
+        assert pr.get_title() == "New title"
+
+    def test_carpetbag_parse(self):
+        """
+        Tests that CarpetBag.parse() keeps the parsed response on the response, so it's only parsed once.
+
+        """
+        bagger = CarpetBag()
+        r = GoogleDotComResponse()
+        parsed = bagger.parse(r)
+        assert isinstance(parsed, ParseResponse)
+        assert r.parsed is parsed
+        assert bagger.parse(r) is parsed
+
+        bagger.last_response = r
+        assert bagger.parse() is parsed
+
     def test__get_title(self):
         r = GoogleDotComResponse()
         pr = ParseResponse(r)
         assert pr.get_title() == "Here's a title"
 
+    def test_parse_backends(self):
+        """
+        Tests that get_title(), get_links() and duckduckgo_results() give the same results on every parse backend.
+
+        """
+        for parser in ["html.parser", "lxml", "lxml-direct"]:
+            pr = ParseResponse(GoogleDotComResponse(), parser)
+            assert pr.parser.name == parser
+            assert pr.get_title() == "Here's a title"
+
+            pr = ParseResponse(HtmlResponse("https://www.bad-actor.services/", html_data.LINKS), parser)
+            links = pr.get_links()
+            assert links["local"] == [
+                "https://www.bad-actor.services/about",
+                "https://www.bad-actor.services/pages/contact.html",
+                "https://api.bad-actor.services/docs"]
+            assert links["remote"] == ["https://www.google.com/"]
+            assert pr.get_links(pr.tree)["remote"] == ["https://www.google.com/"]
+
+            pr = ParseResponse(HtmlResponse("https://duckduckgo.com/html/", html_data.DUCKDUCKGO_RESULTS), parser)
+            results = pr.duckduckgo_results()
+            assert len(results) == 2
+            assert results[0]["title"] == "Learn Python"
+            assert results[0]["description"] == "Free interactive Python tutorial."
+            assert results[1]["url"] == "http://docs.python.org/3/tutorial"
+            assert pr.soup.title.string == "learn python at DuckDuckGo"
+
+        with pytest.raises(errors.InvalidParserBackend):
+            ParseResponse(GoogleDotComResponse(), "regex")
+
+    def test_xhtml(self, monkeypatch):
+        """
+        Tests that an XHTML page with an XML encoding declaration parses the same on every parse backend, from raw
+        bytes or text.
+
+        """
+        for parser in ["html.parser", "lxml", "lxml-direct"]:
+            responses = [
+                StreamedResponse(
+                    "https://www.bad-actor.services/", html_data.XHTML.encode("iso-8859-1"),
+                    {"Content-Type": "application/xhtml+xml"}),
+                HtmlResponse("https://www.bad-actor.services/", html_data.XHTML),
+            ]
+            for response in responses:
+                pr = ParseResponse(response, parser)
+                assert pr.get_title() == "Carpet Bags Café"
+                assert pr.get_meta() == {"description": "Fine carpet bags."}
+
+        monkeypatch.setattr(parse_backends, "module_available", lambda name: False)
+        with pytest.raises(errors.ParserBackendUnavailable):
+            ParseResponse(GoogleDotComResponse(), "lxml-direct")
+        with pytest.raises(errors.InvalidParserBackend):
+            CarpetBag().use_parser_backend("lxml")
+        assert ParseResponse(GoogleDotComResponse()).get_title() == "Here's a title"
+
+    def test_use_parser_backend(self):
+        """
+        Tests that CarpetBag.parse() uses the selected parse backend, and re-parses when it's changed.
+
+        """
+        bagger = CarpetBag()
+        r = GoogleDotComResponse()
+        assert bagger.parse(r).parser.name == "html.parser"
+        assert bagger.use_parser_backend("lxml-direct") == "lxml-direct"
+        assert bagger.parse(r).parser.name == "lxml-direct"
+        assert bagger.parse(r) is r.parsed
+
+        with pytest.raises(errors.InvalidParserBackend):
+            bagger.use_parser_backend("regex")
+        assert bagger.parser_backend == "lxml-direct"
+
+    def test_get_links(self):
+        """
+        Tests that get_links() resolves, de-duplicates and sorts links without building a tree.
+
+        """
+        pr = ParseResponse(HtmlResponse("https://www.bad-actor.services/pages/links", html_data.LINKS))
+        links = pr.get_links()
+        assert pr._tree is None
+        assert len(links["local"]) == 3
+        assert "https://www.bad-actor.services/pages/contact.html" in links["local"]
+        assert links["remote"] == ["https://www.google.com/"]
+
+        links = pr.get_links('<a href="https://www.google.com/">Google</a><a href="/">Home</a>')
+        assert links["local"] == ["https://www.bad-actor.services/"]
+
+    def test_extractor_tree(self):
+        """
+        Tests that targeted extractors parse only the part of the document they need until the full tree is built.
+
+        """
+        for parser in ["html.parser", "lxml"]:
+            pr = ParseResponse(HtmlResponse("https://duckduckgo.com/html/", html_data.DUCKDUCKGO_RESULTS), parser)
+            assert len(pr.duckduckgo_results()) == 2
+            assert pr.get_title() == "learn python at DuckDuckGo"
+            assert pr._tree is None
+
+            strained = pr.extractor_tree("duckduckgo_results")
+            assert strained is pr._strained_trees["duckduckgo_results"]
+            assert not strained.find("title")
+            assert len(strained.find_all("div", {"class": "result"})) == 2
+            assert [tag.name for tag in pr.extractor_tree("get_title").find_all()] == ["title"]
+            assert len(pr.get_anchors()) == len(pr.tree.find_all("a"))
+
+            # Once the full tree is built it's used for everything.
+            assert pr.extractor_tree("get_title") is pr.tree
+
+            pr.content = "<title>New title</title>"
+            assert pr._strained_trees == {}
+            assert pr.get_title() == "New title"
+
+        pr = ParseResponse(HtmlResponse("https://duckduckgo.com/html/", html_data.DUCKDUCKGO_RESULTS), "lxml-direct")
+        assert pr.extractor_tree("get_title") is pr.tree
+        assert len(pr.get_anchors()) == len(pr.tree.findall(".//a"))
+
+    def test_prepare(self):
+        """
+        Tests that several targeted extractors share a single strained parse, which is faster than the full tree.
+
+        """
+        for parser in ["html.parser", "lxml"]:
+            pr = ParseResponse(HtmlResponse("https://www.bad-actor.services/bags/1", html_data.HEAD), parser)
+            pr.prepare(DEFAULT_EXTRACTORS)
+            assert pr._strained_trees["get_title"] is pr._strained_trees["get_meta"]
+            assert pr._strained_trees["get_title"] is pr._strained_trees["get_canonical"]
+            assert pr.get_title() == "Carpet Bags for Sale"
+            assert pr.get_meta() == {"description": "Fine carpet bags.", "og:title": "Carpet Bags"}
+            assert pr.get_canonical() == "https://www.bad-actor.services/bags/"
+            assert pr._tree is None
+
+            # A lone targeted extractor keeps its own strainer.
+            pr = ParseResponse(HtmlResponse("https://duckduckgo.com/html/", html_data.DUCKDUCKGO_RESULTS), parser)
+            pr.prepare(["get_title", "get_links"])
+            assert pr._strained_trees == {}
+
+            # A schema needs the full tree, so everything runs against it.
+            pr.prepare(["get_title", Schema({"title": "h2"})])
+            assert pr._tree is not None
+            assert pr.extractor_tree("get_title") is pr.tree
+
+        assert_multi_extractor(make_corpus(10), "html.parser", 2)
+
+    def test_get_meta_and_canonical(self):
+        """
+        Tests that get_meta() and get_canonical() give the same results on every parse backend.
+
+        """
+        for parser in ["html.parser", "lxml", "lxml-direct"]:
+            pr = ParseResponse(HtmlResponse("https://www.bad-actor.services/bags/1", html_data.HEAD), parser)
+            assert pr.get_meta() == {"description": "Fine carpet bags.", "og:title": "Carpet Bags"}
+            assert pr.get_canonical() == "https://www.bad-actor.services/bags/"
+
+            pr.content = "<title>No head tags</title>"
+            assert pr.get_meta() == {}
+            assert pr.get_canonical() is None
+
+    def test_carpetbag_peek(self, monkeypatch):
+        """
+        Tests that CarpetBag.peek() parses only the head of a page, and leaves the rest of it unread.
+
+        """
+        bagger = CarpetBag()
+        response = StreamedResponse("https://www.bad-actor.services/bags/1", html_data.HEAD.encode("utf-8"))
+        monkeypatch.setattr(bagger, "get", lambda url, payload={}: response)
+
+        parsed = bagger.peek("https://www.bad-actor.services/bags/1", chunk_size=256)
+        assert parsed is bagger.parse(response)
+        assert parsed.content.endswith("</head>")
+        assert parsed.get_title() == "Carpet Bags for Sale"
+        assert parsed.get_canonical() == "https://www.bad-actor.services/bags/"
+        assert response.closed
+        assert response.bytes_read < len(response.content)
+
 # End File carpetbag/tests/test_parse_response.py
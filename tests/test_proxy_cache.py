@@ -0,0 +1,118 @@
+"""Tests Proxy Cache
+
+"""
+import os
+import time
+
+from carpetbag import CarpetBag
+from carpetbag.proxy_cache import ProxyCache
+
+from .data.proxy_bag import proxies
+
+
+class TestProxyCache(object):
+
+    def test___init__(self, tmpdir):
+        """
+        Tests that the ProxyCache module init has correct default values.
+
+        """
+        cache = ProxyCache(str(tmpdir.join("proxies.json")), ttl=60)
+        assert cache.path == str(tmpdir.join("proxies.json"))
+        assert cache.ttl == 60
+        assert cache.pending_stats == {}
+
+        assert ProxyCache().path.endswith("carpetbag-proxies.json")
+
+    def test_get_set(self, tmpdir):
+        """
+        Tests that proxy lists are stored and read back by key, and go stale after the ttl.
+
+        """
+        cache = ProxyCache(str(tmpdir.join("proxies.json")), ttl=60)
+        cached, stale = cache.get("all")
+        assert cached is None
+        assert stale
+
+        cache.set("all", proxies)
+        cached, stale = cache.get("all")
+        assert cached == proxies
+        assert not stale
+        assert os.path.exists(cache.path)
+
+        # A second cache instance, like another process on the host, reads the same list.
+        other_cache = ProxyCache(cache.path, ttl=0)
+        time.sleep(0.01)
+        cached, stale = other_cache.get("all")
+        assert cached == proxies
+        assert stale
+
+    def test_record(self, tmpdir):
+        """
+        Tests that proxy health stats are batched in memory and flushed to disk.
+
+        """
+        cache = ProxyCache(str(tmpdir.join("proxies.json")))
+        cache.stats_flush_every = 3
+        address = proxies[0]["address"]
+        cache.record(address, True, 100)
+        cache.record(address, True, 300)
+        assert cache.pending_stats_count == 2
+        assert not os.path.exists(cache.path)
+
+        cache.record(address, False)
+        assert cache.pending_stats_count == 0
+        stats = ProxyCache(cache.path).stats(address)
+        assert stats["success"] == 2
+        assert stats["failure"] == 1
+        assert stats["avg_roundtrip"] == 200
+
+    def test_stats_pending(self, tmpdir):
+        """
+        Tests that reading stats doesn't lose the stats not yet flushed to disk.
+
+        """
+        cache = ProxyCache(str(tmpdir.join("proxies.json")))
+        address = proxies[0]["address"]
+        cache.record(address, True, 100)
+        cache.record(address, False)
+        assert cache.stats(address)["failure"] == 1
+        cache.rank(proxies)
+        assert cache.pending_stats_count == 2
+
+        cache.flush_stats()
+        stats = ProxyCache(cache.path).stats(address)
+        assert stats["success"] == 1
+        assert stats["failure"] == 1
+
+    def test_rank(self, tmpdir):
+        """
+        Tests that locally failing proxies are moved to the back of the proxy list.
+
+        """
+        cache = ProxyCache(str(tmpdir.join("proxies.json")))
+        cache.record(proxies[0]["address"], False)
+        cache.record(proxies[1]["address"], True, 50)
+        ranked = cache.rank(proxies)
+        assert len(ranked) == len(proxies)
+        assert ranked[-1] == proxies[0]
+        assert ranked[0] == proxies[1]
+
+    def test_get_public_proxies_cached(self, tmpdir):
+        """
+        Tests that CarpetBag.get_public_proxies() uses the proxy cache instead of making a remote request.
+
+        """
+        bagger = CarpetBag()
+        bagger.remote_service_api = "http://0.0.0.0:90/api"
+        assert bagger.use_proxy_cache(path=str(tmpdir.join("proxies.json")))
+        bagger.proxy_cache.set("all", proxies)
+
+        proxy_bag = bagger.get_public_proxies()
+        assert len(proxy_bag) == len(proxies)
+        assert bagger.proxy_bag == proxy_bag
+
+        assert not bagger.use_proxy_cache(False)
+        assert not bagger.proxy_cache
+
+# End File carpetbag/tests/test_proxy_cache.py
@@ -4,6 +4,7 @@
 from datetime import datetime
 import os
 import re
+import threading
 
 import requests
 import pytest
@@ -13,6 +14,8 @@ from carpetbag import CarpetBag
 from carpetbag import errors
 from carpetbag import carpet_tools as ct
 
+from .data.response_data import JsonResponse
+
 TOR_PROXY_CONTAINER = os.environ.get("TOR_PROXY_CONTAINER", "tor")
 # UNIT_TEST_URL = os.environ.get("BAD_ACTOR_URL", "https//bas.bitgel.com")
 UNIT_TEST_URL = "https://bas.bitgel.com/"
@@ -306,6 +309,77 @@ class TestPublic(object):
         assert isinstance(bagger.set_header("Test-Header", "Test Header Value"), dict)
         assert bagger.headers.get("Test-Header") == "Test Header Value"
 
+    def test_rest_get_pages(self, monkeypatch):
+        """
+        Tests that CarpetBag().rest_get_pages() fetches pages after the first concurrently, returning every response
+        and object in page order, and only fetching the pages needed for total.
+
+        """
+        requested = []
+
+        def fake_get(bagger, url, payload={}):
+            page = payload.get("page", 1)
+            requested.append(page)
+            if page == 7:
+                return JsonResponse(url, {"error": "Down"}, 500)
+            objects = [{"id": (page - 1) * 10 + number} for number in range(10)]
+            return JsonResponse(url, {"page": page, "total_pages": 9, "objects": objects})
+
+        monkeypatch.setattr(CarpetBag, "get", fake_get)
+        bagger = CarpetBag()
+        result = bagger.rest_get_pages("https://www.bad-actor.services/api/bags", {"q": "wool"}, total=35)
+        assert sorted(requested) == [1, 2, 3, 4]
+        assert [response.json()["page"] for response in result["responses"]] == [1, 2, 3, 4]
+        assert [item["id"] for item in result["data"]["objects"]] == list(range(40))
+
+        requested.clear()
+        result = bagger.rest_get_pages("https://www.bad-actor.services/api/bags", workers=3)
+        assert requested[0] == 1
+        assert len(result["responses"]) == 6
+        assert [item["id"] for item in result["data"]["objects"]] == list(range(60))
+
+        result = bagger.rest_get_pages("https://www.bad-actor.services/api/bags", total=25, stream=True)
+        assert [item["id"] for item in result["data"]["objects"]] == list(range(30))
+        assert all(response.bytes_read == len(response.content) for response in result["responses"][1:])
+
+    def test_rest_get_pages_window(self, monkeypatch):
+        """
+        Tests that CarpetBag().rest_get_pages() keeps at most workers * 2 pages in flight, reads each page in the
+        worker that fetched it, and stops submitting pages once one fails or raises.
+
+        """
+        requested = []
+        failures = {3: "error"}
+        main_thread = threading.current_thread().name
+
+        class ThreadJsonResponse(JsonResponse):
+
+            def json(self):
+                self.read_by = threading.current_thread().name
+                return super().json()
+
+        def fake_get(bagger, url, payload={}):
+            page = payload.get("page", 1)
+            requested.append(page)
+            if failures.get(page) == "error":
+                return JsonResponse(url, {"error": "Down"}, 500)
+            if failures.get(page) == "raise":
+                raise requests.exceptions.ReadTimeout("Slow page")
+            return ThreadJsonResponse(url, {"page": page, "total_pages": 50, "objects": [{"id": page}]})
+
+        monkeypatch.setattr(CarpetBag, "get", fake_get)
+        bagger = CarpetBag()
+        result = bagger.rest_get_pages("https://www.bad-actor.services/api/bags", workers=2)
+        assert [item["id"] for item in result["data"]["objects"]] == [1, 2]
+        assert max(requested) <= 3 + 2 * 2
+        assert result["responses"][1].read_by != main_thread
+
+        requested.clear()
+        failures[3] = "raise"
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            bagger.rest_get_pages("https://www.bad-actor.services/api/bags", workers=2)
+        assert max(requested) <= 3 + 2 * 2
+
     # def test_set_header_once(self):
     #     """
     #     Tests the CarpetBag().test_set_header_once() method to make sure it adds the headers to the CarpetBag.header
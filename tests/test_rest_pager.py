@@ -0,0 +1,207 @@
+"""Tests Rest Pager
+
+"""
+import threading
+import time
+
+import pytest
+
+from carpetbag import CarpetBag
+from carpetbag.rest_pager import RestPager, get_field
+
+from .data.response_data import JsonResponse
+
+API = "https://www.bad-actor.services/api/bags"
+
+
+def page_style_get(bagger, url, payload={}):
+    """
+    Serves 3 pages of 2 bags, by page number.
+
+    """
+    payload = payload or {}
+    page = payload.get("page", 1)
+    bagger.fake_requests.append((page, threading.current_thread().name))
+    objects = [{"id": (page - 1) * 2 + number} for number in range(2)]
+    return JsonResponse(url, {"page": page, "total_pages": 3, "objects": objects})
+
+
+def link_style_get(bagger, url, payload={}):
+    """
+    Serves 3 pages as a bare list, with a Link header to the next page.
+
+    """
+    page = int(url.rsplit("=", 1)[1]) if "=" in url else 1
+    bagger.fake_requests.append((page, threading.current_thread().name))
+    headers = {"Content-Type": "application/json"}
+    if page < 3:
+        headers["Link"] = '<%s?page=%s>; rel="next", <%s?page=3>; rel="last"' % ("/api/bags", page + 1, "/api/bags")
+    return JsonResponse(url, [{"id": page}], headers=headers)
+
+
+def cursor_style_get(bagger, url, payload={}):
+    """
+    Serves 3 pages, each with a cursor to the next.
+
+    """
+    cursor = (payload or {}).get("after", "")
+    bagger.fake_requests.append((cursor, threading.current_thread().name))
+    cursors = {"": "b", "b": "c", "c": None}
+    return JsonResponse(url, {"objects": [{"id": cursor or "a"}], "meta": {"next": cursors[cursor]}})
+
+
+class TestRestPager(object):
+
+    def test_page_style(self, monkeypatch):
+        """
+        Tests paging by page number, with each page after the first fetched in the background.
+
+        """
+        monkeypatch.setattr(CarpetBag, "get", page_style_get)
+        bagger = CarpetBag()
+        bagger.fake_requests = []
+
+        pages = bagger.iter_rest_pages(API, {"q": "wool"})
+        first = next(pages)
+        assert first.json()["page"] == 1
+        assert first.page_json["page"] == 1
+        assert [response.json()["page"] for response in pages] == [2, 3]
+        assert [page for page, _ in bagger.fake_requests] == [1, 2, 3]
+        assert bagger.fake_requests[0][1] == threading.current_thread().name
+        assert bagger.fake_requests[1][1] != threading.current_thread().name
+
+        bagger.fake_requests = []
+        assert [bag["id"] for bag in bagger.iter_rest_objects(API)] == [0, 1, 2, 3, 4, 5]
+
+    def test_link_style(self, monkeypatch):
+        """
+        Tests paging by Link header, with a body which is just a list.
+
+        """
+        monkeypatch.setattr(CarpetBag, "get", link_style_get)
+        bagger = CarpetBag()
+        bagger.fake_requests = []
+
+        pager = RestPager(bagger, API)
+        assert [bag["id"] for bag in pager.iter_objects()] == [1, 2, 3]
+        assert pager.style == "link"
+        assert pager.pages == 3
+
+    def test_cursor_style(self, monkeypatch):
+        """
+        Tests paging by a nested cursor field, and stopping at max_pages.
+
+        """
+        monkeypatch.setattr(CarpetBag, "get", cursor_style_get)
+        bagger = CarpetBag()
+        bagger.fake_requests = []
+
+        objects = bagger.iter_rest_objects(API, cursor_field="meta.next", cursor_param="after")
+        assert [bag["id"] for bag in objects] == ["a", "b", "c"]
+        assert [cursor for cursor, _ in bagger.fake_requests] == ["", "b", "c"]
+
+        bagger.fake_requests = []
+        pager = RestPager(bagger, API, style="cursor", cursor_field="meta.next", cursor_param="after", max_pages=2)
+        assert len(list(pager.iter_pages())) == 2
+        assert len(bagger.fake_requests) == 2
+
+        with pytest.raises(ValueError):
+            RestPager(bagger, API, style="offset")
+
+    def test_stream(self, monkeypatch):
+        """
+        Tests streaming each page's objects out of its body, with the next page worked out from the fields around
+        the objects.
+
+        """
+        monkeypatch.setattr(CarpetBag, "get", page_style_get)
+        bagger = CarpetBag()
+        bagger.fake_requests = []
+        assert [bag["id"] for bag in bagger.iter_rest_objects(API, stream=True)] == [0, 1, 2, 3, 4, 5]
+        assert [page for page, _ in bagger.fake_requests] == [1, 2, 3]
+
+        monkeypatch.setattr(CarpetBag, "get", cursor_style_get)
+        bagger.fake_requests = []
+        objects = bagger.iter_rest_objects(API, cursor_field="meta.next", cursor_param="after", stream=True)
+        assert [bag["id"] for bag in objects] == ["a", "b", "c"]
+
+        monkeypatch.setattr(CarpetBag, "get", link_style_get)
+        bagger.fake_requests = []
+        pager = RestPager(bagger, API, max_pages=2)
+        assert [bag["id"] for bag in pager.iter_objects(stream=True)] == [1, 2]
+        assert pager.style == "link"
+
+    def test_prefetch(self, monkeypatch):
+        """
+        Tests that the page fetched ahead has its body read in the background, and is closed if it's never taken.
+
+        """
+        class ReadRecordingResponse(JsonResponse):
+
+            def __init__(self, url, data):
+                super().__init__(url, data)
+                self.read_by = None
+
+            @property
+            def content(self):
+                self.read_by = threading.current_thread().name
+                return self._content
+
+            @content.setter
+            def content(self, value):
+                self._content = value
+
+        responses = []
+        fetched_three = threading.Event()
+
+        def recording_get(bagger, url, payload={}):
+            response = page_style_get(bagger, url, payload)
+            responses.append(ReadRecordingResponse(url, response.json()))
+            if len(responses) == 3:
+                fetched_three.set()
+            return responses[-1]
+
+        monkeypatch.setattr(CarpetBag, "get", recording_get)
+        bagger = CarpetBag()
+        bagger.fake_requests = []
+
+        pages = bagger.iter_rest_pages(API)
+        assert next(pages) is responses[0]
+        assert next(pages) is responses[1]
+        assert responses[1].read_by not in [None, threading.current_thread().name]
+        assert not responses[1].closed
+
+        # The page fetched ahead is closed as soon as its fetch finishes.
+        assert fetched_three.wait(5)
+        pages.close()
+        for _ in range(100):
+            if responses[2].closed:
+                break
+            time.sleep(0.01)
+        assert responses[2].closed
+
+    def test_stop_on_error(self, monkeypatch):
+        """
+        Tests that paging stops at a page which errors.
+
+        """
+        def failing_get(bagger, url, payload={}):
+            if (payload or {}).get("page") == 2:
+                return JsonResponse(url, {"error": "Down"}, 503)
+            return page_style_get(bagger, url, payload)
+
+        monkeypatch.setattr(CarpetBag, "get", failing_get)
+        bagger = CarpetBag()
+        bagger.fake_requests = []
+        assert [bag["id"] for bag in bagger.iter_rest_objects(API)] == [0, 1]
+
+    def test_get_field(self):
+        """
+        Tests getting nested body fields.
+
+        """
+        assert get_field({"meta": {"next": "abc"}}, "meta.next") == "abc"
+        assert get_field({"meta": None}, "meta.next") is None
+        assert get_field({"next_cursor": 0}, "next_cursor") == 0
+
+# End File carpetbag/tests/test_rest_pager.py
@@ -0,0 +1,146 @@
+"""Tests Robots
+
+"""
+from datetime import datetime
+
+import pytest
+
+from carpetbag import CarpetBag
+from carpetbag import errors
+from carpetbag.crawler import Crawler
+from carpetbag.robots import RobotsCache, RobotsRules, robots_url
+
+from .test_crawler import fake_get
+
+ROBOTS = """# Robots for bad-actor.services
+User-agent: *
+Disallow: /private/
+Crawl-delay: 10
+
+User-agent: CarpetBag
+User-agent: OtherBot
+Disallow: /*.gif$
+Disallow: /search
+Allow: /search/help
+Disallow: /one/deep  # Too deep.
+Crawl-delay: 0.5
+
+Sitemap: https://www.bad-actor.services/sitemap.xml
+"""
+
+
+class TestRobots(object):
+
+    def test_robots_rules(self):
+        """
+        Tests that the group for our user agent is used, with the longest matching rule winning.
+
+        """
+        rules = RobotsRules(ROBOTS, "CarpetBag v0.0.4d01")
+        assert rules.user_agent == "carpetbag"
+        assert rules.crawl_delay == 0.5
+        assert rules.sitemaps == ["https://www.bad-actor.services/sitemap.xml"]
+        assert not rules.allowed("https://www.bad-actor.services/bag.gif")
+        assert rules.allowed("https://www.bad-actor.services/bag.gif?size=large")
+        assert not rules.allowed("/search?q=carpet")
+        assert rules.allowed("/search/help")
+        assert rules.allowed("/private/secret")
+        assert rules.allowed("")
+
+        rules = RobotsRules(ROBOTS, "Mozilla/5.0 (X11; Linux x86_64)")
+        assert rules.crawl_delay == 10
+        assert not rules.allowed("/private/secret")
+        assert rules.allowed("/bag.gif")
+
+        assert RobotsRules("User-agent: *\nDisallow:\n").allowed("/anything")
+        assert RobotsRules("Disallow: /\n").allowed("/anything")
+        tie = RobotsRules("User-agent: *\nDisallow: /page\nAllow: /page\n")
+        assert tie.allowed("/page")
+        assert not RobotsRules(disallow_all=True).allowed("/")
+        assert RobotsRules(allow_all=True).allowed("/private/")
+
+    def test_robots_cache(self, monkeypatch):
+        """
+        Tests that a host's robots.txt is fetched once per ttl, and how missing and unreachable robots.txt files are
+        treated.
+
+        """
+        fetched = []
+        responses = {
+            "https://www.bad-actor.services/robots.txt": (200, ROBOTS),
+            "https://api.bad-actor.services/robots.txt": (404, "Not found"),
+            "https://down.bad-actor.services/robots.txt": (503, "Down"),
+        }
+
+        def fetch(url):
+            fetched.append(url)
+            if url not in responses:
+                raise ConnectionError(url)
+            return responses[url]
+
+        cache = RobotsCache(fetch, ttl=60, error_ttl=5)
+        assert cache.crawl_delay("https://www.bad-actor.services/") is None
+        assert not cache.allowed("https://www.bad-actor.services/search")
+        assert cache.allowed("https://www.bad-actor.services/one")
+        assert cache.crawl_delay("https://WWW.bad-actor.services/two") == 0.5
+        assert fetched == ["https://www.bad-actor.services/robots.txt"]
+
+        assert cache.allowed("https://api.bad-actor.services/search")
+        assert not cache.allowed("https://down.bad-actor.services/")
+        assert not cache.allowed("https://missing.bad-actor.services/")
+        assert len(cache) == 4
+
+        now = datetime.now().timestamp()
+        monkeypatch.setattr("carpetbag.robots.time.time", lambda: now + 30)
+        cache.allowed("https://down.bad-actor.services/")
+        cache.allowed("https://www.bad-actor.services/")
+        assert fetched.count("https://down.bad-actor.services/robots.txt") == 2
+        assert fetched.count("https://www.bad-actor.services/robots.txt") == 1
+
+        assert robots_url("HTTPS://www.bad-actor.services:8080/some/thing?q=1") == \
+            "https://www.bad-actor.services:8080/robots.txt"
+
+    def test_use_robots(self, monkeypatch):
+        """
+        Tests that disallowed urls fail before a request goes out, and Crawl-delay is used for the wait between
+        requests.
+
+        """
+        bagger = CarpetBag()
+        monkeypatch.setattr(bagger, "_fetch_robots", lambda url: (200, ROBOTS))
+        assert bagger.use_robots()
+        with pytest.raises(errors.DisallowedByRobots):
+            bagger.get("https://www.bad-actor.services/search?q=carpet")
+        assert bagger.manifest == []
+        assert bagger._robots_check("POST", "https://www.bad-actor.services/search")
+        assert bagger._robots_check("GET", "https://www.bad-actor.services/search/help")
+
+        sleeps = []
+        monkeypatch.setattr("carpetbag.base_carpetbag.time.sleep", sleeps.append)
+        bagger.last_request_time = datetime.now()
+        bagger._handle_sleep("https://www.bad-actor.services/one")
+        assert len(sleeps) == 1 and 0 < sleeps[0] <= 0.5
+
+        assert not bagger.use_robots(False)
+        assert bagger.robots_cache is None
+        assert bagger._robots_check("GET", "https://www.bad-actor.services/search")
+
+    def test_crawl_robots(self, monkeypatch):
+        """
+        Tests that a crawl skips links disallowed by robots.txt and takes each host's Crawl-delay.
+
+        """
+        monkeypatch.setattr(CarpetBag, "get", fake_get)
+        bagger = CarpetBag()
+        bagger.fake_requests = []
+        bagger.use_robots(cache=RobotsCache(lambda url: (200, ROBOTS)))
+
+        crawler = Crawler(bagger, ["https://www.bad-actor.services/"], max_depth=2, workers=1, delay=0)
+        crawler.frontier.set_delay = lambda host, delay: crawler.frontier.delays.update({host: delay / 10})
+        fetched = sorted(page["url"] for page in crawler.crawl())
+        assert "https://www.bad-actor.services/bag.gif" not in fetched
+        assert "https://www.bad-actor.services/one/deep" not in fetched
+        assert "https://www.bad-actor.services/two" in fetched
+        assert crawler.frontier.delays == {"www.bad-actor.services": 0.05, "api.bad-actor.services": 0.05}
+
+# End File carpetbag/tests/test_robots.py
@@ -0,0 +1,79 @@
+"""Tests Schema
+
+"""
+import pickle
+
+from carpetbag.parse_pool import ParsePool
+from carpetbag.parse_response import ParseResponse
+from carpetbag.schema import Field, Schema
+
+from .data import html_data
+from .data.response_data import HtmlResponse
+
+DUCKDUCKGO = Schema({
+    "title": "title",
+    "results": Field("div.result", many=True, fields={
+        "title": "h2",
+        "url": "a.result__url@href",
+        "classes": "@class",
+        "missing": Field("span.missing", default=""),
+    }),
+}, name="duckduckgo")
+
+
+class TestSchema(object):
+
+    def test_field_from_spec(self):
+        """
+        Tests the Field shorthand strings.
+
+        """
+        field = Field.from_spec("a.result__url@href")
+        assert field.selector == "a.result__url"
+        assert field.attr == "href"
+        assert field.compiled
+
+        field = Field.from_spec("@class")
+        assert field.selector is None
+        assert field.attr == "class"
+        assert field.compiled is None
+
+        field = Field("h2")
+        assert Field.from_spec(field) is field
+
+    def test_extract(self):
+        """
+        Tests that a schema extracts text, attributes, lists and nested fields, as dicts or tuples, on every parse
+        backend.
+
+        """
+        for parser in ["html.parser", "lxml", "lxml-direct"]:
+            pr = ParseResponse(HtmlResponse("https://duckduckgo.com/html/", html_data.DUCKDUCKGO_RESULTS), parser)
+            extracted = pr.extract(DUCKDUCKGO)
+            assert extracted["title"] == "learn python at DuckDuckGo"
+            assert len(extracted["results"]) == 2
+            assert extracted["results"][0] == {
+                "title": "Learn Python",
+                "url": "https://www.learnpython.org/",
+                "classes": "result results_links web-result",
+                "missing": "",
+            }
+
+        schema = Schema({"title": "h2", "url": "a.result__url@href", "missing": "span.missing"}, as_tuple=True)
+        results = Field("div.result", many=True, fields=schema.fields)
+        soup = ParseResponse(HtmlResponse("https://duckduckgo.com/html/", html_data.DUCKDUCKGO_RESULTS)).soup
+        assert results.extract(soup, as_tuple=True)[1] == ("Python Docs", "https://docs.python.org/", None)
+
+    def test_parse_many(self):
+        """
+        Tests that compiled schemas pickle, and run in parse_many().
+
+        """
+        assert pickle.loads(pickle.dumps(DUCKDUCKGO)).fields["results"].fields["url"].compiled
+
+        responses = [HtmlResponse("https://duckduckgo.com/html/", html_data.DUCKDUCKGO_RESULTS)] * 2
+        results = ParsePool(2).parse_many(responses, extractors=["get_title", DUCKDUCKGO])
+        assert results[1]["title"] == "learn python at DuckDuckGo"
+        assert results[1]["duckduckgo"]["results"][1]["url"] == "https://docs.python.org/"
+
+# End File carpetbag/tests/test_schema.py
@@ -0,0 +1,62 @@
+"""Tests Session Pool
+
+"""
+import requests
+
+from carpetbag.session_pool import SessionPool
+
+
+class TestSessionPool(object):
+
+    def test___init__(self):
+        """
+        Tests that the SessionPool module init has correct default values.
+
+        """
+        pool = SessionPool()
+        assert pool.max_pools == 32
+        assert len(pool) == 0
+        assert str(pool) == "<SessionPool 0/32>"
+
+    def test_get(self):
+        """
+        Tests that each proxy gets its own session, which is reused on repeat requests.
+
+        """
+        pool = SessionPool()
+        direct = pool.get()
+        proxy_1 = pool.get({"https": "https://103.92.154.98:44863"})
+        assert isinstance(direct, requests.Session)
+        assert direct is pool.get(None)
+        assert proxy_1 is pool.get({"https": "https://103.92.154.98:44863"})
+        assert proxy_1 is not direct
+        assert len(pool) == 2
+
+    def test_get_lru(self):
+        """
+        Tests that the least recently used session is closed when the pool is over its cap.
+
+        """
+        pool = SessionPool(max_pools=2)
+        proxy_1 = pool.get({"http": "http://202.162.68.78:80"})
+        pool.get({"https": "https://2.92.244.193:57877"})
+        pool.get({"http": "http://202.162.68.78:80"})
+        pool.get({"https": "https://124.41.211.82:45024"})
+        assert len(pool) == 2
+        assert proxy_1 is pool.get({"http": "http://202.162.68.78:80"})
+        assert len(pool) == 2
+
+    def test_discard(self):
+        """
+        Tests that a bad proxy's session can be thrown out.
+
+        """
+        pool = SessionPool()
+        proxy_1 = pool.get({"http": "http://202.162.68.78:80"})
+        assert pool.discard({"http": "http://202.162.68.78:80"})
+        assert not pool.discard({"http": "http://202.162.68.78:80"})
+        assert proxy_1 is not pool.get({"http": "http://202.162.68.78:80"})
+        pool.close()
+        assert len(pool) == 0
+
+# End File carpetbag/tests/test_session_pool.py
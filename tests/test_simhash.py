@@ -0,0 +1,155 @@
+"""Tests SimHash
+
+"""
+import io
+import random
+
+import requests
+
+from carpetbag import CarpetBag
+from carpetbag import simhash
+from carpetbag.parse_response import ParseResponse
+from carpetbag.simhash import SimHashIndex
+
+from .data import html_data
+from .data.response_data import HtmlResponse
+
+ARTICLE = " ".join(
+    "Carpet bag number %s is made from the finest wool and sold in every town." % index for index in range(80))
+
+
+def raw_response(url, content, content_type):
+    """
+    Makes a Requests response whose body is read from a raw stream, like a streamed GET.
+
+    """
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response.headers["Content-Type"] = content_type
+    response.raw = io.BytesIO(content)
+
+    return response
+
+
+class TestSimHash(object):
+
+    def test_hamming_distance(self):
+        """
+        Tests the bit difference count between fingerprints.
+
+        """
+        assert simhash.hamming_distance(0b1011, 0b1011) == 0
+        assert simhash.hamming_distance(0b1011, 0b0010) == 2
+        assert simhash.hamming_distance(0, (1 << 64) - 1) == 64
+
+    def test_shingles(self):
+        """
+        Tests that text is split into unique, lowercased word shingles.
+
+        """
+        assert simhash.shingles("One two three four. one TWO three") == set([
+            "one two three", "two three four", "three four one", "four one two"])
+        assert simhash.shingles("Just two") == set(["just two"])
+        assert simhash.shingles(" ... ") == set()
+        assert simhash.html_text("<p>Hi</p><script>var a = 1;</script><!-- b --><style>p {}</style>").split() == ["Hi"]
+
+    def test_fingerprint(self):
+        """
+        Tests that small edits give near fingerprints, and different pages give far ones.
+
+        """
+        page = "<html><body><p>%s</p><div>Updated 10:45</div></body></html>" % ARTICLE
+        edited = page.replace("Updated 10:45", "Updated 11:02, buy our new bags")
+        assert simhash.fingerprint_html(page) == simhash.fingerprint_html(page)
+        assert simhash.hamming_distance(simhash.fingerprint_html(page), simhash.fingerprint_html(edited)) <= 3
+        assert simhash.hamming_distance(
+            simhash.fingerprint_html(page), simhash.fingerprint_html(html_data.DUCKDUCKGO_RESULTS)) > 3
+        assert simhash.fingerprint("") == 0
+
+    def test_simhash_index(self):
+        """
+        Tests that the index finds the closest fingerprint within max_distance bits, and nothing further away.
+
+        """
+        index = SimHashIndex(3)
+        assert index.bands == [(0, 0xffff), (16, 0xffff), (32, 0xffff), (48, 0xffff)]
+        rand = random.Random(40)
+        for number in range(2000):
+            index.add(rand.getrandbits(64), "noise-%s" % number)
+
+        original = rand.getrandbits(64)
+        index.add(original, "original")
+        assert len(index) == 2001
+        assert index.find(original) == ("original", 0)
+
+        # Flip a bit in three different bands.
+        assert index.find(original ^ (1 << 2) ^ (1 << 20) ^ (1 << 40)) == ("original", 3)
+        assert index.find(original ^ (1 << 2) ^ (1 << 20) ^ (1 << 40) ^ (1 << 60)) is None
+
+        assert SimHashIndex(4).bands[-1] == (48, 0xffff)
+
+    def test__fingerprint_response(self):
+        """
+        Tests that successful GET html responses are fingerprinted when their content is first read, with near
+        duplicates recorded on the response and manifest.
+
+        """
+        bagger = CarpetBag()
+        page = "<p>%s</p><div>Updated 10:45</div>" % ARTICLE
+        response = raw_response("https://www.bad-actor.services/1", page.encode("utf-8"), "text/html")
+        assert not bagger._fingerprint_response("GET", response)
+
+        assert bagger.use_simhash()
+        bagger._start_request_manifest("GET", response.url)
+        assert bagger._fingerprint_response("GET", response)
+        assert not response.raw.tell()
+        assert "simhash" not in bagger.manifest[0]
+        assert response.text == page
+        assert response.simhash == simhash.fingerprint_html(page)
+        assert response.near_duplicate is None
+        assert bagger.manifest[0]["simhash"] == response.simhash
+
+        edited = raw_response(
+            "https://www.bad-actor.services/2", page.replace("10:45", "11:02").encode("utf-8"),
+            "text/html; charset=utf-8")
+        bagger._start_request_manifest("GET", edited.url)
+        bagger._fingerprint_response("GET", edited)
+        bagger._start_request_manifest("GET", "https://www.bad-actor.services/3")
+        assert edited.near_duplicate == "https://www.bad-actor.services/1"
+        assert bagger.manifest[1]["near_duplicate"] == "https://www.bad-actor.services/1"
+        assert "near_duplicate" not in bagger.manifest[0]
+
+        # A response streamed with iter_content() isn't read again for its fingerprint.
+        streamed = raw_response("https://www.bad-actor.services/4", page.encode("utf-8"), "text/html")
+        bagger._fingerprint_response("GET", streamed)
+        assert b"".join(streamed.iter_content(16)) == page.encode("utf-8")
+        assert streamed.simhash is None
+
+        image = raw_response("https://www.bad-actor.services/bag.gif", b"GIF89a", "image/gif")
+        assert not bagger._fingerprint_response("GET", image)
+        assert not bagger._fingerprint_response("POST", response)
+        assert len(bagger.simhash_index) == 2
+
+        assert not bagger.use_simhash(False)
+        assert bagger.simhash_index is None
+
+    def test_use_simhash(self):
+        """
+        Tests that use_simhash() keeps an index it's given, even an empty one.
+
+        """
+        bagger = CarpetBag()
+        index = SimHashIndex(3)
+        assert bagger.use_simhash(index=index)
+        assert bagger.simhash_index is index
+
+    def test_get_simhash(self):
+        """
+        Tests that ParseResponse.get_simhash() fingerprints the page's text.
+
+        """
+        pr = ParseResponse(HtmlResponse("https://duckduckgo.com/html/", html_data.DUCKDUCKGO_RESULTS))
+        assert pr.get_simhash() == simhash.fingerprint_html(html_data.DUCKDUCKGO_RESULTS)
+
+# End File carpetbag/tests/test_simhash.py
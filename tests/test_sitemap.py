@@ -0,0 +1,173 @@
+"""Tests Sitemap
+
+"""
+import gzip
+import threading
+
+import arrow
+
+from carpetbag import CarpetBag
+from carpetbag import sitemap
+from carpetbag.robots import RobotsCache
+
+from .data.response_data import StreamedResponse
+
+URLSET = """<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+%s
+</urlset>"""
+
+SITEMAP_INDEX = """<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://www.bad-actor.services/sitemap-bags.xml.gz</loc><lastmod>2024-03-01</lastmod></sitemap>
+  <sitemap><loc>https://www.bad-actor.services/sitemap-old.xml</loc><lastmod>2019-01-01</lastmod></sitemap>
+  <sitemap><loc>https://www.bad-actor.services/sitemap-missing.xml</loc></sitemap>
+  <sitemap><loc>https://www.bad-actor.services/sitemap-bags.xml.gz</loc></sitemap>
+</sitemapindex>"""
+
+
+def make_urlset(locs):
+    """
+    Makes a sitemap of urls, each with a lastmod.
+
+    """
+    return URLSET % "\n".join(
+        "<url><loc>%s</loc><lastmod>%s</lastmod><priority>0.5</priority></url>" % loc for loc in locs)
+
+
+SITE = {
+    "https://www.bad-actor.services/sitemap_index.xml": SITEMAP_INDEX.encode("utf-8"),
+    "https://www.bad-actor.services/sitemap-bags.xml.gz": gzip.compress(make_urlset(
+        [("https://www.bad-actor.services/bag/%s" % number, "2024-02-%02d" % (number % 28 + 1))
+         for number in range(500)]).encode("utf-8")),
+    "https://www.bad-actor.services/sitemap-old.xml": make_urlset(
+        [("https://www.bad-actor.services/old", "2019-01-01T10:00:00+00:00")]).encode("utf-8"),
+}
+
+
+def fake_get(bagger, url, payload={}):
+    """
+    Serves the sitemaps out of SITE, with anything else a 404.
+
+    """
+    bagger.fake_requests.append((url, threading.current_thread().name))
+    response = StreamedResponse(url, SITE.get(url, b"Not found"), {"Content-Type": "application/xml"})
+    if url not in SITE:
+        response.status_code = 404
+    return response
+
+
+class TestSitemap(object):
+
+    def test_iter_entries(self):
+        """
+        Tests that sitemap entries are read incrementally, from plain or gzipped chunks.
+
+        """
+        body = make_urlset([
+            ("https://www.bad-actor.services/1", "2024-01-01"), ("https://www.bad-actor.services/2", "")])
+        body = body.replace(">https://www.bad-actor.services/1<", ">\n  https://www.bad-actor.services/1\n<")
+        chunks = [body[index:index + 7].encode("utf-8") for index in range(0, len(body), 7)]
+        assert list(sitemap.iter_entries(chunks)) == [
+            ("url", "https://www.bad-actor.services/1", "2024-01-01"),
+            ("url", "https://www.bad-actor.services/2", None),
+        ]
+
+        compressed = gzip.compress(SITEMAP_INDEX.encode("utf-8"))
+        entries = list(sitemap.iter_entries(compressed[index:index + 10] for index in range(0, len(compressed), 10)))
+        assert len(entries) == 4
+        assert entries[0] == ("sitemap", "https://www.bad-actor.services/sitemap-bags.xml.gz", "2024-03-01")
+
+    def test_iter_entries_memory(self):
+        """
+        Tests that read entries are dropped from the parsed tree, so memory doesn't grow with the sitemap.
+
+        """
+        body = make_urlset([("https://www.bad-actor.services/%s" % number, "2024-01-01") for number in range(100)])
+        entries = sitemap.iter_entries([body.encode("utf-8")[:4000], body.encode("utf-8")[4000:]])
+        next(entries)
+        assert len(entries.gi_frame.f_locals["root"]) == 0
+        assert len(list(entries)) == 99
+
+    def test_modified_since(self):
+        """
+        Tests lastmod comparisons, treating a missing or unreadable lastmod as modified.
+
+        """
+        since = arrow.get("2024-01-01")
+        assert sitemap.modified_since("2024-01-02", since)
+        assert sitemap.modified_since("2024-01-01T00:00:00+00:00", since)
+        assert not sitemap.modified_since("2023-12-31T23:00:00Z", since)
+        assert sitemap.modified_since(None, since)
+        assert sitemap.modified_since("last tuesday", since)
+        assert sitemap.modified_since("2019-01-01", None)
+
+    def test_iter_sitemap(self, monkeypatch):
+        """
+        Tests following a sitemap index, across worker threads, skipping sitemaps and urls older than since.
+
+        """
+        monkeypatch.setattr(CarpetBag, "get", fake_get)
+        bagger = CarpetBag()
+        bagger.fake_requests = []
+
+        entries = list(bagger.iter_sitemap("https://www.bad-actor.services/sitemap_index.xml", workers=3))
+        locs = set(entry["loc"] for entry in entries)
+        assert len(entries) == 501
+        assert "https://www.bad-actor.services/old" in locs
+        assert entries[-1]["sitemap"] in SITE
+        fetched = sorted(url for url, _ in bagger.fake_requests)
+        assert fetched == [
+            "https://www.bad-actor.services/sitemap-bags.xml.gz",
+            "https://www.bad-actor.services/sitemap-missing.xml",
+            "https://www.bad-actor.services/sitemap-old.xml",
+            "https://www.bad-actor.services/sitemap_index.xml",
+        ]
+
+        bagger.fake_requests = []
+        entries = list(bagger.iter_sitemap("https://www.bad-actor.services/sitemap_index.xml", since="2024-02-20"))
+        assert len(entries) == 158
+        assert all(entry["lastmod"] >= "2024-02-20" for entry in entries)
+        assert "https://www.bad-actor.services/sitemap-old.xml" not in [url for url, _ in bagger.fake_requests]
+
+        entries = bagger.iter_sitemap("https://www.bad-actor.services/sitemap_index.xml", max_depth=0)
+        assert list(entries) == []
+
+    def test_iter_sitemap_discover(self, monkeypatch):
+        """
+        Tests that a site url has its sitemaps found from robots.txt, or falls back to /sitemap.xml.
+
+        """
+        monkeypatch.setattr(CarpetBag, "get", fake_get)
+        bagger = CarpetBag()
+        bagger.fake_requests = []
+        robots = "User-agent: *\nDisallow:\nSitemap: https://www.bad-actor.services/sitemap-old.xml\n"
+        bagger.use_robots(cache=RobotsCache(lambda url: (200, robots)))
+        entries = list(bagger.iter_sitemap("www.bad-actor.services"))
+        assert [entry["loc"] for entry in entries] == ["https://www.bad-actor.services/old"]
+
+        bagger.use_robots(False)
+        monkeypatch.setattr(bagger, "_fetch_robots", lambda url: (404, ""))
+        reader = sitemap.SitemapReader(bagger)
+        assert reader.discover("https://www.bad-actor.services/about") == [
+            "https://www.bad-actor.services/sitemap.xml"]
+
+    def test_iter_sitemap_stop(self, monkeypatch):
+        """
+        Tests that the workers stop when the consumer stops reading early.
+
+        """
+        monkeypatch.setattr(CarpetBag, "get", fake_get)
+        bagger = CarpetBag()
+        bagger.fake_requests = []
+        reader = sitemap.SitemapReader(bagger, workers=2, queue_size=5)
+        entries = reader.iter_urls("https://www.bad-actor.services/sitemap-bags.xml.gz")
+        assert len([next(entries) for _ in range(3)]) == 3
+        entries.close()
+
+        for thread in threading.enumerate():
+            if thread.name.startswith("carpetbag-sitemap-"):
+                thread.join(2)
+                assert not thread.is_alive()
+
+# End File carpetbag/tests/test_sitemap.py
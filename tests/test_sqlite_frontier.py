@@ -0,0 +1,206 @@
+"""Tests SQLite Frontier
+
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from carpetbag import CarpetBag
+from carpetbag.crawler import Crawler
+from carpetbag.sqlite_frontier import SqliteFrontier
+
+from .test_crawler import fake_get
+
+
+class TestSqliteFrontier(object):
+
+    def test_frontier(self, tmpdir):
+        """
+        Tests that the frontier de-duplicates urls and hands out hosts round robin, one url per host at a time.
+
+        """
+        frontier = SqliteFrontier(os.path.join(str(tmpdir), "crawl", "frontier.db"))
+        assert frontier.connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert frontier.add("https://one.bad-actor.services/1")
+        assert frontier.add("https://one.bad-actor.services/2")
+        assert frontier.add("https://two.bad-actor.services/1")
+        assert not frontier.add("https://ONE.bad-actor.services/1#top")
+        assert len(frontier.buffer) == 3
+        assert len(frontier) == 3
+        assert frontier.buffer == []
+        assert not frontier.add("https://one.bad-actor.services/2")
+
+        assert frontier.pop(0) == ("https://one.bad-actor.services/1", 0)
+        assert frontier.pop(0) == ("https://two.bad-actor.services/1", 0)
+        # one.bad-actor.services is still being fetched.
+        assert frontier.pop(0) is None
+        assert not frontier.idle()
+
+        frontier.done("https://one.bad-actor.services/1")
+        assert frontier.pop(0) == ("https://one.bad-actor.services/2", 0)
+        frontier.done("https://one.bad-actor.services/2")
+        frontier.done("https://two.bad-actor.services/1")
+        assert frontier.idle()
+        assert frontier.pop() is None
+
+        assert not frontier.add("https://one.bad-actor.services/1")
+        assert frontier.idle()
+        frontier.close()
+
+    def test_frontier_delay(self, tmpdir):
+        """
+        Tests that a host isn't handed out again until its politeness delay has passed.
+
+        """
+        frontier = SqliteFrontier(os.path.join(str(tmpdir), "frontier.db"), delay=0.3, poll_interval=0.05)
+        frontier.set_delay("Fast.bad-actor.services", 0)
+        for url in ["https://slow.bad-actor.services/1", "https://slow.bad-actor.services/2",
+                    "https://fast.bad-actor.services/1", "https://fast.bad-actor.services/2"]:
+            frontier.add(url, 1)
+
+        assert frontier.pop(0)[0] == "https://slow.bad-actor.services/1"
+        assert frontier.pop(0)[0] == "https://fast.bad-actor.services/1"
+        frontier.done("https://slow.bad-actor.services/1")
+        frontier.done("https://fast.bad-actor.services/1")
+
+        assert frontier.pop(0) == ("https://fast.bad-actor.services/2", 1)
+        assert frontier.pop(0) is None
+        start = time.time()
+        assert frontier.pop(1)[0] == "https://slow.bad-actor.services/2"
+        assert time.time() - start >= 0.1
+        frontier.close()
+
+    def test_resume(self, tmpdir):
+        """
+        Tests that a reopened frontier carries on where it left off, requeueing urls whose fetch never finished once
+        their lease runs out, and that two frontiers on one database share the crawl.
+
+        """
+        path = os.path.join(str(tmpdir), "frontier.db")
+        frontier = SqliteFrontier(path, lease=0.2)
+        for number in range(3):
+            frontier.add("https://www.bad-actor.services/%s" % number, number)
+        assert frontier.pop(0) == ("https://www.bad-actor.services/0", 0)
+        frontier.done("https://www.bad-actor.services/0")
+        assert frontier.pop(0) == ("https://www.bad-actor.services/1", 1)
+        # Crash, without calling done().
+        frontier.connection.close()
+
+        first = SqliteFrontier(path, lease=0.2, poll_interval=0.05)
+        second = SqliteFrontier(path, lease=0.2, poll_interval=0.05)
+        second.add("https://www.bad-actor.services/0")
+        second.add("https://api.bad-actor.services/")
+        second.flush()
+        assert len(first) == 2
+
+        # Both frontiers buffered the same url, only one of them queues it.
+        first.add("https://api.bad-actor.services/", 1)
+        assert first.flush() == 0
+
+        assert second.pop(0) == ("https://api.bad-actor.services/", 0)
+        assert first.pop(0) is None
+        assert first.pop(1) == ("https://www.bad-actor.services/1", 1)
+        first.done("https://www.bad-actor.services/1")
+        assert second.pop(0) == ("https://www.bad-actor.services/2", 2)
+        second.done("https://www.bad-actor.services/2")
+        assert not first.idle()
+        second.done("https://api.bad-actor.services/")
+        assert first.idle()
+        first.close()
+        second.close()
+
+    def test_reclaim(self, tmpdir):
+        """
+        Tests that opening a frontier requeues the urls leased by a dead process on this machine straight away, and
+        leaves live processes' leases alone.
+
+        """
+        path = os.path.join(str(tmpdir), "frontier.db")
+        frontier = SqliteFrontier(path)
+        frontier.add("https://one.bad-actor.services/1")
+        frontier.add("https://two.bad-actor.services/1")
+        assert frontier.pop(0)[0] == "https://one.bad-actor.services/1"
+        assert frontier.pop(0)[0] == "https://two.bad-actor.services/1"
+
+        # Hand one lease to a process which has since exited.
+        dead = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead.wait()
+        owner = "%s:%s" % (socket.gethostname(), dead.pid)
+        frontier.connection.execute("UPDATE urls SET owner = ? WHERE host = ?", (owner, "one.bad-actor.services"))
+        frontier.connection.close()
+
+        reopened = SqliteFrontier(path)
+        assert reopened.pop(0) == ("https://one.bad-actor.services/1", 0)
+        assert reopened.pop(0) is None
+        assert reopened.reclaim() == 0
+        assert not reopened.idle()
+        reopened.close()
+
+    def test_release(self, tmpdir):
+        """
+        Tests that a released url is queued again without waiting out its lease or its host's delay, and that done()
+        writes the buffered urls.
+
+        """
+        frontier = SqliteFrontier(os.path.join(str(tmpdir), "frontier.db"), delay=60)
+        frontier.add("https://www.bad-actor.services/1", 1)
+        assert frontier.pop(0) == ("https://www.bad-actor.services/1", 1)
+        frontier.release("https://www.bad-actor.services/1")
+        assert frontier.pop(0) == ("https://www.bad-actor.services/1", 1)
+
+        frontier.add("https://www.bad-actor.services/2", 2)
+        frontier.done("https://www.bad-actor.services/1")
+        assert frontier.buffer == []
+        assert frontier.connection.execute("SELECT COUNT(*) FROM urls").fetchone()[0] == 2
+        frontier.close()
+
+    def test_run_max_pages(self, tmpdir, monkeypatch):
+        """
+        Tests that urls popped after the crawl hit max_pages, and links still buffered, are there for a resumed crawl.
+
+        """
+        monkeypatch.setattr(CarpetBag, "get", fake_get)
+        bagger = CarpetBag()
+        bagger.fake_requests = []
+        path = os.path.join(str(tmpdir), "frontier.db")
+
+        crawler = Crawler(
+            bagger, ["https://www.bad-actor.services/"], max_pages=1, max_depth=1, workers=4,
+            frontier=SqliteFrontier(path))
+        assert crawler.run() == 1
+
+        frontier = SqliteFrontier(path)
+        assert len(frontier) == 3
+        assert frontier.idle() is False
+        frontier.close()
+
+    def test_crawl(self, tmpdir, monkeypatch):
+        """
+        Tests a crawl with the SQLite frontier, and that rerunning it over the same database fetches nothing again.
+
+        """
+        monkeypatch.setattr(CarpetBag, "get", fake_get)
+        bagger = CarpetBag()
+        bagger.fake_requests = []
+        path = os.path.join(str(tmpdir), "frontier.db")
+
+        frontier = SqliteFrontier(path, batch_size=2)
+        crawler = Crawler(bagger, ["https://www.bad-actor.services/"], max_depth=1, workers=2, frontier=frontier)
+        fetched = sorted(page["url"] for page in crawler.crawl())
+        assert fetched == [
+            "https://api.bad-actor.services/",
+            "https://www.bad-actor.services/",
+            "https://www.bad-actor.services/one",
+            "https://www.bad-actor.services/two",
+        ]
+        frontier.close()
+
+        frontier = SqliteFrontier(path)
+        crawler = Crawler(bagger, ["https://www.bad-actor.services/"], max_depth=1, frontier=frontier)
+        assert list(crawler.crawl()) == []
+        assert len(bagger.fake_requests) == 4
+        frontier.close()
+
+# End File carpetbag/tests/test_sqlite_frontier.py
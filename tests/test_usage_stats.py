@@ -0,0 +1,198 @@
+"""Tests Usage Stats
+
+"""
+import atexit
+import json
+import os
+
+import requests
+
+from carpetbag import CarpetBag
+from carpetbag import errors
+from carpetbag.usage_stats import UsageStatsReporter
+
+
+class Recorder(object):
+    """
+    Report sender which accepts every report, keeping them.
+
+    """
+
+    def __init__(self):
+        self.sent = []
+
+    def __call__(self, payload):
+        self.sent.append(payload)
+        return True
+
+
+class TestUsageStatsReporter(object):
+
+    def test___init__(self, tmpdir):
+        """
+        Tests that the UsageStatsReporter module init has correct default values.
+
+        """
+        reporter = UsageStatsReporter(lambda payload: True, spool_path=str(tmpdir.join("spool")))
+        assert reporter.batch_size == 50
+        assert reporter.flush_interval == 5
+        assert not reporter.thread
+        assert not reporter.closed
+        assert UsageStatsReporter(lambda payload: True).spool_path.endswith("carpetbag-usage-stats.spool")
+
+    def test_report_flush(self, tmpdir):
+        """
+        Tests that reports are queued, and only sent when flushed.
+
+        """
+        send = Recorder()
+        reporter = UsageStatsReporter(send, flush_interval=60, spool_path=str(tmpdir.join("spool")))
+        assert reporter.report({"proxy_id": 1})
+        assert reporter.report({"proxy_id": 2})
+        assert send.sent == []
+
+        assert reporter.flush() == 2
+        assert send.sent == [{"proxy_id": 1}, {"proxy_id": 2}]
+        assert reporter.close() == 0
+        assert not reporter.report({"proxy_id": 3})
+
+    def test_batch_size(self, tmpdir):
+        """
+        Tests that hitting the batch size wakes the background thread to send the batch.
+
+        """
+        send = Recorder()
+        reporter = UsageStatsReporter(send, batch_size=2, flush_interval=60, spool_path=str(tmpdir.join("s")))
+        reporter.report({"proxy_id": 1})
+        reporter.report({"proxy_id": 2})
+        reporter.thread.join(0.5)
+        assert len(send.sent) == 2
+        reporter.close()
+
+    def test_spool(self, tmpdir):
+        """
+        Tests that reports are spooled to disk when bad-actor.services can't be reached, and sent on the next flush.
+
+        """
+        sent = []
+        online = {"val": False}
+
+        def send(payload):
+            if not online["val"]:
+                raise errors.NoRemoteServicesConnection
+            sent.append(payload)
+            return True
+
+        reporter = UsageStatsReporter(send, flush_interval=60, spool_path=str(tmpdir.join("spool")))
+        reporter.report({"proxy_id": 1})
+        reporter.report({"proxy_id": 2})
+        assert reporter.flush() == 0
+        assert os.path.exists(reporter.spool_path)
+        assert reporter.spooled_total == 2
+
+        online["val"] = True
+        reporter.report({"proxy_id": 3})
+        assert reporter.close() == 3
+        assert [payload["proxy_id"] for payload in sent] == [1, 2, 3]
+        assert not os.path.exists(reporter.spool_path)
+
+    def test_spool_failures(self, tmpdir):
+        """
+        Tests that reports are spooled when the request fails with a Requests error.
+
+        """
+        responses = [requests.exceptions.Timeout(), True, True]
+
+        def send(payload):
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        reporter = UsageStatsReporter(send, flush_interval=60, spool_path=str(tmpdir.join("spool")))
+        reporter.report({"proxy_id": 1})
+        assert reporter.flush() == 0
+        assert reporter.spooled_total == 1
+
+        reporter.report({"proxy_id": 2})
+        assert reporter.close() == 2
+        assert not responses
+        assert not os.path.exists(reporter.spool_path)
+
+    def test_rejected(self, tmpdir):
+        """
+        Tests that a rejected report is dropped, without holding up the reports behind it or being spooled.
+
+        """
+        sent = []
+
+        def send(payload):
+            if payload["proxy_id"] == 2:
+                return False
+            sent.append(payload)
+            return True
+
+        reporter = UsageStatsReporter(send, flush_interval=60, spool_path=str(tmpdir.join("spool")))
+        for proxy_id in [1, 2, 3]:
+            reporter.report({"proxy_id": proxy_id})
+        assert reporter.flush() == 2
+        assert [payload["proxy_id"] for payload in sent] == [1, 3]
+        assert reporter.rejected_total == 1
+        assert reporter.spooled_total == 0
+        assert not os.path.exists(reporter.spool_path)
+        assert reporter.close() == 0
+
+    def test_max_spooled(self, tmpdir):
+        """
+        Tests that the spool keeps only the newest max_spooled reports.
+
+        """
+        def send(payload):
+            raise errors.NoRemoteServicesConnection
+
+        reporter = UsageStatsReporter(send, flush_interval=60, spool_path=str(tmpdir.join("spool")), max_spooled=3)
+        for proxy_id in [1, 2]:
+            reporter.report({"proxy_id": proxy_id})
+        reporter.flush()
+        for proxy_id in [3, 4]:
+            reporter.report({"proxy_id": proxy_id})
+        reporter.flush()
+
+        with open(reporter.spool_path) as phile:
+            assert [json.loads(line)["proxy_id"] for line in phile] == [2, 3, 4]
+        assert reporter.close() == 0
+
+    def test__start(self, tmpdir, monkeypatch):
+        """
+        Tests that restarting the background thread doesn't register the exit flush again.
+
+        """
+        registered = []
+        monkeypatch.setattr(atexit, "register", registered.append)
+        monkeypatch.setattr(atexit, "unregister", registered.remove)
+        reporter = UsageStatsReporter(Recorder(), flush_interval=60, spool_path=str(tmpdir.join("spool")))
+        reporter._start()
+        reporter.thread = None
+        reporter._start()
+        assert registered == [reporter.close]
+
+        reporter.close()
+        assert registered == []
+
+    def test_send_usage_stats(self, tmpdir):
+        """
+        Tests that CarpetBag.send_usage_stats() sets up and tears down the background reporter.
+
+        """
+        bagger = CarpetBag()
+        assert not bagger._send_usage_stats()
+        assert bagger.send_usage_stats("api-key", "127.0.0.1", spool_path=str(tmpdir.join("spool")))
+        assert isinstance(bagger.usage_stats_reporter, UsageStatsReporter)
+
+        reporter = bagger.usage_stats_reporter
+        assert not bagger.send_usage_stats("api-key", "127.0.0.1", val=False)
+        assert reporter.closed
+        assert not bagger.usage_stats_reporter
+        assert bagger.close()
+
+# End File carpetbag/tests/test_usage_stats.py
@@ -0,0 +1,100 @@
+"""Tests User Agents
+
+"""
+import json
+import os
+
+import pytest
+
+from carpetbag import CarpetBag
+from carpetbag import user_agents
+from carpetbag.user_agents import UserAgentPool
+
+FIREFOX = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:115.0) Gecko/20100101 Firefox/115.0"
+CHROME = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+IE = "Mozilla/5.0 (Windows NT 6.1; Trident/7.0; rv:11.0) like Gecko"
+
+
+class TestUserAgents(object):
+
+    def test_alias_table(self):
+        """
+        Tests that picks from the alias table follow the weights.
+
+        """
+        pool = UserAgentPool([
+            {"user_agent": FIREFOX, "weight": 6},
+            {"user_agent": CHROME, "weight": 3},
+            {"user_agent": IE, "weight": 1},
+        ], seed=7)
+        picks = [pool.pick()["user_agent"] for _ in range(10000)]
+        assert 5600 < picks.count(FIREFOX) < 6400
+        assert 2600 < picks.count(CHROME) < 3400
+        assert 800 < picks.count(IE) < 1200
+
+        probabilities, aliases = user_agents.alias_table([1, 1, 1, 1])
+        assert probabilities == [1.0] * 4
+
+    def test_pick_exclude(self):
+        """
+        Tests that the excluded User Agent isn't picked, even when it carries nearly all the weight.
+
+        """
+        pool = UserAgentPool([{"user_agent": FIREFOX, "weight": 1000}, CHROME], seed=1)
+        assert all(pool.pick(exclude=FIREFOX)["user_agent"] == CHROME for _ in range(100))
+        assert UserAgentPool([IE]).pick(exclude=IE)["user_agent"] == IE
+
+        with pytest.raises(ValueError):
+            UserAgentPool([])
+
+    def test_headers(self):
+        """
+        Tests that each identity gets the Accept header of its browser, and keeps the same headers every pick.
+
+        """
+        pool = UserAgentPool([FIREFOX, CHROME, {"user_agent": IE, "headers": {"Accept-Language": "de-DE"}}])
+        identities = dict((identity["user_agent"], identity) for identity in pool.identities)
+        assert identities[FIREFOX]["headers"]["Accept"] == user_agents.ACCEPT["firefox"]
+        assert identities[CHROME]["headers"]["Accept"] == user_agents.ACCEPT["chrome"]
+        assert identities[IE]["headers"] == {"Accept": user_agents.ACCEPT["ie"], "Accept-Language": "de-DE"}
+        assert pool.pick(exclude=CHROME) in [identities[FIREFOX], identities[IE]]
+
+    def test_save_load(self, tmpdir):
+        """
+        Tests saving a generated pool and loading it back.
+
+        """
+        pool = UserAgentPool.generate(size=50)
+        assert sum(identity["weight"] for identity in pool.identities) == 50
+
+        path = os.path.join(str(tmpdir), "user_agents.json")
+        assert pool.save(path)
+        loaded = UserAgentPool.load(path)
+        assert loaded.identities == pool.identities
+
+        with open(path, "w") as pool_file:
+            json.dump([FIREFOX], pool_file)
+        assert UserAgentPool.load(path).pick()["user_agent"] == FIREFOX
+
+    def test_reset_identity(self):
+        """
+        Tests that a CarpetBag's random user agent comes with its companion headers, which change with
+        reset_identity() and can be overridden by the end-user's headers.
+
+        """
+        bagger = CarpetBag()
+        bagger.use_random_user_agent(pool=UserAgentPool([FIREFOX, CHROME]))
+        first = bagger.user_agent
+        assert bagger._get_headers()["Accept"] == user_agents.ACCEPT[user_agents.browser_family(first)]
+
+        bagger.reset_identity()
+        assert bagger.user_agent != first
+        assert bagger.identity_headers["Accept"] == user_agents.ACCEPT[user_agents.browser_family(bagger.user_agent)]
+
+        bagger.headers = {"Accept": "application/json"}
+        assert bagger._get_headers()["Accept"] == "application/json"
+
+        assert not bagger.use_random_user_agent(False)
+        assert bagger.identity_headers == {}
+
+# End File carpetbag/tests/test_user_agents.py